@@ -18,47 +18,94 @@ def colorbasis(quarks, aquarks, gluons):
    Yields pairs of lists (lines, traces) that for each
    color basis element contain the open and closed fundamental
    lines forming the basis elements
+
+   Each basis element corresponds to a permutation l of
+   gluons + aquarks, where the colour of l[k] flows into the k-th
+   element of gluons + quarks. Only the permutations without a
+   gluon at its own position are constructed, since all others
+   contain a tadpole. The elements are yielded in the order in
+   which 'permutations' would generate the permutations.
    """
    lhs = gluons + aquarks
    rhs = gluons + quarks
    nglue = len(gluons)
 
-   try:
-      for l in permutations(lhs):
-         lines = []
-         traces = []
-         iglue = set(range(nglue))
-         for a in aquarks:
-            line = [a]
-            r = rhs[l.index(a)]
-            while r in [gluons[i] for i in iglue]:
-               ir = gluons.index(r)
-               line.append(r)
-               iglue.remove(ir)
-               r = rhs[l.index(r)]
-            line.append(r)
-            lines.append(line)
-         while len(iglue) > 0:
-            line = []
-            ig = iglue.pop()
-            g = gluons[ig]
-            r = rhs[l.index(g)]
-            while r in [gluons[i] for i in iglue]:
-               ir = gluons.index(r)
-               line.append(r)
-               iglue.remove(ir)
-               r = rhs[l.index(r)]
-            line.append(r)
-            traces.append(line)
-         # check for tadpoles
-         if len(traces) > 0:
-            if min(list(map(len, traces))) <= 1:
-               continue
-         yield lines, traces
-   except IndexError:
+   if len(rhs) < len(lhs):
       raise GolemConfigError("It seems that the color charge is not conserved in the process you want to generate.\n\
 Perhaps you need to change a particle to its anti-particle in the initial or final state.")
 
+   gluon_index = dict((g, i) for i, g in enumerate(gluons))
+
+   for a in sorted(tadpole_free_arrangements(len(lhs), nglue),
+         key=permutation_rank):
+      # follow[x] is the end point of the colour line leaving x
+      follow = {}
+      for k, i in enumerate(a):
+         follow[lhs[i]] = rhs[k]
+
+      lines = []
+      traces = []
+      iglue = set(range(nglue))
+      for q in aquarks:
+         line = [q]
+         r = follow[q]
+         while r in gluon_index and gluon_index[r] in iglue:
+            line.append(r)
+            iglue.remove(gluon_index[r])
+            r = follow[r]
+         line.append(r)
+         lines.append(line)
+      while len(iglue) > 0:
+         line = []
+         ig = iglue.pop()
+         g = gluons[ig]
+         r = follow[g]
+         while r in gluon_index and gluon_index[r] in iglue:
+            line.append(r)
+            iglue.remove(gluon_index[r])
+            r = follow[r]
+         line.append(r)
+         traces.append(line)
+      yield lines, traces
+
+def tadpole_free_arrangements(n, nfixed):
+   """
+   Generates all permutations a of range(n) with a[k] != k
+   for all k < nfixed as tuples.
+   """
+   a = [0] * n
+   used = [False] * n
+
+   def place(k):
+      if k == n:
+         yield tuple(a)
+         return
+      for i in range(n):
+         if used[i] or (k < nfixed and i == k):
+            continue
+         used[i] = True
+         a[k] = i
+         for result in place(k + 1):
+            yield result
+         used[i] = False
+
+   return place(0)
+
+def permutation_rank(a):
+   """
+   Returns the position of the permutation a of range(len(a))
+   in the sequence generated by 'permutations'
+   (Steinhaus-Johnson-Trotter order).
+   """
+   rank = 0
+   for n in range(2, len(a) + 1):
+      pos = [x for x in a if x < n].index(n - 1)
+      if rank % 2 == 0:
+         rank = rank * n + (n - 1 - pos)
+      else:
+         rank = rank * n + pos
+   return rank
+
 def get_color_basis(in_particles, out_particles):
    """
    Find all colored particles and build a color basis
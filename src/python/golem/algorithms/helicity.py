@@ -697,8 +697,116 @@ def generate_all_permutations(conf, groups, error):
 
    return permutation_group_factors.pop()
 
+class SymmetryTables:
+   """
+   Data which is shared by all calls of find_symmetry_mapping for
+   one process: the colour basis and, for each permutation, the
+   permuted colour basis and the mapping of the legs.
+
+   PARAMETERS
+      conf             -- the configuration
+      in_particles     -- the list of incoming particles
+      out_particles    -- the list of outgoing particles
+      relevant_indices -- the indices compared when looking for a mapping
+   """
+   def __init__(self, conf, in_particles, out_particles, relevant_indices):
+      symmetries = conf.getProperty(golem.properties.symmetries)
+      lsymmetries = [s.lower().strip() for s in symmetries]
+      self.parity = "parity" in lsymmetries
+
+      li = len(in_particles)
+      lo = len(out_particles)
+      self.num_legs = li + lo
+      self.in_indices = list(range(li))
+      self.out_indices = list(range(li,li+lo))
+      self.relevant_indices = relevant_indices
+
+      self.color_basis = list(map(color_sort,
+            golem.algorithms.color.get_color_basis(in_particles, out_particles)))
+      self._color_index = {}
+      for i, c in enumerate(self.color_basis):
+         key = _color_key(c)
+         if key not in self._color_index:
+            self._color_index[key] = i
+
+      self._permutations = {}
+
+   def permutation_data(self, perm):
+      """
+      Returns a tuple (icb, sources, lst, plst) for the permutation perm,
+      where icb is the permuted colour basis, sources is the list of
+      pairs (j, sign) such that leg i of the permuted helicity is
+      sign * helicity[j], and lst, plst are the momentum mappings
+      without and with parity (see find_symmetry_mapping).
+      """
+      key = tuple(sorted(perm._map.items()))
+      if key in self._permutations:
+         return self._permutations[key]
+
+      # compute permuted color basis:
+      icb = [self._color_index[_color_key(color_sort((
+               [perm(line) for line in lines],
+               [perm(trace) for trace in traces])))]
+            for lines, traces in self.color_basis]
+
+      # permute particle indices
+      sources = []
+      for indices in [self.in_indices, self.out_indices]:
+         for j in perm(indices):
+            if j not in indices:
+               sources.append( (j, -1) )
+            else:
+               sources.append( (j, +1) )
+
+      lst = [(perm(i), sources[i][1], False) for i in range(self.num_legs)]
+      plst = [(perm(i), sources[i][1], True) for i in range(self.num_legs)]
+
+      result = (icb, sources, lst, plst)
+      self._permutations[key] = result
+      return result
+
+def _color_key(c):
+   lines, traces = c
+   return (tuple(map(tuple, lines)), tuple(map(tuple, traces)))
+
+class GeneratedHelicities(list):
+   """
+   A list of indices of generated helicities, which in addition
+   indexes the helicities by their values at the relevant legs.
+
+   PARAMETERS
+      helicity_list    -- a list of all helicities
+      relevant_indices -- the legs which form the signature of a helicity
+   """
+   def __init__(self, helicity_list, relevant_indices, indices=[]):
+      list.__init__(self)
+      self._helicity_list = helicity_list
+      self._relevant_indices = relevant_indices
+      self._index = {}
+      self.extend(indices)
+
+   def append(self, gi):
+      list.append(self, gi)
+      gh = self._helicity_list[gi]
+      signature = tuple(gh[i] for i in self._relevant_indices)
+      if signature in self._index:
+         self._index[signature].append(gi)
+      else:
+         self._index[signature] = [gi]
+
+   def extend(self, lst):
+      for gi in lst:
+         self.append(gi)
+
+   def lookup(self, signature):
+      """
+      Returns the generated helicities with the given signature
+      in the order in which they have been added.
+      """
+      return self._index.get(signature, [])
+
 def find_symmetry_mapping(helicity, perm, relevant_indices, helicity_list, generated_helicities,
-                          conf, in_particles, out_particles, error
+                          conf, in_particles, out_particles, error, tables=None
                           ):
    """
    First apply a permutation to a helicity then try to find a symmetry transformation
@@ -721,69 +829,44 @@ def find_symmetry_mapping(helicity, perm, relevant_indices, helicity_list, gener
                               when finding the symmetry transformation
       helicity_list        -- a list of all helicities
       generated_helicities -- a list of the indicies of helicities which
-                              should be mapped to by the symmetry transformation
+                              should be mapped to by the symmetry transformation;
+                              a GeneratedHelicities object avoids a linear search
+      tables               -- the SymmetryTables of the process;
+                              if None, they are computed
 
    See also: find_symmetry_group, find_gauge_invariant_symmetry_group
    """
-   symmetries = conf.getProperty(golem.properties.symmetries)
-   lsymmetries = [s.lower().strip() for s in symmetries]
-   parity = "parity" in lsymmetries
-
-   li = len(in_particles)
-   lo = len(out_particles)
-   in_indices = list(range(li))
-   out_indices = list(range(li,li+lo))
-
-   color_basis = list(map(color_sort, golem.algorithms.color.get_color_basis(in_particles, out_particles)))
-
-   # compute permuted color basis:
-   pcb = [color_sort(([perm(line) for line in lines],
-                      [perm(trace) for trace in traces]))
-          for lines, traces in color_basis]
-   icb = [color_basis.index(c) for c in pcb]
-   permuted_color_basis = icb
-
-   # permute particle indices
-   p_in_indices = perm(in_indices)
-   p_out_indices = perm(out_indices)
-
-   p_helicity = {}
-   signs = []
-
-   for i, j in zip(in_indices, p_in_indices):
-      h = helicity[j]
-      if j not in in_indices:
-         p_helicity[i] = -h
-         signs.append(-1)
-      else:
-         p_helicity[i] = h
-         signs.append(+1)
-
-   for i, j in zip(out_indices, p_out_indices):
-      h = helicity[j]
-      if j not in out_indices:
-         p_helicity[i] = -h
-         signs.append(-1)
-      else:
-         p_helicity[i] = h
-         signs.append(+1)
-
-   rp_helicity = [p_helicity[i] for i in relevant_indices]
-   mrp_helicity = [-h for h in rp_helicity]
+   if tables is None:
+      tables = SymmetryTables(conf, in_particles, out_particles, relevant_indices)
+
+   icb, sources, lst, plst = tables.permutation_data(perm)
+
+   rp_helicity = tuple(sources[i][1] * helicity[sources[i][0]]
+         for i in relevant_indices)
+   mrp_helicity = tuple(-h for h in rp_helicity)
+
+   if isinstance(generated_helicities, GeneratedHelicities):
+      # The first exact match wins, otherwise the last match under parity.
+      candidates = generated_helicities.lookup(rp_helicity)
+      if len(candidates) > 0:
+         return (candidates[0], list(lst), list(icb), perm)
+      if tables.parity:
+         candidates = generated_helicities.lookup(mrp_helicity)
+         if len(candidates) > 0:
+            return (candidates[-1], list(plst), list(icb), perm)
+      return None
 
    mapping = None
    for gi in generated_helicities:
 
       gh = helicity_list[gi]
-      r_gh = [gh[i] for i in relevant_indices]
+      r_gh = tuple(gh[i] for i in relevant_indices)
 
       if (rp_helicity == r_gh):
-         lst = [(perm(i), signs[i], False) for i in range(li + lo)]
-         mapping = (gi, lst, permuted_color_basis, perm)
+         mapping = (gi, list(lst), list(icb), perm)
          break
-      elif parity and (mrp_helicity == r_gh):
-         lst = [(perm(i), signs[i], True) for i in range(li + lo)]
-         mapping = (gi, lst, permuted_color_basis, perm)
+      elif tables.parity and (mrp_helicity == r_gh):
+         mapping = (gi, list(plst), list(icb), perm)
 
    return mapping
 
@@ -818,8 +901,9 @@ def find_symmetry_group(helicity_list, conf, in_particles, out_particles, error)
 
    groups, relevant_indices = group_identical_particles(conf, in_particles, out_particles)
    permutation_group = generate_all_permutations(conf, groups, error)
+   tables = SymmetryTables(conf, in_particles, out_particles, relevant_indices)
 
-   generated_helicities = []
+   generated_helicities = GeneratedHelicities(helicity_list, relevant_indices)
    result = []
 
    for ih, helicity in enumerate(helicity_list):
@@ -827,7 +911,8 @@ def find_symmetry_group(helicity_list, conf, in_particles, out_particles, error)
       for perm in permutation_group:
          mapping = find_symmetry_mapping(helicity, perm, relevant_indices,
                                          helicity_list, generated_helicities,
-                                         conf, in_particles, out_particles, error)
+                                         conf, in_particles, out_particles, error,
+                                         tables)
          if mapping is not None:
             break
 
@@ -937,6 +1022,7 @@ def find_gauge_invariant_symmetry_group(helicity_list, conf, in_particles, out_p
    # Generate all permutations
    groups, relevant_indices = group_identical_particles(conf, in_particles, out_particles)
    all_permutations = generate_all_permutations(conf, groups, error)
+   tables = SymmetryTables(conf, in_particles, out_particles, relevant_indices)
 
    # Get dictionary of reference vectors
    ref_vectors = reference_vectors(conf, in_particles, out_particles, return_particle_ids=True)
@@ -970,14 +1056,14 @@ def find_gauge_invariant_symmetry_group(helicity_list, conf, in_particles, out_p
    potentially_generated_helicities = []
    mappings = []
    for gauge_invariant_set in gauge_invariant_sets:
-      gauge_set_generated_helicities = []
+      gauge_set_generated_helicities = GeneratedHelicities(helicity_list, relevant_indices)
       for helicity in gauge_invariant_set:
          mapping = None
          for i_perm in individual_permutations:
             mapping = find_symmetry_mapping(helicity["helicity"], i_perm, relevant_indices, helicity_list,
                                             gauge_set_generated_helicities,
-                                            conf, in_particles, out_particles, error
-                                           )
+                                            conf, in_particles, out_particles, error,
+                                            tables)
             if mapping != None:
                mappings.append([helicity,mapping])
                break
@@ -995,7 +1081,7 @@ def find_gauge_invariant_symmetry_group(helicity_list, conf, in_particles, out_p
    #
 
    # Now try to map helicities between gauge invariant sets
-   generated_helicities = []
+   generated_helicities = GeneratedHelicities(helicity_list, relevant_indices)
    for gi,gauge_invariant_set in enumerate(gauge_invariant_sets):
       best_mappings = []
       best_count = 0
@@ -1012,8 +1098,8 @@ def find_gauge_invariant_symmetry_group(helicity_list, conf, in_particles, out_p
                composed_perm = i_perm(g_perm)
                mapping = find_symmetry_mapping(helicity["helicity"], composed_perm, relevant_indices, helicity_list,
                                                generated_helicities,
-                                               conf, in_particles, out_particles, error
-                                               )
+                                               conf, in_particles, out_particles, error,
+                                               tables)
                if mapping != None:
                   count += 1
                   potential_mappings.append([helicity,mapping])
@@ -1044,8 +1130,8 @@ def find_gauge_invariant_symmetry_group(helicity_list, conf, in_particles, out_p
          composed_perm = perm1(perm2)
          new_mapping = find_symmetry_mapping(mapping[0]["helicity"], composed_perm, relevant_indices, helicity_list,
                                    generated_helicities,
-                                   conf, in_particles, out_particles, error
-                                   )
+                                   conf, in_particles, out_particles, error,
+                                   tables)
          result[mapping[0]["index"]] = new_mapping
          mappings[ih] = [mapping[0],new_mapping]
 
@@ -24,6 +24,7 @@ CMD_LINE_ARGS = golem.util.tools.DEFAULT_CMD_LINE_ARGS + [
 		('n', "name=", "Add a name for this OLP"),
 		('t', "templates=", "Set an alternative templates directory"),
 		('M', "mc=", "Set the name of the requesting MC program"),
+		('j', "jobs=", "Generate up to N subprocesses in parallel [default: 1]"),
 		('z', "scratch",
 			"Overwrites all existing files including Makefile.conf etc")
 	]
@@ -45,6 +46,7 @@ cmd_name = ""
 cmd_use_crossings = True
 
 cmd_mc = "any"
+cmd_jobs = 1
 
 # %f -- full input file name (foo/baz/order.in)
 # %F -- file name (order.in)
@@ -57,7 +59,8 @@ def arg_handler(name, value=None):
 	global cmd_dest_dir, cmd_config_files, cmd_skip_default, \
 			cmd_extensions, cmd_ignore_case, cmd_ignore_unknown, \
 			cmd_output_file, cmd_templates, cmd_force, \
-			cmd_from_scratch, cmd_name, cmd_use_crossings, cmd_mc
+			cmd_from_scratch, cmd_name, cmd_use_crossings, cmd_mc, \
+			cmd_jobs
 
 	if name == 'destination':
 		cmd_dest_dir = value
@@ -107,6 +110,15 @@ def arg_handler(name, value=None):
 	elif name == 'mc':
 		cmd_mc = value
 		return True
+	elif name == 'jobs':
+		try:
+			cmd_jobs = int(value)
+		except ValueError:
+			golem.util.tools.error(
+					"Option --jobs requires an integer argument, got %r." % value)
+		if cmd_jobs < 1:
+			golem.util.tools.error("Option --jobs requires a positive number.")
+		return True
 	return False
 
 def main(argv=sys.argv):
@@ -227,7 +239,8 @@ def main(argv=sys.argv):
 				from_scratch=cmd_from_scratch,
 				olp_process_name = cmd_name,
 				use_crossings = cmd_use_crossings,
-				mc_name = cmd_mc
+				mc_name = cmd_mc,
+				jobs = cmd_jobs
 			)
 		except golem.util.olp_objects.OLPError as ex:
 			golem.util.tools.warning(
@@ -1,9 +1,17 @@
 # vim: ts=3:sw=3
 
+import collections
+import heapq
+import weakref
+
 import golem.model.scanner
 import golem.util.tools
 from golem.util.tools import error
 
+# Maximum number of parsed expressions kept by ExpressionParser.compile
+PARSE_CACHE_SIZE = 8192
+_PARSED_EXPRESSIONS = collections.OrderedDict()
+
 class ExpressionParser:
 	"""
 	Recursive descent parser for mathematical expressions
@@ -12,10 +20,27 @@ class ExpressionParser:
 
 	def __init__(self, **opts):
 		self._specials = opts
+		self._specials_key = tuple(sorted(
+			(name, id(value)) for name, value in opts.items()))
 
 	def compile(self, text):
+		# Expressions are immutable, hence parsed trees can be shared.
+		# The key contains the current implementation of 'simple'
+		# since some importers replace it by 'simple_old'.
+		key = (text, self.__class__.simple, self._specials_key)
+		if key in _PARSED_EXPRESSIONS:
+			_PARSED_EXPRESSIONS.move_to_end(key)
+			return _PARSED_EXPRESSIONS[key][1]
+
 		tokens = golem.model.scanner.TokenStream(ExpressionScanner(), text)
-		return self.expression(tokens)
+		result = intern_expression(self.expression(tokens))
+
+		# the specials are stored with the entry such that the ids
+		# in the key cannot be reused by other objects
+		_PARSED_EXPRESSIONS[key] = (self._specials, result)
+		if len(_PARSED_EXPRESSIONS) > PARSE_CACHE_SIZE:
+			_PARSED_EXPRESSIONS.popitem(last=False)
+		return result
 
 	def expression(self, tokens):
 		terms = [self.product(tokens)]
@@ -289,8 +314,22 @@ class Expression:
 				% self.__class__.__name__)
 
 	def dependsOn(self, symbol):
+		return symbol in self.freeSymbols()
+
+	def freeSymbols(self):
+		"""
+		Returns the names of all symbols in this expression
+		as a frozenset.
+		"""
+		try:
+			return self._symbols
+		except AttributeError:
+			self._symbols = self._freeSymbols()
+			return self._symbols
+
+	def _freeSymbols(self):
 		raise NotImplementedError(
-				"Expression.dependsOn() needs to be overwritten in %s."
+				"Expression.freeSymbols() needs to be overwritten in %s."
 				% self.__class__.__name__)
 
 	def prefixSymbolsWith(self, prefix):
@@ -304,6 +343,14 @@ class Expression:
 				% self.__class__.__name__)
 
 	def algsubs(self, orig, image):
+		# Every subexpression equal to orig has the same free symbols,
+		# which allows to skip subtrees that cannot contain orig.
+		if orig.freeSymbols() <= self.freeSymbols():
+			return self._algsubs(orig, image)
+		else:
+			return self
+
+	def _algsubs(self, orig, image):
 		raise NotImplementedError(
 				"Expression.algsubs() needs to be overwritten in %s."
 				% self.__class__.__name__)
@@ -314,10 +361,38 @@ class Expression:
 				self.__class__.__name__)
 
 	def countSymbolPowers(self):
+		# Expressions are immutable, hence the result can be memoized;
+		# a copy is returned since callers may modify it.
+		try:
+			powers = self._powers
+		except AttributeError:
+			powers = self._countSymbolPowers()
+			self._powers = powers
+		return dict(powers)
+
+	def _countSymbolPowers(self):
 		raise NotImplementedError(
 				"Expression.countSymbolPowers() needs to be overwritten in %s." % \
 				self.__class__.__name__)
 
+	def internSubexpressions(self, table):
+		raise NotImplementedError(
+				"Expression.internSubexpressions() needs to be overwritten in %s." % \
+				self.__class__.__name__)
+
+	def hashKey(self):
+		raise NotImplementedError(
+				"Expression.hashKey() needs to be overwritten in %s." % \
+				self.__class__.__name__)
+
+	def __hash__(self):
+		# hashKey() has to be consistent with __eq__
+		try:
+			return self._hash
+		except AttributeError:
+			self._hash = hash(self.hashKey())
+			return self._hash
+
 	def replaceNegativeIndices(self, lvl, pattern, found):
 		raise NotImplementedError(
 				"Expression.replaceNegativeIndices() " + \
@@ -392,6 +467,9 @@ class ConstantExpression(Expression):
 	def dependsOn(self, symbol):
 		return False
 
+	def _freeSymbols(self):
+		return frozenset()
+
 	def prefixSymbolsWith(self, prefix):
 		return self
 
@@ -424,6 +502,12 @@ class ConstantExpression(Expression):
 
 	def replaceDotProducts(self, idx_prefixes, metric, dotproduct=None):
 		return self
+
+	def internSubexpressions(self, table):
+		return table.setdefault(self.internKey(), self)
+
+	def internKey(self):
+		return (self.__class__, self.hashKey())
 	
 class FloatExpression(ConstantExpression):
 	def __init__(self, float):
@@ -451,6 +535,11 @@ class FloatExpression(ConstantExpression):
 		else:
 			return False
 
+	__hash__ = Expression.__hash__
+
+	def hashKey(self):
+		return ("float", self._float)
+
 	def __str__(self):
 		return str(self._float)
 
@@ -473,6 +562,15 @@ class IntegerExpression(ConstantExpression):
 		else:
 			return False
 
+	__hash__ = Expression.__hash__
+
+	def hashKey(self):
+		return ("integer", self._integer)
+
+	def internKey(self):
+		# distinguish 1 from '1'
+		return (self.__class__, type(self._integer), self._integer)
+
 	def replaceNegativeIndices(self, lvl, pattern, found):
 		if lvl > 0 and self._integer < 0:
 			idx = abs(idx)
@@ -498,6 +596,9 @@ class SymbolExpression(Expression):
 	def dependsOn(self, symbol):
 		return self._symbol == symbol
 
+	def _freeSymbols(self):
+		return frozenset([self._symbol])
+
 	def prefixSymbolsWith(self, prefix):
 		return SymbolExpression(prefix + self._symbol)
 
@@ -549,12 +650,19 @@ class SymbolExpression(Expression):
 		else:
 			return False
 
+	__hash__ = Expression.__hash__
+
+	def hashKey(self):
+		return ("symbol", self._symbol)
+
+	def internSubexpressions(self, table):
+		return table.setdefault((self.__class__, self._symbol), self)
+
 	def replaceDotProducts(self, idx_prefixes, metric, dotproduct=None):
 		return self
 
 class FunctionExpression(Expression):
 	def __init__(self, head, args):
-		self._deps = {}
 		self._head = head
 		self._arguments = list(args)
 
@@ -567,43 +675,56 @@ class FunctionExpression(Expression):
 	def powerCounting(self, powers):
 		return self._head.powerCounting(powers)
 
-	def countSymbolPowers(self):
+	def _countSymbolPowers(self):
 		return self._head.countSymbolPowers()
 
 	def getPrecedence(self):
 		return 500
 
-	def dependsOn(self, symbol):
-		if symbol in self._deps:
-			return self._deps[symbol]
-		else:
-			dep = self._head.dependsOn(symbol) or \
-				any(arg.dependsOn(symbol) for arg in self._arguments)
-			self._deps[symbol] = dep
-			return dep
+	def _freeSymbols(self):
+		return self._head.freeSymbols().union(
+				*[arg.freeSymbols() for arg in self._arguments])
 
 	def prefixSymbolsWith(self, prefix):
 		return FunctionExpression(self._head.prefixSymbolsWith(prefix),
 				[arg.prefixSymbolsWith(prefix) for arg in self._arguments])
 
 	def replaceNegativeIndices(self, lvl, pattern, found):
-		return FunctionExpression(
+		return self.rebuild(
 				self._head.replaceNegativeIndices(lvl, pattern, found),
 				[arg.replaceNegativeIndices(lvl+1, pattern, found) for arg in self._arguments])
-		return self
 
 
 	def subs(self, aDict):
-		return FunctionExpression(self._head.subs(aDict),
+		return self.rebuild(self._head.subs(aDict),
 				[arg.subs(aDict) for arg in self._arguments])
 
-	def algsubs(self, orig, image):
+	def _algsubs(self, orig, image):
 		if self == orig:
 			return image
 		else:
-			return FunctionExpression(self._head.algsubs(orig, image),
+			return self.rebuild(self._head.algsubs(orig, image),
 				[arg.algsubs(orig, image) for arg in self._arguments])
 
+	def rebuild(self, head, args):
+		"""
+		Returns self if head and args are the head and arguments
+		of this expression, a new FunctionExpression otherwise.
+		"""
+		if head is self._head and unchanged(self._arguments, args):
+			return self
+		else:
+			return FunctionExpression(head, args)
+
+	def internSubexpressions(self, table):
+		head = self._head.internSubexpressions(table)
+		args = [arg.internSubexpressions(table) for arg in self._arguments]
+		key = (self.__class__, id(head), tuple(map(id, args)))
+		return table.setdefault(key, self.rebuild(head, args))
+
+	def hashKey(self):
+		return ("function", self._head, tuple(self._arguments))
+
 	def write(self, out):
 		if self._head.getPrecedence() >= self.getPrecedence():
 			self._head.write(out)
@@ -655,22 +776,22 @@ class FunctionExpression(Expression):
 					return self[0]**self[1]
 		new_head = self._head.replaceIntegerPowers(pow_fun)
 		new_args = [x.replaceIntegerPowers(pow_fun) for x in self._arguments]
-		return new_head(*new_args)
+		return self.rebuild(new_head, new_args)
 
 	def replaceFloats(self, prefix, subs, counter=[0]):
 		new_head = self._head.replaceFloats(prefix, subs, counter)
 		new_args = [x.replaceFloats(prefix, subs, counter) for x in self._arguments]
-		return FunctionExpression(new_head, new_args)
+		return self.rebuild(new_head, new_args)
 
 	def replaceStrings(self, prefix, subs, counter=[0]):
 		new_head = self._head.replaceStrings(prefix, subs, counter)
 		new_args = [x.replaceStrings(prefix, subs, counter) for x in self._arguments]
-		return FunctionExpression(new_head, new_args)
+		return self.rebuild(new_head, new_args)
 
 	def replaceDotProducts(self, idx_prefixes, metric, dotproduct=None):
 		new_head = self._head.replaceDotProducts(idx_prefixes, metric, dotproduct)
 		new_args = [x.replaceDotProducts(idx_prefixes, metric, dotproduct) for x in self._arguments]
-		return FunctionExpression(new_head, new_args)
+		return self.rebuild(new_head, new_args)
 
 	def __len__(self):
 		return len(self._arguments)
@@ -691,9 +812,10 @@ class FunctionExpression(Expression):
 		else:
 			return False
 
+	__hash__ = Expression.__hash__
+
 class DotExpression(Expression):
 	def __init__(self, first, second):
-		self._deps = {}
 		self._first = first
 		self._second = second
 
@@ -701,7 +823,7 @@ class DotExpression(Expression):
 		return "(" + str(self._first) + "." + str(self._second) + ")"
 
 	def replaceIntegerPowers(self, pow_fun):
-		return DotExpression(
+		return self.rebuild(
 				self._first.replaceIntegerPowers(pow_fun),
 				self._second.replaceIntegerPowers(pow_fun))
 	
@@ -735,7 +857,7 @@ class DotExpression(Expression):
 	def replaceNegativeIndices(self, lvl, pattern, found):
 		s1 = self._first.replaceNegativeIndices(lvl, pattern, found)
 		s2 = self._second.replaceNegativeIndices(lvl, pattern, found)
-		return DotExpression(self._first, self._second)
+		return self
 
 	def __eq__(self, other):
 		if isinstance(other, DotExpression):
@@ -746,6 +868,28 @@ class DotExpression(Expression):
 		else:
 			return False
 
+	__hash__ = Expression.__hash__
+
+	def hashKey(self):
+		# the dot product is symmetric
+		return ("dot", frozenset([self._first, self._second]))
+
+	def rebuild(self, first, second):
+		"""
+		Returns self if first and second are the operands of this
+		expression, a new DotExpression otherwise.
+		"""
+		if first is self._first and second is self._second:
+			return self
+		else:
+			return DotExpression(first, second)
+
+	def internSubexpressions(self, table):
+		first = self._first.internSubexpressions(table)
+		second = self._second.internSubexpressions(table)
+		key = (self.__class__, id(first), id(second))
+		return table.setdefault(key, self.rebuild(first, second))
+
 	def getFirst(self):
 		return self._first
 
@@ -755,14 +899,14 @@ class DotExpression(Expression):
 	def replaceFloats(self, prefix, subs, counter=[0]):
 		new_first = self._first.replaceFloats(prefix, subs, counter)
 		new_second = self._second.replaceFloats(prefix, subs, counter)
-		return DotExpression(new_first, new_second)
+		return self.rebuild(new_first, new_second)
 
 	def replaceStrings(self, prefix, subs, counter=[0]):
 		new_first = self._first.replaceStrings(prefix, subs, counter)
 		new_second = self._second.replaceStrings(prefix, subs, counter)
-		return DotExpression(new_first, new_second)
+		return self.rebuild(new_first, new_second)
 
-	def countSymbolPowers(self):
+	def _countSymbolPowers(self):
 		p1 = self._first.countSymbolPowers()
 		p2 = self._second.countSymbolPowers()
 		return addSymbolPowers(p1, p2)
@@ -774,27 +918,21 @@ class DotExpression(Expression):
 	def getPrecedence(self):
 		return 500
 
-	def dependsOn(self, symbol):
-		if symbol in self._deps:
-			return self._deps[symbol]
-		else:
-			dep = self._first.dependsOn(symbol) or \
-				self._second.dependsOn(symbol)
-			self._deps[symbol] = dep
-			return dep
+	def _freeSymbols(self):
+		return self._first.freeSymbols() | self._second.freeSymbols()
 
 	def prefixSymbolsWith(self, prefix):
 		return DotExpression(self._first.prefixSymbolsWith(prefix),
 				self._second.prefixSymbolsWith(prefix))
 
 	def subs(self, aDict):
-		return DotExpression(self._first.subs(aDict), self._second.subs(aDict))
+		return self.rebuild(self._first.subs(aDict), self._second.subs(aDict))
 
-	def algsubs(self, orig, image):
+	def _algsubs(self, orig, image):
 		if self == orig:
 			return image
 		else:
-			return DotExpression(self._first.algsubs(orig, image),
+			return self.rebuild(self._first.algsubs(orig, image),
 					self._second.algsubs(orig, image))
 
 	def write(self, out):
@@ -850,6 +988,27 @@ class PowerExpression(Expression):
 		else:
 			return False
 
+	__hash__ = Expression.__hash__
+
+	def hashKey(self):
+		return ("power", self._base, self._exponent)
+
+	def rebuild(self, base, exponent):
+		"""
+		Returns self if base and exponent are the operands of this
+		expression, a new PowerExpression otherwise.
+		"""
+		if base is self._base and exponent is self._exponent:
+			return self
+		else:
+			return PowerExpression(base, exponent)
+
+	def internSubexpressions(self, table):
+		base = self._base.internSubexpressions(table)
+		exponent = self._exponent.internSubexpressions(table)
+		key = (self.__class__, id(base), id(exponent))
+		return table.setdefault(key, self.rebuild(base, exponent))
+
 	def getBase(self):
 		return self._base
 
@@ -857,29 +1016,29 @@ class PowerExpression(Expression):
 		return self._exponent
 
 	def replaceIntegerPowers(self, pow_fun):
-		return PowerExpression(
+		return self.rebuild(
 				self._base.replaceIntegerPowers(pow_fun),
 				self._exponent.replaceIntegerPowers(pow_fun))
 
 	def replaceFloats(self, prefix, subs, counter=[0]):
 		new_base = self._base.replaceFloats(prefix, subs, counter)
 		new_exponent = self._exponent.replaceFloats(prefix, subs, counter)
-		return PowerExpression(new_base, new_exponent)
+		return self.rebuild(new_base, new_exponent)
 
 	def replaceNegativeIndices(self, lvl, pattern, found):
 		new_base = self._base.replaceNegativeIndices(lvl, pattern, found)
 		new_exponent = self._exponent.replaceNegativeIndices(lvl, pattern, found)
-		return PowerExpression(new_base, new_exponent)
+		return self.rebuild(new_base, new_exponent)
 
 	def replaceStrings(self, prefix, subs, counter=[0]):
 		new_base = self._base.replaceStrings(prefix, subs, counter)
 		new_exponent = self._exponent.replaceStrings(prefix, subs, counter)
-		return PowerExpression(new_base, new_exponent)
+		return self.rebuild(new_base, new_exponent)
 
 	def __int__(self):
 		return int(self._base) ** int(self._exponent)
 
-	def countSymbolPowers(self):
+	def _countSymbolPowers(self):
 		powers = self._base.countSymbolPowers()
 		try:
 			factor = int(self._exponent)
@@ -891,27 +1050,26 @@ class PowerExpression(Expression):
 	def powerCounting(self, powers):
 		return int(self._exponent) * self._base.powerCounting(powers)
 
-	def dependsOn(self, symbol):
-		return self._base.dependsOn(symbol) or \
-				self._exponent.dependsOn(symbol)
+	def _freeSymbols(self):
+		return self._base.freeSymbols() | self._exponent.freeSymbols()
 
 	def prefixSymbolsWith(self, prefix):
 		return PowerExpression(self._base.prefixSymbolsWith(prefix),
 				self._exponent.prefixSymbolsWith(prefix))
 
 	def replaceDotProducts(self, idx_prefixes, metric, dotproduct=None):
-		return PowerExpression(
+		return self.rebuild(
 			self._base.replaceDotProducts(idx_prefixes, metric, dotproduct),
 			self._exponent.replaceDotProducts(idx_prefixes, metric, dotproduct))
 
 	def subs(self, aDict):
-		return PowerExpression(self._base.subs(aDict), self._exponent.subs(aDict))
+		return self.rebuild(self._base.subs(aDict), self._exponent.subs(aDict))
 
-	def algsubs(self, orig, image):
+	def _algsubs(self, orig, image):
 		if self == orig:
 			return image
 		else:
-			return PowerExpression(
+			return self.rebuild(
 					self._base.algsubs(orig, image),
 					self._exponent.algsubs(orig, image))
 
@@ -975,6 +1133,30 @@ class ProductExpression(Expression):
 		else:
 			return False
 
+	__hash__ = Expression.__hash__
+
+	def hashKey(self):
+		return ("product", tuple(self._factors))
+
+	def rebuild(self, factors):
+		"""
+		Returns self if factors are the factors of this expression,
+		a new ProductExpression otherwise.
+		"""
+		if len(factors) == len(self._factors) and all(
+				s1 == s2 and f1 is f2 for (s1, f1), (s2, f2)
+				in zip(self._factors, factors)):
+			return self
+		else:
+			return ProductExpression(factors)
+
+	def internSubexpressions(self, table):
+		factors = [(sign, factor.internSubexpressions(table))
+				for sign, factor in self._factors]
+		key = (self.__class__,
+				tuple((sign, id(factor)) for sign, factor in factors))
+		return table.setdefault(key, self.rebuild(factors))
+
 	def __len__(self):
 		return len(self._factors)
 
@@ -984,7 +1166,7 @@ class ProductExpression(Expression):
 	def getFactors(self):
 		return self._factors[:]
 
-	def countSymbolPowers(self):
+	def _countSymbolPowers(self):
 		result = {}
 		for sig, factor in self._factors:
 			p = factor.countSymbolPowers()
@@ -998,28 +1180,28 @@ class ProductExpression(Expression):
 		for sig, factor in self._factors:
 			p = factor.replaceFloats(prefix, subs, counter)
 			result.append( (sig, p) )
-		return ProductExpression(result)
+		return self.rebuild(result)
 
 	def replaceIntegerPowers(self, pow_fun):
 		result = []
 		for sig, factor in self._factors:
 			p = factor.replaceIntegerPowers(pow_fun)
 			result.append( (sig, p) )
-		return ProductExpression(result)
+		return self.rebuild(result)
 
 	def replaceStrings(self, prefix, subs, counter=[0]):
 		result = []
 		for sig, factor in self._factors:
 			p = factor.replaceStrings(prefix, subs, counter)
 			result.append( (sig, p) )
-		return ProductExpression(result)
+		return self.rebuild(result)
 
 	def replaceNegativeIndices(self, lvl, pattern, found):
 		result = []
 		for sig, factor in self._factors:
 			p = factor.replaceNegativeIndices(lvl, pattern, found)
 			result.append( (sig, p) )
-		return ProductExpression(result)
+		return self.rebuild(result)
 
 	def powerCounting(self, powers):
 		return sum([sig * term.powerCounting(powers)
@@ -1035,8 +1217,9 @@ class ProductExpression(Expression):
 				den *= int(factor)
 		return num / den
 
-	def dependsOn(self, symbol):
-		return any(factor.dependsOn(symbol) for sign, factor in self._factors)
+	def _freeSymbols(self):
+		return frozenset().union(
+				*[factor.freeSymbols() for sign, factor in self._factors])
 
 	def prefixSymbolsWith(self, prefix):
 		new_factors = []
@@ -1049,22 +1232,22 @@ class ProductExpression(Expression):
 		for sign, factor in self._factors:
 			new_factors.append( (sign,
 				factor.replaceDotProducts(idx_prefixes, metric, dotproduct)) )
-		return ProductExpression(new_factors)
+		return self.rebuild(new_factors)
 
 	def subs(self, aDict):
 		new_factors = []
 		for sign, factor in self._factors:
 			new_factors.append( (sign, factor.subs(aDict)) )
-		return ProductExpression(new_factors)
+		return self.rebuild(new_factors)
 
-	def algsubs(self, orig, image):
+	def _algsubs(self, orig, image):
 		if self == orig:
 			return image
 		else:
 			new_factors = []
 			for sign, factor in self._factors:
 				new_factors.append( (sign, factor.algsubs(orig, image)) )
-			return ProductExpression(new_factors)
+			return self.rebuild(new_factors)
 
 	def __str__(self):
 		return "*".join(
@@ -1125,7 +1308,6 @@ class ProductExpression(Expression):
 
 class SumExpression(Expression):
 	def __init__(self, terms):
-		self._deps = {}
 		self._terms = list(terms)
 
 	def __eq__(self, other):
@@ -1150,6 +1332,27 @@ class SumExpression(Expression):
 		else:
 			return False
 
+	__hash__ = Expression.__hash__
+
+	def hashKey(self):
+		# the order of the terms does not matter for __eq__
+		return ("sum", tuple(sorted(map(hash, self._terms))))
+
+	def rebuild(self, terms):
+		"""
+		Returns self if terms are the terms of this expression,
+		a new SumExpression otherwise.
+		"""
+		if unchanged(self._terms, terms):
+			return self
+		else:
+			return SumExpression(terms)
+
+	def internSubexpressions(self, table):
+		terms = [term.internSubexpressions(table) for term in self._terms]
+		key = (self.__class__, tuple(map(id, terms)))
+		return table.setdefault(key, self.rebuild(terms))
+
 	def __len__(self):
 		return len(self._terms)
 
@@ -1164,30 +1367,30 @@ class SumExpression(Expression):
 		for term in self._terms:
 			p = term.replaceFloats(prefix, subs, counter)
 			result.append(p)
-		return SumExpression(result)
+		return self.rebuild(result)
 
 	def replaceIntegerPowers(self, pow_fun):
 		result = []
 		for term in self._terms:
 			p = term.replaceIntegerPowers(pow_fun)
 			result.append(p)
-		return SumExpression(result)
+		return self.rebuild(result)
 
 	def replaceStrings(self, prefix, subs, counter=[0]):
 		result = []
 		for term in self._terms:
 			p = term.replaceStrings(prefix, subs, counter)
 			result.append(p)
-		return SumExpression(result)
+		return self.rebuild(result)
 
 	def replaceNegativeIndices(self, lvl, pattern, found):
 		result = []
 		for term in self._terms:
 			p = term.replaceNegativeIndices(lvl, pattern, found)
 			result.append(p)
-		return SumExpression(result)
+		return self.rebuild(result)
 
-	def countSymbolPowers(self):
+	def _countSymbolPowers(self):
 		all_p = []
 		name = set([])
 		for term in self._terms:
@@ -1209,28 +1412,23 @@ class SumExpression(Expression):
 	def __int__(self):
 		return sum(map(int, self._terms))
 
-	def dependsOn(self, symbol):
-		if symbol in self._deps:
-			return self._deps[symbol]
-		else:
-			dep = any(term.dependsOn(symbol) for term in self._terms)
-			self._deps[symbol] = dep
-			return dep
+	def _freeSymbols(self):
+		return frozenset().union(*[term.freeSymbols() for term in self._terms])
 
 	def prefixSymbolsWith(self, prefix):
 		return SumExpression( [term.prefixSymbolsWith(prefix) for term in self._terms])
 
 	def replaceDotProducts(self, idx_prefixes, metric, dotproduct=None):
-		return SumExpression( [term.replaceDotProducts(idx_prefixes, metric, dotproduct) for term in self._terms])
+		return self.rebuild( [term.replaceDotProducts(idx_prefixes, metric, dotproduct) for term in self._terms])
 
 	def subs(self, aDict):
-		return SumExpression( [term.subs(aDict) for term in self._terms])
+		return self.rebuild( [term.subs(aDict) for term in self._terms])
 
-	def algsubs(self, orig, image):
+	def _algsubs(self, orig, image):
 		if self == orig:
 			return image
 		else:
-			return SumExpression(
+			return self.rebuild(
 					[term.algsubs(orig, image) for term in self._terms])
 
 	def write(self, out):
@@ -1288,7 +1486,6 @@ class SumExpression(Expression):
 
 class UnaryMinusExpression(Expression):
 	def __init__(self, term):
-		self._deps = {}
 		self._term = term
 
 	def __str__(self):
@@ -1300,22 +1497,41 @@ class UnaryMinusExpression(Expression):
 		else:
 			return False
 
+	__hash__ = Expression.__hash__
+
+	def hashKey(self):
+		return ("minus", self._term)
+
+	def rebuild(self, term):
+		"""
+		Returns self if term is the operand of this expression,
+		a new UnaryMinusExpression otherwise.
+		"""
+		if term is self._term:
+			return self
+		else:
+			return UnaryMinusExpression(term)
+
+	def internSubexpressions(self, table):
+		term = self._term.internSubexpressions(table)
+		return table.setdefault((self.__class__, id(term)), self.rebuild(term))
+
 	def getTerm(self):
 		return self._term
 
 	def replaceFloats(self, prefix, subs, counter=[0]):
 		p = self._term.replaceFloats(prefix, subs, counter)
-		return UnaryMinusExpression(p)
+		return self.rebuild(p)
 
 	def replaceIntegerPowers(self, pow_fun):
 		p = self._term.replaceIntegerPowers(pow_fun)
-		return UnaryMinusExpression(p)
+		return self.rebuild(p)
 
 	def replaceStrings(self, prefix, subs, counter=[0]):
 		p = self._term.replaceStrings(prefix, subs, counter)
-		return UnaryMinusExpression(p)
+		return self.rebuild(p)
 
-	def countSymbolPowers(self):
+	def _countSymbolPowers(self):
 		return self._term.countSymbolPowers()
 
 	def powerCounting(self, powers):
@@ -1324,19 +1540,14 @@ class UnaryMinusExpression(Expression):
 	def __int__(self):
 		return - int(self._term)
 
-	def dependsOn(self, symbol):
-		if symbol in self._deps:
-			return self._deps[symbol]
-		else:
-			dep = self._term.dependsOn(symbol)
-			self._deps[symbol] = dep
-			return dep
+	def _freeSymbols(self):
+		return self._term.freeSymbols()
 
 	def prefixSymbolsWith(self, prefix):
 		return UnaryMinusExpression(self._term.prefixSymbolsWith(prefix))
 
 	def replaceDotProducts(self, idx_prefixes, metric, dotproduct=None):
-		return UnaryMinusExpression(
+		return self.rebuild(
 			self._term.replaceDotProducts(idx_prefixes, metric, dotproduct))
 
 	def replaceNegativeIndices(self, lvl, pattern, found):
@@ -1352,17 +1563,17 @@ class UnaryMinusExpression(Expression):
 			else:
 				return self
 		else:
-			return UnaryMinusExpression(
+			return self.rebuild(
 				self._term.replaceNegativeIndices(lvl, pattern, found))
 
 	def subs(self, aDict):
-		return UnaryMinusExpression(self._term.subs(aDict))
+		return self.rebuild(self._term.subs(aDict))
 
-	def algsubs(self, orig, image):
+	def _algsubs(self, orig, image):
 		if self == orig:
 			return image
 		else:
-			return UnaryMinusExpression(self._term.algsubs(orig, image))
+			return self.rebuild(self._term.algsubs(orig, image))
 
 	def write(self, out):
 		out.write("-")
@@ -1398,6 +1609,11 @@ class SpecialExpression(ConstantExpression):
 		else:
 			return False
 
+	__hash__ = Expression.__hash__
+
+	def hashKey(self):
+		return ("special", self._image)
+
 	def write(self, out):
 		out.write(self._image)
 
@@ -1418,11 +1634,16 @@ class StringExpression(ConstantExpression):
 		self._image = image
 
 	def __eq__(self, other):
-		if isinstance(other, SpecialExpression):
+		if isinstance(other, StringExpression):
 			return self._image == other._image
 		else:
 			return False
 
+	__hash__ = Expression.__hash__
+
+	def hashKey(self):
+		return ("string", self._image)
+
 	def write(self, out):
 		out.write("'" + self._image + "'")
 
@@ -1443,6 +1664,27 @@ class StringExpression(ConstantExpression):
 		subs[self._image] = expr
 		return expr
 
+# Table of the interned expressions, see intern_expression
+_INTERNED = weakref.WeakValueDictionary()
+
+def intern_expression(expr):
+	"""
+	Returns an expression equal to expr in which all subexpressions
+	are shared with structurally identical subexpressions of all
+	previously interned expressions.
+
+	Two subexpressions are only shared if they are of the same type
+	and have identical operands in identical order, such that the
+	shared expression is written exactly like the original one.
+	"""
+	return expr.internSubexpressions(_INTERNED)
+
+def unchanged(old, new):
+	"""
+	Returns True if the lists old and new contain the same objects.
+	"""
+	return len(old) == len(new) and all(a is b for a, b in zip(old, new))
+
 def addSymbolPowers(p1, p2):
 	names = set(list(p1.keys()) + list(p2.keys()))
 	result = {}
@@ -1465,71 +1707,71 @@ def resolve_dependencies(functions):
 	"""
 	Bring a list of expressions into an order in which they
 	can be computed
+
+	Whenever several functions could be computed next, the one
+	which comes first in functions is taken.
 	"""
 	all_names = list(functions.keys())
+	index = dict((name, i) for i, name in enumerate(all_names))
 	nfunctions = len(all_names)
+	# graph[name]: the functions on which name still depends
+	# users[name]: the functions which depend on name
 	graph = {}
+	users = dict((name, []) for name in all_names)
 	golem.util.tools.message("      * Building call graph")
 	i = 0
 	for name, expr in list(functions.items()):
 		i += 1
 		if i % 100 == 0:
 			golem.util.tools.message("         (%5d/%5d)" % (i, nfunctions))
-		edges = []
-		for other in all_names:
-			if name == other:
-				continue
-
-			if expr.dependsOn(other):
-				edges.append(other)
+		edges = set(other for other in expr.freeSymbols()
+				if other in index and other != name)
 		graph[name] = edges
+		for other in edges:
+			users[other].append(name)
 
 	golem.util.tools.message("      * Traversing call graph")
 	nedges = len(graph)
 	golem.util.tools.message("         %5d edges left" % nedges)
 
-	program = []
-	while len(graph) > 0:
-		found = None
-		for name, edges in list(graph.items()):
-			if len(edges) == 0:
-				found = name
-				break
-		if found is None:
-			# Before we generate an error message we minimize the set of problematic
-			# functions. In order to do so we drop all functions on which no other
-			# function depends.
-			flag = True
-			while flag:
-				flag = False
-				bottom_expression = None
-				for name in list(graph.keys()):
-					bottom = True
-					for edges in list(graph.values()):
-						if name in edges:
-							bottom = False
-							break
-					if bottom:
-						bottom_expression = name
-						break
-				if bottom_expression is not None:
-					flag = True
-					del graph[bottom_expression]
-
-			problem_set = ", ".join(list(graph.keys()))
-
-			golem.util.tools.error(
-					"Cannot resolve dependencies between functions: %s." %
-					problem_set)
+	ready = [index[name] for name, edges in graph.items() if len(edges) == 0]
+	heapq.heapify(ready)
 
+	program = []
+	while len(ready) > 0:
+		name = all_names[heapq.heappop(ready)]
 		program.append(name)
 		del graph[name]
 		nedges -= 1
 		if nedges % 100 == 0:
 			golem.util.tools.message("         %5d edges left" % nedges)
 
-		for edges in list(graph.values()):
-			if name in edges:
-				edges.remove(name)
+		for user in users[name]:
+			edges = graph[user]
+			edges.discard(name)
+			if len(edges) == 0:
+				heapq.heappush(ready, index[user])
+
+	if len(graph) > 0:
+		# Before we generate an error message we minimize the set of problematic
+		# functions. In order to do so we drop all functions on which no other
+		# function depends.
+		nusers = dict((name, 0) for name in graph)
+		for edges in graph.values():
+			for other in edges:
+				nusers[other] += 1
+		bottom = [name for name, n in nusers.items() if n == 0]
+		while len(bottom) > 0:
+			name = bottom.pop()
+			for other in graph.pop(name):
+				nusers[other] -= 1
+				if nusers[other] == 0:
+					bottom.append(other)
+
+		problem_set = ", ".join(list(graph.keys()))
+
+		golem.util.tools.error(
+				"Cannot resolve dependencies between functions: %s." %
+				problem_set)
 
 	return program
@@ -111,11 +111,23 @@ class Model:
 		self.floats = []
 
 		parser = ex.ExpressionParser()
-		ex.ExpressionParser.simple = ex.ExpressionParser.simple_old
+		use_integer_parsing()
+
+		# Each Lorentz structure is parsed and prepared once; the writers
+		# continue from these structures and copies of the index maps.
+		self.lorentz_structures = {}
+		self.lorentz_subs = {}
+		self.lorentz_counter = [0]
+		self.lorentz_dummies = {}
 		for l in self.all_lorentz:
 			name = l.name
 			structure = parser.compile(l.structure)
 			l.rank = get_rank(structure)	
+			structure = structure.replaceStrings(
+					"ModelDummyIndex", self.lorentz_subs, self.lorentz_counter)
+			structure = structure.replaceNegativeIndices(0, "MDLIndex%d",
+					self.lorentz_dummies)
+			self.lorentz_structures[name] = structure
 
 	def write_python_file(self, f):
 		# Edit : GC- 16.11.12 now have the dictionaries
@@ -604,16 +616,12 @@ class Model:
 	def write_form_file(self, f):
 		parser = ex.ExpressionParser()
 		lorex = {}
-		lsubs = {}
-		lcounter = [0]
-		dummy_found = {}
+		lsubs = dict(self.lorentz_subs)
+		lcounter = list(self.lorentz_counter)
+		dummy_found = dict(self.lorentz_dummies)
 		for l in self.all_lorentz:
 			name = l.name
-			structure = parser.compile(l.structure)
-			structure = structure.replaceStrings(
-					"ModelDummyIndex", lsubs, lcounter)
-			structure = structure.replaceNegativeIndices(0, "MDLIndex%d",
-					dummy_found)
+			structure = self.lorentz_structures[name]
 			for i in [2]:
 				structure = structure.algsubs(
 					ex.FloatExpression("%d." % i),
@@ -821,16 +829,12 @@ class Model:
 	def write_formct_file(self, f):
 		parser = ex.ExpressionParser()
 		lorex = {}
-		lsubs = {}
-		lcounter = [0]
-		dummy_found = {}
+		lsubs = dict(self.lorentz_subs)
+		lcounter = list(self.lorentz_counter)
+		dummy_found = dict(self.lorentz_dummies)
 		for l in self.all_lorentz:
 			name = l.name
-			structure = parser.compile(l.structure)
-			structure = structure.replaceStrings(
-					"ModelDummyIndex", lsubs, lcounter)
-			structure = structure.replaceNegativeIndices(0, "MDLIndex%d",
-					dummy_found)
+			structure = self.lorentz_structures[name]
 			for i in range(2,33):
 				structure = structure.algsubs(
 					ex.FloatExpression("%d." % i),
@@ -945,6 +949,14 @@ class Model:
 #			self.write_formct_file(f)
 
 
+def use_integer_parsing():
+	"""
+	Makes the ExpressionParser read integers as IntegerExpression.
+	This is required by the import of FeynRules models and remains
+	in effect for the rest of the run.
+	"""
+	ex.ExpressionParser.simple = ex.ExpressionParser.simple_old
+
 def canonical_field_names(p):
 	pdg_code = p.pdg_code
 	if pdg_code < 0:
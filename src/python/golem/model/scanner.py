@@ -8,6 +8,15 @@ class Scanner(object):
 	"""
 	def __new__(cls, *args, **opts):
 		inst = object.__new__(cls)
+		# The grammar is compiled once per class; subclasses have their own
+		if "_GRAMMAR" not in cls.__dict__:
+			cls._GRAMMAR = cls._compile_grammar()
+		inst._REGEX, inst._ACTIONS = cls._GRAMMAR
+
+		return inst
+
+	@classmethod
+	def _compile_grammar(cls):
 		patterns = []
 		actions = {}
 
@@ -57,22 +66,20 @@ class Scanner(object):
 
 						break
 
-		inst._REGEX   = re.compile("|".join(patterns), re.MULTILINE)
-		inst._ACTIONS = actions
-
-		return inst
+		return re.compile("|".join(patterns), re.MULTILINE), actions
 
 	def __init__(self, *args, **opts):
 		pass
 
 	def parse(self, text):
+		actions = self._ACTIONS
 		for match in self._REGEX.finditer(text):
-			for name, image in list(match.groupdict().items()):
-				if image is None:
-					continue
-				token = self._ACTIONS[name].__call__(self, image)
-				if token is not None:
-					yield (name, token)
+			# each pattern is wrapped in its named group, which is
+			# therefore the last group closed by the match
+			name = match.lastgroup
+			token = actions[name].__call__(self, match.group(name))
+			if token is not None:
+				yield (name, token)
 
 class TokenStream:
 	def __init__(self, scanner, text):
@@ -1,6 +1,6 @@
 # vim: ts=3:sw=3:expandtab
 
-from golem.util.config import Property
+from golem.util.config import Property, EXTENSIONS_CACHE_KEY
 from golem.util.path import golem_path
 
 
@@ -374,6 +374,21 @@ qgraf_bin = Property("qgraf.bin",
    str,
    "qgraf")
 
+qgraf_jobs = Property("qgraf.jobs",
+   """\
+   Maximum number of QGraf processes running at the same time.
+   Each run of QGraf (diagrams, topologies and drawings for the
+   tree-level, one-loop and counterterm part) uses its own
+   scratch directory, such that the runs are independent.
+
+   A value of 0 uses the number of available processors.
+
+   Example:
+   qgraf.jobs=1
+   runs QGraf sequentially.
+   """,
+   int, 0)
+
 form_bin = Property("form.bin",
    """\
    Points to the Form executable.
@@ -436,6 +451,32 @@ form_tmp = Property("form.tempdir",
    str,
    "/tmp")
 
+cache_dir = Property("cache.dir",
+   """\
+   Directory in which GoSam keeps results between runs, such as
+   the output of QGraf. If left blank, the directory
+   $XDG_CACHE_HOME/gosam (or ~/.cache/gosam) is used.
+   The value 'none' disables the cache.
+
+   Examples:
+   cache.dir=/scratch/gosam-cache
+   cache.dir=none
+   """,
+   str,
+   "")
+
+cache_size = Property("cache.size",
+   """\
+   Maximum size (in megabytes) of each cache in cache.dir.
+   If the size is exceeded, the least recently used entries
+   are removed.
+
+   Example:
+   cache.size=2000
+   """,
+   int,
+   500)
+
 template_path = Property("templates",
    """\
    Path pointing to the directory containing the template
@@ -447,6 +488,21 @@ template_path = Property("templates",
    str,
    "")
 
+template_jobs = Property("templates.jobs",
+   """\
+   Number of processes which render the files listed in
+   'template.xml'. The files are written in parallel after all of
+   them have been planned, so a file must not depend on the
+   content of another file generated in the same pass. Parallel
+   rendering requires an operating system which supports fork().
+
+   A value of 0 uses the number of available processors.
+
+   Example:
+   templates.jobs=4
+   """,
+   int, 1)
+
 group_diagrams = Property("group",
    """\
    Flag whether or not the tree-level diagrams should be grouped
@@ -724,13 +780,31 @@ filter_module = Property("filter.module",
    """,
    str,"")
 
+filter_jobs = Property("filter.jobs",
+   """\
+   Number of processes which apply the filters (see filter.lo,
+   filter.nlo) and analyze the diagrams. The diagrams are
+   distributed in chunks; the results are merged in the order of
+   the diagrams, such that the outcome does not depend on this
+   setting. Parallel analysis requires an operating system which
+   supports fork().
+
+   A value of 0 uses the number of available processors.
+
+   Example:
+   filter.jobs=4
+   """,
+   int, 1)
+
 debug_flags = Property("debug",
    """\
    A list of debug flags.
    Currently, the words 'lo', 'nlo' and 'all' are supported.
+   The word 'topolopy' enables additional (slow) consistency
+   checks during the analysis of the loop topologies.
    """,
    list,
-   options=["nlo", "lo", "numpolvec", "all"])
+   options=["nlo", "lo", "numpolvec", "all", "topolopy"])
 
 reference_vectors = Property("reference-vectors",
    """\
@@ -1199,6 +1273,7 @@ properties = [
    filter_lo_diagrams,
    filter_nlo_diagrams,
    filter_module,
+   filter_jobs,
 
    config_renorm_beta,
    config_renorm_mqwf,
@@ -1230,8 +1305,12 @@ properties = [
    abbrev_level,
 
    template_path,
+   template_jobs,
+   cache_dir,
+   cache_size,
 
    qgraf_bin,
+   qgraf_jobs,
    form_bin,
    form_threads,
    form_tmp,
@@ -1261,6 +1340,21 @@ properties = [
 REDUCTION_EXTENSIONS = ["samurai", "golem95", "ninja", "pjfry"]
 
 def getExtensions(conf):
+   return list(_cached_extensions(conf)[0])
+
+def getExtensionSet(conf):
+   """
+   Returns the extensions of conf as a frozenset of lower case names.
+   """
+   return _cached_extensions(conf)[1]
+
+def _cached_extensions(conf):
+   # The result is kept in conf.cache until a key ending
+   # in 'extensions' is changed (see Properties.setProperty).
+   cache = getattr(conf, "cache", None)
+   if cache is not None and EXTENSIONS_CACHE_KEY in cache:
+      return cache[EXTENSIONS_CACHE_KEY]
+
    ext_name = str(extensions)
    ext_set = []
 
@@ -1284,7 +1378,10 @@ def getExtensions(conf):
          if ext not in ext_set:
             ext_set.append(ext)
 
-   return list(ext_set)
+   result = (tuple(ext_set), frozenset(ext_set))
+   if cache is not None:
+      cache[EXTENSIONS_CACHE_KEY] = result
+   return result
 
 
 def setInternals(conf):
@@ -85,7 +85,8 @@ class TemplateFactory:
                      f_template)
                template.setup(loopcache, loopcache_tot, in_particles, out_particles,
                      tree_signs, conf, heavy_quarks, lo_flags, nlo_flags,
-                     massive_bubbles, diagram_sum, helicity_map)
+                     massive_bubbles, diagram_sum, helicity_map,
+                     context=kinematics_context(opts))
             elif class_name == "Integrals_doc":
                if "loopcache" not in opts \
                      or "in_particles" not in opts \
@@ -115,7 +116,8 @@ class TemplateFactory:
                      f_template)
                template.setup(loopcache, in_particles, out_particles,
                      tree_signs, conf, heavy_quarks, lo_flags, nlo_flags,
-                     massive_bubbles, helicity_map)
+                     massive_bubbles, helicity_map,
+                     context=kinematics_context(opts))
             elif class_name == "Kinematics":
                if "in_particles" not in opts or \
                      "out_particles" not in opts or \
@@ -136,7 +138,8 @@ class TemplateFactory:
                template = golem.templates.kinematics.KinematicsTemplate(
                      f_template)
                template.init_kinematics(conf, in_particles, out_particles,
-                     tree_signs, heavy_quarks, helicity_map)
+                     tree_signs, heavy_quarks, helicity_map,
+                     context=kinematics_context(opts))
             elif class_name == "OLP":
                if "contract" not in opts or \
                      "subprocesses" not in opts or \
@@ -183,6 +186,18 @@ class TemplateFactory:
             error("While processing '%s': %s" % (in_file, ex))
 
 
+def kinematics_context(opts):
+   """
+   Returns the KinematicsContext shared by all templates which are
+   processed with the same options. It is created on first use.
+   """
+   context = opts.get("kinematics_context")
+   if context is None:
+      context = golem.templates.kinematics.KinematicsContext(
+            opts["conf"], opts["in_particles"], opts["out_particles"])
+      opts["kinematics_context"] = context
+   return context
+
 def set_executable_bit_if_needed(out_file,executable):
    if executable:
       umask=os.umask(0)
@@ -10,9 +10,10 @@ import golem.util.tools
 class IntegralsTemplate_doc(golem.templates.kinematics.KinematicsTemplate):
 
 	def setup(self, loopcache, in_particles, out_particles, tree_signs,
-			conf, heavy_quarks, lo_flags, nlo_flags, massive_bubbles, helicity_map):
+			conf, heavy_quarks, lo_flags, nlo_flags, massive_bubbles, helicity_map,
+			context=None):
 		self.init_kinematics(conf, in_particles, out_particles,
-				tree_signs, heavy_quarks, helicity_map)
+				tree_signs, heavy_quarks, helicity_map, context)
 		self._loopcache = loopcache
 		self._partitions = loopcache.partition()
 		self._roots = sorted(self._partitions.keys())
@@ -8,79 +8,58 @@ from golem.util.config import Properties, split_qgrafPower
 import golem.util.parser
 from golem.model import MODEL_OPTIONS
 
-class KinematicsTemplate(golem.util.parser.Template):
-   """
-   Implements a template that has knowledge about the
-   kinematics of the process, especially, massive and
-   light-like vectors and Mandelstam variables.
+class KinematicsContext:
    """
+   The part of the state of a KinematicsTemplate which only depends
+   on the configuration and on the external particles.
 
-   def init_kinematics(self, conf, in_particles, out_particles,
-         tree_signs, heavy_quarks, helicity_map):
-      self._mandel_stack = []
+   All templates created by one call of transform_templates share
+   one instance, such that the reference vectors and the enumeration
+   of the helicities are computed once. The attributes must not be
+   modified.
+   """
+   def __init__(self, conf, in_particles, out_particles):
       zeroes = golem.util.tools.getZeroes(conf)
-      self._zeroes = zeroes
-      ones = golem.util.tools.getOnes(conf)
-      self._ones = ones
-
-      self._model = golem.util.tools.getModel(conf)
-      self._modeltype =  conf.getProperty("modeltype")
-      if not self._modeltype:
-         self._modeltype = conf.getProperty("model")
+      self.zeroes = zeroes
+      self.ones = golem.util.tools.getOnes(conf)
 
+      self.model = golem.util.tools.getModel(conf)
+      self.modeltype =  conf.getProperty("modeltype")
+      if not self.modeltype:
+         self.modeltype = conf.getProperty("model")
 
       props = Properties()
       props["order"] = conf[golem.properties.qgraf_power]
-      props.setProperty("modeltype", self._modeltype)
+      props.setProperty("modeltype", self.modeltype)
 
       num_in   = len(in_particles)
       num_out  = len(out_particles)
       num_legs = num_in + num_out
 
-      self._num_in = num_in
-      self._num_out = num_out
-      self._num_legs = num_legs
-
-      self._helicity_map = helicity_map
-      self._heavy_quarks = heavy_quarks
-      self._complex_masses = conf["complex_masses"]
-      self._ehc=conf["ehc"]
-      self._yukawa=conf["yukawa"]
+      self.num_in = num_in
+      self.num_out = num_out
+      self.num_legs = num_legs
 
-      self._references = golem.algorithms.helicity.reference_vectors(
+      self.references = golem.algorithms.helicity.reference_vectors(
             conf, in_particles, out_particles)
 
-      self._masses = []
-      self._lightlike = []
-      self._twospin = []
-      self._spin = []
-      self._color = []
-      self._acolor = []
-      self._helicities = []
-      self._latex = []
-      self._helicity_stack = []
-      self._mapping_stack = []
-      self._color_stack = []
-      self._cs_stack = []
-      self._cs_line_stack = []
-      self._cs_trace_stack = []
-      self._field_info = []
-      self._tree_signs = tree_signs
-      # self._tree_flows = tree_flows
-      self._crossings = []
-      self._charge = []
-
-      self._msubs_stack = []
-      
-
-      self._listed_flags=set()
-      self._listed_flags_length=0
+      self.masses = []
+      self.lightlike = []
+      self.twospin = []
+      self.spin = []
+      self.color = []
+      self.acolor = []
+      self.helicities = []
+      self.latex = []
+      self.field_info = []
+      self.crossings = []
+      self.charge = []
 
       for i, crossing in enumerate(
             conf.getProperty(golem.properties.crossings)):
          if ":" in crossing:
             pos = crossing.index(":")
-            self._crossings.append(crossing[:pos].strip())
+            self.crossings.append(crossing[:pos].strip())
             
       def get_qed_sign(pdg,sign):
          if (pdg>0 and pdg<20 and sign >0) or (pdg<0 and pdg>-20 and sign<0):
@@ -104,45 +83,45 @@ class KinematicsTemplate(golem.util.parser.Template):
          latex   = p.getLaTeXName()
          charge  = p.getCharge()
         
-         self._masses.append(mass)
-         self._latex.append(latex)
+         self.masses.append(mass)
+         self.latex.append(latex)
          
          qed_sign=get_qed_sign(p.getPDGCode(),sign)
-         self._charge.append(qed_sign*charge)
+         self.charge.append(qed_sign*charge)
          #if p.getPDGCode() > 0:
 	   #if p.getField().lower()=='u' or p.getField().lower()=='c' or p.getField().lower()=='t':
-             #self._charge.append(-charge*sign)
+             #self.charge.append(-charge*sign)
            #elif p.getField().lower()=='d' or p.getField().lower()=='s' or p.getField().lower()=='b':
-	     #self._charge.append(charge*sign)
+	     #self.charge.append(charge*sign)
 	   #elif p.getPDGCode()==24:
-	     #self._charge.append(-charge*sign)
+	     #self.charge.append(-charge*sign)
 	   #else:
-	     #self._charge.append(charge*sign)	     
+	     #self.charge.append(charge*sign)	     
          #else:
 	   #if p.getField().lower()=='ubar' or p.getField().lower()=='cbar' or p.getField().lower()=='tbar':
-             #self._charge.append(charge*sign)
+             #self.charge.append(charge*sign)
            #elif p.getField().lower()=='dbar' or p.getField().lower()=='sbar' or p.getField().lower()=='bbar':
-	     #self._charge.append(-charge*sign)
+	     #self.charge.append(-charge*sign)
 	   #elif p.getPDGCode()==-24:
-	     #self._charge.append(-charge*sign)
+	     #self.charge.append(-charge*sign)
 	   #else:
-	     #self._charge.append(-charge*sign)	 
+	     #self.charge.append(-charge*sign)	 
 	   
 
 
-         self._lightlike.append(not p.isMassive(zeroes))
+         self.lightlike.append(not p.isMassive(zeroes))
 
-         self._twospin.append(twospin)
+         self.twospin.append(twospin)
          if twospin % 2 == 0:
-            self._spin.append(str(twospin/2))
+            self.spin.append(str(twospin/2))
          else:
-            self._spin.append("%d/2" % twospin)
+            self.spin.append("%d/2" % twospin)
 
-         self._color.append(color)
-         self._acolor.append(acolor)
-         self._helicities.append(p.getHelicityStates(zeroes))
+         self.color.append(color)
+         self.acolor.append(acolor)
+         self.helicities.append(p.getHelicityStates(zeroes))
          field_info = (str(p), p.getPartner(), sign)
-         self._field_info.append(field_info)
+         self.field_info.append(field_info)
 
       ################# end examine_particle(p)
 
@@ -165,17 +144,17 @@ class KinematicsTemplate(golem.util.parser.Template):
       props.setProperty("num_out", num_out)
       props.setProperty("num_legs", num_legs)
       props.setProperty("num_helicities",
-            golem.util.tools.product(list(map(len,self._helicities))))
+            golem.util.tools.product(list(map(len,self.helicities))))
       props.setProperty("in_helicities",
-            golem.util.tools.product(list(map(len,self._helicities[:num_in]))))
+            golem.util.tools.product(list(map(len,self.helicities[:num_in]))))
       props.setProperty("symmetry_factor", symmetry_factor)
-      props.setProperty("charge", self._charge)
+      props.setProperty("charge", self.charge)
 
       # predict the number of colors:
       F = 0
       AF = 0
       G = 0
-      for color in self._color:
+      for color in self.color:
          if color == -3:
             AF += 1
          elif color == 3:
@@ -193,21 +172,80 @@ class KinematicsTemplate(golem.util.parser.Template):
          props.setProperty("num_colors",
             golem.algorithms.color.num_colors(F, G))
 
-      self._properties = props
-      self._mandel = \
+      self.properties = props
+      self.mandel = \
             golem.algorithms.mandelstam.mandelstam_calc(num_in, num_out)
-      self._mandel_parts = \
+      self.mandel_parts = \
             golem.algorithms.mandelstam.mandelstam_calc(num_in, num_out,
                   prefix="", infix=" ", suffix="")
 
-      helic = {}
-      for i in range(num_legs):
-         helic[i] = self._helicities[i]
+      self.helicity_comb = tuple(golem.util.tools.enumerate_helicities(conf))
 
-      self._helicity_comb = [h for h in
-            golem.util.tools.enumerate_helicities(conf)]
+      for name in ["masses", "lightlike", "twospin", "spin", "color",
+            "acolor", "helicities", "latex", "field_info", "crossings",
+            "charge"]:
+         setattr(self, name, tuple(getattr(self, name)))
+
+class KinematicsTemplate(golem.util.parser.Template):
+   """
+   Implements a template that has knowledge about the
+   kinematics of the process, especially, massive and
+   light-like vectors and Mandelstam variables.
+   """
+
+   def init_kinematics(self, conf, in_particles, out_particles,
+         tree_signs, heavy_quarks, helicity_map, context=None):
+      if context is None:
+         context = KinematicsContext(conf, in_particles, out_particles)
+
+      self._mandel_stack = []
+      self._zeroes = context.zeroes
+      self._ones = context.ones
+
+      self._model = context.model
+      self._modeltype = context.modeltype
+
+      self._num_in = context.num_in
+      self._num_out = context.num_out
+      self._num_legs = context.num_legs
 
       self._helicity_map = helicity_map
+      self._heavy_quarks = heavy_quarks
+      self._complex_masses = conf["complex_masses"]
+      self._ehc=conf["ehc"]
+      self._yukawa=conf["yukawa"]
+
+      self._references = context.references
+
+      self._masses = context.masses
+      self._lightlike = context.lightlike
+      self._twospin = context.twospin
+      self._spin = context.spin
+      self._color = context.color
+      self._acolor = context.acolor
+      self._helicities = context.helicities
+      self._latex = context.latex
+      self._helicity_stack = []
+      self._mapping_stack = []
+      self._color_stack = []
+      self._cs_stack = []
+      self._cs_line_stack = []
+      self._cs_trace_stack = []
+      self._field_info = context.field_info
+      self._tree_signs = tree_signs
+      # self._tree_flows = tree_flows
+      self._crossings = context.crossings
+      self._charge = context.charge
+
+      self._msubs_stack = []
+
+      self._listed_flags=set()
+      self._listed_flags_length=0
+
+      self._properties = context.properties
+      self._mandel = context.mandel
+      self._mandel_parts = context.mandel_parts
+      self._helicity_comb = context.helicity_comb
 
    def crossed_color(self, *args, **opts):
       cri = [prop.getIntegerProperty("$_") for prop in self.crossing()]
@@ -1,13 +1,171 @@
 # vim: ts=3:sw=3
 
 import io
+import os
+import pickle
+import tempfile
 from golem.util.config import Properties
 from golem.util.parser import Template
+import golem.installation
+import golem.util.cache
 import golem.util.tools
 import golem.model.expressions as ex
 from golem.model.feynrules import cmath_functions, shortcut_functions, \
 		unprefixed_symbols, sym_cmath, sym_cmplx, i_
 
+# The file next to model.py which keeps the compiled functions.
+COMPILED_FUNCTIONS_FILE = "model.functions"
+
+# The compiled functions of all models used in this run,
+# keyed by compiled_functions_key().
+_COMPILED_FUNCTIONS = {}
+
+class CompiledFunctions:
+	"""
+	The functions of a model compiled into expression trees,
+	brought into an order in which they can be computed and
+	rendered as strings.
+
+	PARAMETER
+
+	model_mod -- the model module
+	fortran -- if True the functions are rendered as Fortran
+	           expressions and floating point numbers are replaced
+	           by symbols (see floats).
+	"""
+	def __init__(self, model_mod, fortran=False):
+		nfunctions = len(model_mod.functions)
+
+		golem.util.tools.message("Compiling functions ...")
+		if fortran:
+			specials = {}
+			for expr in shortcut_functions:
+				specials[str(expr)] = expr
+			for expr in unprefixed_symbols:
+				specials[str(expr)] = expr
+			parser = golem.model.expressions.ExpressionParser(**specials)
+		else:
+			parser = golem.model.expressions.ExpressionParser()
+
+		functions = {}
+		fcounter = [0]
+		fsubs = {}
+		i = 0
+		for name, value in list(model_mod.functions.items()):
+			i += 1
+			if i % 100 == 0:
+				golem.util.tools.message("  (%5d/%5d)" % (i, nfunctions))
+			expr = parser.compile(value)
+			if fortran:
+				prefix = 'mdl'
+				for fn in cmath_functions:
+					expr = expr.algsubs(ex.DotExpression(sym_cmath, fn),
+							ex.SpecialExpression(str(fn)))
+					expr = expr.replaceIntegerPowers(fn)
+				expr = expr.algsubs(sym_cmplx(
+					ex.IntegerExpression(0), ex.IntegerExpression(1)), i_)
+				expr = expr.replaceFloats(prefix + "float", fsubs, fcounter)
+			functions[name] = expr
+
+		golem.util.tools.message("Resolving dependencies between functions ...")
+		program = golem.model.expressions.resolve_dependencies(functions)
+		nlines = len(program)
+
+		expressions = []
+		for i, name in enumerate(program):
+			if i % 100 == 0:
+				golem.util.tools.message("   (%5d/%5d) lines" % (i, nlines))
+			ast = functions[name]
+			if fortran:
+				try:
+					expressions.append(ast.write_fortran())
+				except:
+					golem.util.tools.error(
+							"Could not set property in model file %s" % name)
+			else:
+				buf = io.StringIO()
+				try:
+					ast.write(buf)
+					expressions.append(buf.getvalue())
+				finally:
+					buf.close()
+
+		self.asts = functions
+		self.program = program
+		self.expressions = expressions
+		self.floats = fsubs
+
+	def __getstate__(self):
+		# The expression trees are not stored.
+		state = self.__dict__.copy()
+		state["asts"] = None
+		return state
+
+def compiled_functions_key(model_mod, fortran):
+	"""
+	Returns a key which identifies the compiled functions of a model
+	module. It is computed from the functions themselves rather than
+	from the model file, because the model file builds them when it
+	is imported, depending on the properties model.options and one.
+	"""
+	parts = []
+	for name, value in sorted(model_mod.functions.items()):
+		parts.append(name)
+		parts.append(str(value))
+	return golem.util.cache.make_key("functions",
+			".".join(map(str, golem.installation.GOLEM_VERSION)),
+			str(golem.installation.GOLEM_REVISION),
+			"fortran" if fortran else "plain",
+			ex.ExpressionParser.simple.__name__,
+			*parts)
+
+def compiled_functions(model_mod, fortran=False, save=True):
+	"""
+	Returns the CompiledFunctions of a model module.
+
+	They are built at most once per run for the same functions.
+	If save is True and the module has a source file they are also
+	read from and written to the file COMPILED_FUNCTIONS_FILE next
+	to the model file.
+	"""
+	key = compiled_functions_key(model_mod, fortran)
+	if key in _COMPILED_FUNCTIONS:
+		return _COMPILED_FUNCTIONS[key]
+
+	model_file = getattr(model_mod, "__file__", None)
+	if model_file is None or not os.path.isfile(model_file):
+		save = False
+
+	stored = {}
+	if save:
+		fname = os.path.join(os.path.dirname(model_file),
+				COMPILED_FUNCTIONS_FILE)
+		if os.path.exists(fname):
+			try:
+				with open(fname, "rb") as f:
+					stored = pickle.load(f)
+			except Exception as ex_load:
+				golem.util.tools.debug("Ignoring %s: %s" % (fname, ex_load))
+				stored = {}
+
+	if key in stored:
+		result = stored[key]
+	else:
+		result = CompiledFunctions(model_mod, fortran)
+		if save:
+			stored[key] = result
+			try:
+				handle, tmp_name = tempfile.mkstemp(
+						dir=os.path.dirname(fname), prefix=".tmp-functions-")
+				with os.fdopen(handle, "wb") as f:
+					pickle.dump(stored, f, pickle.HIGHEST_PROTOCOL)
+				os.replace(tmp_name, fname)
+			except OSError as ex_save:
+				golem.util.tools.warning("Cannot write %s: %s" % (fname, ex_save))
+
+	_COMPILED_FUNCTIONS[key] = result
+	return result
+
 class ModelTemplate(Template):
 	"""
 	Implements a template that knows the particle content
@@ -34,8 +192,8 @@ class ModelTemplate(Template):
 		self._parameters = {}
 		self._functions = {}
 		name_length = 0
-		self._floats = {}
-		self._functions_fortran = {}
+		self._save_functions = \
+				golem.util.cache.get_cache(conf, "models") is not None
 		
 		for name, value in list(self._mod.parameters.items()):
 			t = self._mod.types[name]
@@ -151,45 +309,18 @@ class ModelTemplate(Template):
 		first_name = self._setup_name("first", "is_first", opts)
 		last_name = self._setup_name("last", "is_last", opts)
 		
-		model_mod = self._mod
-	
-		nfunctions = len(model_mod.functions)
-
-		golem.util.tools.message("Compiling functions ...")
-
-
-		parser = golem.model.expressions.ExpressionParser()
-		functions = {}
-		i = 0
-		for name, value in list(model_mod.functions.items()):
-			i += 1
-			if i % 100 == 0:
-				golem.util.tools.message("  (%5d/%5d)" % (i, nfunctions))
-			expr = parser.compile(value)
-			functions[name] = expr
-	
-		golem.util.tools.message("Resolving dependencies between functions ...")
-		program = golem.model.expressions.resolve_dependencies(functions)
+		compiled = compiled_functions(self._mod, False, self._save_functions)
+		lines = list(zip(compiled.program, compiled.expressions))
 
-		nlines = len(program)
+		nlines = len(lines)
 
 		props = Properties()
-		for i, name in enumerate(program):
-			if i % 100 == 0:
-				golem.util.tools.message("   (%5d/%5d) lines" % (i, nlines))
-
-			ast = functions[name]
-			buf = io.StringIO()
-			try:
-				ast.write(buf)
-
-				props.setProperty(name_name, name)
-				props.setProperty(expression_name, buf.getvalue())
-				props.setProperty(index_name, i)
-				props.setProperty(first_name, i == 0)
-				props.setProperty(last_name, i == nlines - 1)
-			finally:
-				buf.close()
+		for i, (name, expression) in enumerate(lines):
+			props.setProperty(name_name, name)
+			props.setProperty(expression_name, expression)
+			props.setProperty(index_name, i)
+			props.setProperty(first_name, i == 0)
+			props.setProperty(last_name, i == nlines - 1)
 			yield props
 
 	def functions_resolved_reversed(self, *args, **opts):
@@ -199,47 +330,20 @@ class ModelTemplate(Template):
 		first_name = self._setup_name("first", "is_first", opts)
 		last_name = self._setup_name("last", "is_last", opts)
 		
-		model_mod = self._mod
-	
-		nfunctions = len(model_mod.functions)
-
-		golem.util.tools.message("Compiling functions ...")
-
-
-		parser = golem.model.expressions.ExpressionParser()
-		functions = {}
-		i = 0
-		for name, value in list(model_mod.functions.items()):
-			i += 1
-			if i % 100 == 0:
-				golem.util.tools.message("  (%5d/%5d)" % (i, nfunctions))
-			expr = parser.compile(value)
-			functions[name] = expr
-	
-		golem.util.tools.message("Resolving dependencies between functions ...")
-		program = golem.model.expressions.resolve_dependencies(functions)
+		compiled = compiled_functions(self._mod, False, self._save_functions)
+		lines = list(zip(compiled.program, compiled.expressions))
 		# the only difference
-		program.reverse()
+		lines.reverse()
 
-		nlines = len(program)
+		nlines = len(lines)
 
 		props = Properties()
-		for i, name in enumerate(program):
-			if i % 100 == 0:
-				golem.util.tools.message("   (%5d/%5d) lines" % (i, nlines))
-
-			ast = functions[name]
-			buf = io.StringIO()
-			try:
-				ast.write(buf)
-
-				props.setProperty(name_name, name)
-				props.setProperty(expression_name, buf.getvalue())
-				props.setProperty(index_name, i)
-				props.setProperty(first_name, i == 0)
-				props.setProperty(last_name, i == nlines - 1)
-			finally:
-				buf.close()
+		for i, (name, expression) in enumerate(lines):
+			props.setProperty(name_name, name)
+			props.setProperty(expression_name, expression)
+			props.setProperty(index_name, i)
+			props.setProperty(first_name, i == 0)
+			props.setProperty(last_name, i == nlines - 1)
 			yield props
 		
 	def has_slha_locations(self, *args, **opts):
@@ -514,75 +618,23 @@ class ModelTemplate(Template):
 		expression_name  = self._setup_name("expression", "expression", opts)
 		first_name = self._setup_name("first", "is_first", opts)
 		last_name = self._setup_name("last", "is_last", opts)
-		model_mod = self._mod
-	
-		nfunctions = len(model_mod.functions)
-
-		golem.util.tools.message("Compiling functions ...")
-		process_functions=False
-		if self._functions_fortran == {}:
-			process_functions=True
-		if process_functions:
-			specials={}
-			for expr in shortcut_functions:
-				specials[str(expr)] = expr
-			for expr in unprefixed_symbols:
-				specials[str(expr)] = expr
-			parser = golem.model.expressions.ExpressionParser(**specials)
-			functions = {}
-			fcounter=[0]
-			fsubs={}
-			i = 0
-			tmp=open('tmp','w')
-
-			for name, value in list(model_mod.functions.items()):
-				i += 1
-				if i % 100 == 0:
-					golem.util.tools.message("  (%5d/%5d)" % (i, nfunctions))
-				expr = parser.compile(value)
-				prefix='mdl'
-				for fn in cmath_functions:
-					expr = expr.algsubs(ex.DotExpression(sym_cmath, fn),
-							ex.SpecialExpression(str(fn)))
-					expr = expr.replaceIntegerPowers(fn)
-				expr = expr.algsubs(sym_cmplx(
-					ex.IntegerExpression(0), ex.IntegerExpression(1)), i_)
-				expr = expr.replaceFloats(prefix + "float", fsubs, fcounter)
-				functions[name] = expr
-			self._functions_fortran = functions
-			self._floats = fsubs
-		else:
-			functions = self._functions_fortran
-
-		golem.util.tools.message("Resolving dependencies between functions ...")
-		program = golem.model.expressions.resolve_dependencies(functions)
-		nlines = len(program)
+		compiled = compiled_functions(self._mod, True, self._save_functions)
+		nlines = len(compiled.program)
 
 		props = Properties()
-		for i, name in enumerate(program):
-			if i % 100 == 0:
-				golem.util.tools.message("   (%5d/%5d) lines" % (i, nlines))
-
-			ast = functions[name]
-			buf =""
-			try:
-				buf += ast.write_fortran()
-
-				props.setProperty(name_name, name)
-				props.setProperty(expression_name, buf)
-				props.setProperty(index_name, i)
-				props.setProperty(first_name, i == 0)
-				props.setProperty(last_name, i == nlines - 1)
-			except:
-				golem.util.tools.error("Could not set property in model file %s" % name)
+		for i, name in enumerate(compiled.program):
+			props.setProperty(name_name, name)
+			props.setProperty(expression_name, compiled.expressions[i])
+			props.setProperty(index_name, i)
+			props.setProperty(first_name, i == 0)
+			props.setProperty(last_name, i == nlines - 1)
 			yield props
 
 	def floats(self, *args, **opts):
-		if self._floats == {}:
-			list(self.functions_resolved_fortran(args,opts))
 		float_name = self._setup_name("float", "$_", opts)
 		value_name = self._setup_name("value", "value", opts)
-		local_floats = self._floats
+		local_floats = compiled_functions(self._mod, True,
+				self._save_functions).floats
 		props = Properties()
 		for name in local_floats:
 			try:
@@ -1,13 +1,20 @@
 # vim: ts=3:sw=3:expandtab
 
 import xml.parsers.expat
+import os
 import os.path
 import sys
+import time
 import tempfile
+import multiprocessing
+import concurrent.futures
 
 import golem.util.main_misc
 import golem.util.config
+import golem.util.cache
+import golem.util.parser
 
+import golem.properties
 import golem.templates.filter
 import golem.templates.factory
 
@@ -43,6 +50,18 @@ def compare_version(version1, version2):
 class TemplateXMLError(Exception):
    pass
 
+# The jobs of _TemplateState.render_pending, inherited by the forked
+# workers. The template classes hold unpicklable objects (e.g. the model).
+_RENDER_STATE = None
+
+def _render_job(index):
+   factory, jobs, opts = _RENDER_STATE
+   in_file, out_file, class_name, props, filter, executable = jobs[index]
+   start = time.time()
+   factory.process(in_file, out_file, class_name,
+         props, opts, opts, filter=filter, executable=executable)
+   return time.time() - start
+
 class _TemplateState:
    def __init__(self, template_dir, output_dir, *props, **opts):
       self.props = list(props)
@@ -56,10 +75,11 @@ class _TemplateState:
          if lst is not None:
             ext.extend([x.lower() for x in lst])
 
-      self.extensions = ext
+      self.extensions = frozenset(ext)
+      self.internals = None
 
       self.stack = [[{}]]
-      self.produced_files = []
+      self.produced_files = set()
 
       self.template_dir = template_dir
       self.output_dir = output_dir
@@ -67,8 +87,29 @@ class _TemplateState:
       self.cbuffer = None
       self.factory = golem.templates.factory.TemplateFactory()
 
+      # in order of creation, see end_template
       self.created_directories = []
 
+      # output file -> seconds spent rendering it
+      self.timings = {}
+      self.render_time = 0.0
+      self.render_wall_time = 0.0
+      self.start_time = time.time()
+
+      self.jobs = 1
+      if "conf" in opts:
+         self.jobs = opts["conf"].getProperty(golem.properties.template_jobs)
+         if self.jobs is None or self.jobs <= 0:
+            self.jobs = os.cpu_count() or 1
+      if self.jobs > 1:
+         if "fork" not in multiprocessing.get_all_start_methods():
+            warning("templates.jobs=%d ignored: fork() is not supported."
+                  % self.jobs)
+            self.jobs = 1
+         elif multiprocessing.current_process().daemon:
+            self.jobs = 1
+      self.pending = []
+
    def setMode(self, mode):
       self._mode = mode
 
@@ -79,6 +120,21 @@ class _TemplateState:
             result=conf.getProperty(name)
       return result
 
+   def _active_internals(self):
+      """
+      Returns the set of names in __INTERNALS__ which are set to true.
+      """
+      if self.internals is None:
+         internals = self._getproperty("__INTERNALS__")
+         active = set()
+         if internals:
+            for name in internals.split(","):
+               name = name.strip()
+               if str(self._getproperty(name)).lower() == 'true':
+                  active.add(name)
+         self.internals = frozenset(active)
+      return self.internals
+
    def shuffle_push(self, lst):
       top = self.stack[-1]
       product = []
@@ -119,10 +175,73 @@ class _TemplateState:
          warning("File %r has been overwritten while processing %r" % \
                (out_file, in_file))
       else:
-         self.produced_files.append(out_file)
+         self.produced_files.add(out_file)
 
-      self.factory.process(in_file, out_file, class_name,
-            self.props, self.opts, self.opts, filter=filter, executable=executable)
+      if self.jobs > 1:
+         self.pending.append( (in_file, out_file, class_name,
+               list(self.props), filter, executable) )
+      else:
+         start = time.time()
+         self.factory.process(in_file, out_file, class_name,
+               self.props, self.opts, self.opts, filter=filter, executable=executable)
+         seconds = time.time() - start
+         self.add_timing(out_file, seconds)
+         self.render_wall_time += seconds
+
+   def add_timing(self, out_file, seconds):
+      self.timings[out_file] = self.timings.get(out_file, 0.0) + seconds
+      self.render_time += seconds
+
+   def report_timings(self):
+      """
+      Writes the time spent rendering each file and the time spent
+      in processing template.xml itself to the debug output.
+      """
+      total = time.time() - self.start_time
+      lines = ["Rendering times of the templates:"]
+      for out_file, seconds in sorted(self.timings.items(),
+            key=lambda item: -item[1]):
+         lines.append("   %8.3fs %s" % (seconds,
+            os.path.relpath(out_file, self.output_dir)))
+      lines.append("%d files rendered in %.3fs (sum over all processes)"
+            % (len(self.timings), self.render_time))
+      lines.append("template.xml processed in %.3fs, %.3fs of which were "
+            "spent outside of rendering"
+            % (total, max(total - self.render_wall_time, 0.0)))
+      debug(*lines)
+
+   def render_pending(self):
+      """
+      Renders all files which have been collected by
+      transform_template_file in a pool of forked processes.
+      """
+      global _RENDER_STATE
+
+      jobs = self.pending
+      if len(jobs) == 0:
+         return
+      self.pending = []
+
+      # Create the shared state before forking, such that it is
+      # computed once instead of once per worker.
+      if any(job[2] in ["Kinematics", "Integrals", "Integrals_doc"]
+            for job in jobs) and all(name in self.opts
+            for name in ["conf", "in_particles", "out_particles"]):
+         golem.templates.factory.kinematics_context(self.opts)
+
+      debug("Rendering %d files in %d processes" % (len(jobs), self.jobs))
+      _RENDER_STATE = (self.factory, jobs, self.opts)
+      start = time.time()
+      try:
+         with concurrent.futures.ProcessPoolExecutor(
+               max_workers=min(self.jobs, len(jobs)),
+               mp_context=multiprocessing.get_context("fork")) as pool:
+            for job, seconds in zip(jobs,
+                  pool.map(_render_job, range(len(jobs)))):
+               self.add_timing(job[1], seconds)
+      finally:
+         _RENDER_STATE = None
+         self.render_wall_time += time.time() - start
 
    def start_template(self, attrs):
       for name in ["description", "version",
@@ -155,6 +274,9 @@ class _TemplateState:
          entry["output-directory"] = self.output_dir
 
    def end_template(self):
+      self.render_pending()
+      self.report_timings()
+
       # delete empty directories
       for directory in self.created_directories:
          self.delete_dir_if_empty(directory)
@@ -349,6 +471,7 @@ class _TemplateState:
          out_file = os.path.join(out_dir, env["output file name"])
 
          if value == "exists":
+            self.render_pending()
             return os.path.exists(out_file)
          elif value == "generated":
             return out_file in self.produced_files
@@ -377,20 +500,11 @@ class _TemplateState:
                   "Unknown attributes encountered near 'if-extension'")
 
          if required == "all":
-            for ex in extensions:
-               if ex not in self.extensions:
-                  return False
-            return True
+            return self.extensions.issuperset(extensions)
          elif required == "some":
-            for ex in extensions:
-               if ex in self.extensions:
-                  return True
-            return False
+            return not self.extensions.isdisjoint(extensions)
          elif required == "none":
-            for ex in extensions:
-               if ex in self.extensions:
-                  return False
-            return True
+            return self.extensions.isdisjoint(extensions)
          else:
             raise TemplateXMLError(
                   "Unknown value %r for attribute 'required' " % required +
@@ -432,7 +546,7 @@ class _TemplateState:
          tmpinternals = attrs["if-internal"].split(",")
          tmpinternals = [ "__%s__" % (i.upper()) for i in tmpinternals ]
 
-         internals = self._getproperty("__INTERNALS__")
+         internals = self._active_internals()
 
          if "required" in attrs:
             required = attrs["required"]
@@ -450,20 +564,11 @@ class _TemplateState:
                   "Unknown attributes encountered near 'if-extension'")
 
          if required == "all":
-            for i in tmpinternals:
-               if i not in internals or str(self._getproperty(i)).lower() != 'true':
-                  return False
-            return True
+            return internals.issuperset(tmpinternals)
          elif required == "some":
-            for ex in extensions:
-               if i in internals and str(self._getproperty(i)).lower() == 'true':
-                  return True
-            return False
+            return not internals.isdisjoint(tmpinternals)
          elif required == "none":
-            for i in tmpinternals:
-               if i in internals and str(self._getproperty(i)).lower() == 'true':
-                  return False
-            return True
+            return internals.isdisjoint(tmpinternals)
          else:
             raise TemplateXMLError(
                   "Unknown value %r for attribute 'required' " % required +
@@ -665,6 +770,10 @@ def transform_templates(file_name, output_path, *props, **opts):
    else:
       toks = os.path.split(abs_filename)
 
+   if "conf" in opts:
+      golem.util.parser.set_template_cache(
+            golem.util.cache.get_cache(opts["conf"], "templates"))
+
    try:
       xmlp = create_parser(toks[0], abs_outputpath, *props, **opts)
       with open(os.path.join(*toks), 'r') as xmlf:
@@ -1,7 +1,9 @@
 # vim: ts=3:sw=3:expandtab
 
 import imp
+import os
 import os.path
+import multiprocessing
 
 import golem.properties
 
@@ -96,26 +98,25 @@ def setup_filter(prop, conf, model):
 
 def analyze_tree_diagrams(diagrams, model, conf, filter_flags = None):
    zero = golem.util.tools.getZeroes(conf)
-   lst = setup_list(golem.properties.select_lo_diagrams, conf)
+   lst = set(setup_list(golem.properties.select_lo_diagrams, conf))
    fltr = setup_filter(golem.properties.filter_lo_diagrams, conf, model)
    keep = []
    lose = []
    signs = {}
    # flows = {}
 
-   for idx, diagram in list(diagrams.items()):
-      if lst:
-         if idx not in lst:
-            lose.append(idx)
-            continue
+   indices = select_indices(diagrams, lst, lose)
+   results = map_diagrams(_analyze_tree_diagram, diagrams, indices,
+         (zero, fltr), conf)
 
-      if diagram.EHCfound():
+   for idx, (diagram, ehc, yukawa, passed, sign) in zip(indices, results):
+      if ehc:
          conf["ehc"]=True
 
-      if diagram.YUKAWAfound():
+      if yukawa:
          conf["yukawa"]=True
 
-      if analyze_diagram(diagram, zero, fltr):
+      if passed:
          keep.append(idx)
 
          if filter_flags is not None:
@@ -127,7 +128,7 @@ def analyze_tree_diagrams(diagrams, model, conf, filter_flags = None):
       else:
          lose.append(idx)
 
-      signs[idx] = diagram.sign()
+      signs[idx] = sign
    #   flows[idx] = diagram.fermion_flow()
 
    debug("After analyzing tree diagrams: keeping %d, purging %d" % 
@@ -137,7 +138,7 @@ def analyze_tree_diagrams(diagrams, model, conf, filter_flags = None):
 def analyze_loop_diagrams(diagrams, model, conf, onshell,
       quark_masses = None, complex_masses=None, filter_flags = None, massive_bubbles = {}):
    zero = golem.util.tools.getZeroes(conf)
-   lst = setup_list(golem.properties.select_nlo_diagrams, conf)
+   lst = set(setup_list(golem.properties.select_nlo_diagrams, conf))
    fltr = setup_filter(golem.properties.filter_nlo_diagrams, conf, model)
    keep = []
    keep_tot = []
@@ -147,34 +148,38 @@ def analyze_loop_diagrams(diagrams, model, conf, onshell,
    loopcache     = LoopCache()
    loopcache_tot = LoopCache()
 
-   for idx, diagram in list(diagrams.items()):
-      if lst:
-         if idx not in lst:
-            lose.append(idx)
-            continue
-      if analyze_diagram(diagram, zero, fltr):
+   indices = select_indices(diagrams, lst, lose)
+   results = map_diagrams(_analyze_loop_diagram, diagrams, indices,
+         (zero, fltr, quark_masses is not None, complex_masses is not None),
+         conf)
+
+   analyzed = {}
+   for idx, (diagram, passed, qms, cqms, accepted, bubbles, rk) in \
+         zip(indices, results):
+      analyzed[idx] = diagram
+      if passed:
          # check for massive quarks first. Even though the
          # diagram might fail the next test it contributes
          # to the renormalization of the gluon wave function.
          if quark_masses is not None:
-            for qm in diagram.QuarkBubbleMasses():
+            for qm in qms:
                if qm not in quark_masses:
                   quark_masses.append(qm)
          if complex_masses is not None:
-            for cqm in diagram.ComplexQuarkBubbleMasses():
+            for cqm in cqms:
                if cqm not in complex_masses:
                   complex_masses.append(cqm)
                if cqm=='0' and complex_masses[len(complex_masses)-1]!='0' and (len(complex_masses) % 2)==1:
                   complex_masses.append(cqm)
 
-         if diagram.onshell() > 0:
+         if not accepted:
             lose.append(idx)
          else:
             keep.append(idx)
             keep_tot.append(idx)
             loopcache_tot.add(diagram, idx)
 
-            diagram.isMassiveBubble(idx, massive_bubbles)
+            massive_bubbles.update(bubbles)
 
             if filter_flags is not None:
                for flag in diagram.filter_flags:
@@ -182,7 +187,6 @@ def analyze_loop_diagrams(diagrams, model, conf, onshell,
                      filter_flags[flag] = [idx]
                   else:
                      filter_flags[flag].append(idx)
-            rk = diagram.rank()
             if rk > max_rank:
                max_rank = rk
       else:
@@ -193,25 +197,23 @@ def analyze_loop_diagrams(diagrams, model, conf, onshell,
 
 #--- new start
 
-   props=[]
    eprops = {}
+
+   if conf.getProperty(golem.properties.sum_diagrams):
+      signatures = [
+            str(analyzed[idx].getLoopIntegral())+','+str(analyzed[idx].rank())
+            for idx in keep]
+      eprops = group_diagram_sums(keep, signatures)
+      summed = set()
+      for idx in keep:
+         if idx in eprops:
+            summed.update(eprops[idx])
+      lose.extend(idx for idx in keep if idx in summed)
+      keep = [idx for idx in keep if idx not in summed]
+
    for idx in keep:
-      props.append([idx,str(diagrams[idx].getLoopIntegral())+','+str(diagrams[idx].rank())])
-
-   if conf.getProperty(golem.properties.sum_diagrams):   
-      for i,item in props:
-         for j,jtem in props:
-            if item == jtem and j>i:
-               if j not in lose:
-                  lose.append(j)
-                  keep.remove(j)
-                  if i not in eprops:
-                     eprops[i]=[j]
-                  else:
-                     eprops[i].append(j)
-   for idx in keep:
-      loopcache.add(diagrams[idx], idx)
-      if idx not in list(eprops.keys()):
+      loopcache.add(analyzed[idx], idx)
+      if idx not in eprops:
          eprops[idx]=[idx]
       else:
          eprops[idx].append(idx)
@@ -224,10 +226,62 @@ def analyze_loop_diagrams(diagrams, model, conf, onshell,
 
    return keep, keep_tot, eprops, loopcache, loopcache_tot
 
+def group_diagram_sums(indices, signatures):
+   """
+   Groups diagrams with identical signatures (loop integral and rank)
+   such that they can be summed.
+
+   PARAMETER
+
+   indices -- list of diagram indices
+   signatures -- list of the corresponding signatures
+
+   RESULT
+
+   A dictionary {i: [j1, j2, ...]} which maps the diagram i which
+   represents a group to the other diagrams j1, j2, ... of that group.
+   Only groups with more than one diagram are contained.
+
+   The diagrams are bucketed by their signature, so the cost is linear
+   in the number of diagrams. Keys and values are ordered as they were
+   by the original pairwise comparison: a diagram absorbs all diagrams
+   with the same signature and a larger index which have not been
+   absorbed before, in the order of 'indices'.
+   """
+   buckets = {}
+   for idx, signature in zip(indices, signatures):
+      if signature in buckets:
+         buckets[signature].append(idx)
+      else:
+         buckets[signature] = [idx]
+
+   claims = {}
+   for bucket in buckets.values():
+      if len(bucket) < 2:
+         continue
+      if all(bucket[k] < bucket[k+1] for k in range(len(bucket)-1)):
+         claims[bucket[0]] = bucket[1:]
+      else:
+         absorbed = set()
+         for i in bucket:
+            for j in bucket:
+               if j > i and j not in absorbed:
+                  absorbed.add(j)
+                  if i not in claims:
+                     claims[i] = [j]
+                  else:
+                     claims[i].append(j)
+
+   result = {}
+   for idx in indices:
+      if idx in claims:
+         result[idx] = claims[idx]
+   return result
+
 def analyze_ct_diagrams(diagrams, model, conf, onshell,
       quark_masses = None, filter_flags = None, massive_bubbles = {}):
    zero = golem.util.tools.getZeroes(conf)
-   lst = setup_list(golem.properties.select_nlo_diagrams, conf)
+   lst = set(setup_list(golem.properties.select_nlo_diagrams, conf))
    fltr = setup_filter(golem.properties.filter_nlo_diagrams, conf, model)
    keep = []
    lose = []
@@ -235,27 +289,28 @@ def analyze_ct_diagrams(diagrams, model, conf, onshell,
 
    loopcache = LoopCache()
 
-   for idx, diagram in list(diagrams.items()):
-      if lst:
-         if idx not in lst:
-            lose.append(idx)
-            continue
-      if analyze_diagram(diagram, zero, fltr):
+   indices = select_indices(diagrams, lst, lose)
+   results = map_diagrams(_analyze_loop_diagram, diagrams, indices,
+         (zero, fltr, quark_masses is not None, False), conf)
+
+   for idx, (diagram, passed, qms, cqms, accepted, bubbles, rk) in \
+         zip(indices, results):
+      if passed:
          # check for massive quarks first. Even though the
          # diagram might fail the next test it contributes
          # to the renormalization of the gluon wave function.
          if quark_masses is not None:
-            for qm in diagram.QuarkBubbleMasses():
+            for qm in qms:
                if qm not in quark_masses:
                   quark_masses.append(qm)
 
-         if diagram.onshell() > 0:
+         if not accepted:
             lose.append(idx)
          else:
             keep.append(idx)
             loopcache.add(diagram, idx)
             
-            diagram.isMassiveBubble(idx, massive_bubbles)
+            massive_bubbles.update(bubbles)
 
             if filter_flags is not None:
                for flag in diagram.filter_flags:
@@ -263,7 +318,6 @@ def analyze_ct_diagrams(diagrams, model, conf, onshell,
                      filter_flags[flag] = [idx]
                   else:
                      filter_flags[flag].append(idx)
-            rk = diagram.rank()
             if rk > max_rank:
                max_rank = rk
       else:
@@ -276,6 +330,96 @@ def analyze_ct_diagrams(diagrams, model, conf, onshell,
    return keep, loopcache
 
 
+def select_indices(diagrams, lst, lose):
+   """
+   Returns the indices of all diagrams which are selected by 'lst'
+   (all diagrams if 'lst' is empty). The other indices are appended
+   to 'lose'. The diagrams themselves are not accessed.
+   """
+   indices = []
+   for idx in list(diagrams.keys()):
+      if lst:
+         if idx not in lst:
+            lose.append(idx)
+            continue
+      indices.append(idx)
+   return indices
+
+def _analyze_tree_diagram(diagram, idx, zero, fltr):
+   ehc = diagram.EHCfound()
+   yukawa = diagram.YUKAWAfound()
+   passed = analyze_diagram(diagram, zero, fltr)
+   return diagram, ehc, yukawa, passed, diagram.sign()
+
+def _analyze_loop_diagram(diagram, idx, zero, fltr, want_qms, want_cqms):
+   qms = []
+   cqms = []
+   bubbles = {}
+   rk = 0
+   accepted = False
+   passed = analyze_diagram(diagram, zero, fltr)
+   if passed:
+      if want_qms:
+         qms = list(diagram.QuarkBubbleMasses())
+      if want_cqms:
+         cqms = list(diagram.ComplexQuarkBubbleMasses())
+      accepted = not diagram.onshell() > 0
+      if accepted:
+         diagram.isMassiveBubble(idx, bubbles)
+         rk = diagram.rank()
+   return diagram, passed, qms, cqms, accepted, bubbles, rk
+
+# State of map_diagrams which is inherited by the forked workers.
+# Filters can be arbitrary callables (e.g. from filter.module) and
+# are therefore never pickled.
+_MAP_STATE = None
+
+def _map_chunk(chunk):
+   function, diagrams, args = _MAP_STATE
+   return [function(diagrams[idx], idx, *args) for idx in chunk]
+
+def map_diagrams(function, diagrams, indices, args, conf):
+   """
+   Computes function(diagrams[idx], idx, *args) for all indices and
+   returns the results in the order of 'indices'.
+
+   If the property 'filter.jobs' asks for more than one process,
+   the indices are distributed in chunks over a pool of forked
+   processes. In this case the results, including the diagrams,
+   are copies of the objects in the workers.
+   """
+   global _MAP_STATE
+
+   jobs = conf.getProperty(golem.properties.filter_jobs)
+   if jobs is None or jobs <= 0:
+      jobs = os.cpu_count() or 1
+   jobs = min(jobs, len(indices))
+
+   if jobs > 1:
+      if "fork" not in multiprocessing.get_all_start_methods():
+         warning("filter.jobs=%d ignored: fork() is not supported." % jobs)
+         jobs = 1
+      elif multiprocessing.current_process().daemon:
+         debug("Analyzing diagrams serially in a daemonic process.")
+         jobs = 1
+
+   if jobs <= 1:
+      return [function(diagrams[idx], idx, *args) for idx in indices]
+
+   chunk_size = max(1, len(indices) // (4 * jobs))
+   chunks = [indices[i:i+chunk_size]
+         for i in range(0, len(indices), chunk_size)]
+
+   debug("Analyzing %d diagrams in %d processes" % (len(indices), jobs))
+   _MAP_STATE = (function, diagrams, args)
+   try:
+      with multiprocessing.get_context("fork").Pool(jobs) as pool:
+         results = pool.map(_map_chunk, chunks)
+   finally:
+      _MAP_STATE = None
+
+   return [r for chunk in results for r in chunk]
+
 def analyze_diagram(diagram, zero, fltr):
    if diagram.colorforbidden():
       return False
@@ -10,6 +10,14 @@ from golem.util.tools import message, error, warning, debug
 
 LOOPMOMENTUM = "p1"
 
+# Set to True to verify the pre- and post-conditions of the
+# integral transformations in LoopIntegral and LoopCache (slow).
+CHECK_INVARIANTS = False
+
+# Maps LoopIntegral.signature() to (sign, index) of the transformation
+# which brings the loop integral into its canonical form.
+CANONICAL_CACHE = {}
+
 class Diagram:
    def __init__(self, *components):
       self._in_legs = {}
@@ -928,6 +936,9 @@ class Propagator(DiagramComponent):
    def __eq__(self, other):
       return self.__cmp__(other) == 0
 
+   def signature(self):
+      return (self.momentum.signature(), self.mass, self.width)
+
    def rmomentum(self):
       result = self.momentum.copy()
       result[LOOPMOMENTUM] = 0
@@ -1040,13 +1051,21 @@ class Leg(DiagramComponent):
 
 class LoopIntegral:
 
-   def __init__(self, loop_propagators, rank):
-      self._propagators = [p.copy() for p in loop_propagators]
+   def __init__(self, loop_propagators, rank, copy=True):
+      if copy:
+         self._propagators = [p.copy() for p in loop_propagators]
+      else:
+         # The propagators of a loop integral are never modified,
+         # hence they can be shared with the integral they come from.
+         self._propagators = list(loop_propagators)
       self._rank = rank
 
       self._sorted_propagators = self._propagators[:]
       self._sorted_propagators.sort()
 
+      self._signature = None
+      self._key = None
+
 
    def setRank(self, rk):
       self._rank = rk
@@ -1252,23 +1271,67 @@ class LoopIntegral:
    def getRank(self):
       return self._rank
 
+   def signature(self):
+      """
+      A hashable representation of the propagators in their
+      original order, together with the momentum conservation
+      relation. It determines the result of canonical().
+      """
+      if self._signature is None:
+         if len(self._propagators) > 0:
+            zero = tuple(sorted(
+               self._propagators[0].momentum.getZeroMomentum().items()))
+         else:
+            zero = ()
+         self._signature = (zero,
+               tuple(p.signature() for p in self._propagators))
+      return self._signature
+
+   def key(self):
+      """
+      A hashable representation which is equal for two loop
+      integrals if and only if they compare equal.
+      """
+      if self._key is None:
+         if len(self._propagators) == 1:
+            p = self._propagators[0]
+            self._key = ((((LOOPMOMENTUM, 1),), p.mass, p.width),)
+         else:
+            self._key = tuple(sorted(
+               p.signature() for p in self._propagators))
+      return self._key
+
    def canonical(self):
       """
       Return a pair (cli, ct), where
       cli is the canonical loop integral and
       ct is the transformation such that ct(self) == cli
+
+      The choice of the transformation only depends on the signature
+      of the loop integral and is memoized in CANONICAL_CACHE.
       """
-      ct = IntegralTransformation(self, 1, 0)
-      cli = self
+      sig = self.signature()
+      if sig in CANONICAL_CACHE:
+         sign, index = CANONICAL_CACHE[sig]
+         ct = IntegralTransformation(self, sign, index)
+         cli = ct(self)
+      else:
+         ct = IntegralTransformation(self, 1, 0)
+         cli = self
+         sign, index = 1, 0
 
-      for t in self.equivalence_transformations():
-         dprime = t(self)
+         for t in self.equivalence_transformations():
+            dprime = t(self)
 
-         if dprime <= cli:
-            cli = dprime
-            ct = t
-            
-      assert ct(self) == cli
+            if dprime <= cli:
+               cli = dprime
+               ct = t
+               sign, index = t.sign(), t.index()
+
+         CANONICAL_CACHE[sig] = (sign, index)
+
+      if CHECK_INVARIANTS:
+         assert ct(self) == cli
       return (cli, ct)
 
    def pinched(self, pinches):
@@ -1276,13 +1339,12 @@ class LoopIntegral:
       for i, p in enumerate(self._propagators):
          if i not in pinches:
             props.append(p)
-      return LoopIntegral(props, 0)
+      return LoopIntegral(props, 0, copy=False)
 
    def pinches(self):
       sel = [False] * self.size()
 
       while not all(sel):
-         props = []
          indices = []
          pinches = []
       
@@ -1294,12 +1356,11 @@ class LoopIntegral:
             sel[i] = new_val
 
             if new_val:
-               props.append(self._propagators[i])
                indices.append(i)
             else:
                pinches.append(i)
 
-         yield LoopIntegral(props, 0), indices, pinches
+         yield indices, pinches
 
    def __hash__(self):
       if len(self._propagators) == 1:
@@ -1365,7 +1426,7 @@ class LoopIntegral:
    def acceptIntegralTransformation(self, transform):
       props = [transform.transformPropagator(p)
             for p in self._propagators]
-      return LoopIntegral(props, self._rank)
+      return LoopIntegral(props, self._rank, copy=False)
 
 class BaseIntegralTransformation:
    def __init__(self, s, r):
@@ -1438,6 +1499,10 @@ class IntegralTransformation(BaseIntegralTransformation):
 
       BaseIntegralTransformation.__init__(self, sign,
             loopintegral.rvector(index))
+      self._index = index
+
+   def index(self):
+      return self._index
 
 class LoopCache:
    def __init__(self):
@@ -1474,30 +1539,41 @@ class LoopCache:
 
       roots = {}
 
-      # classify by loopsize
-      cli_by_size = [[] for i in range(self.maxloopsize + 1)]
+      # classify by loopsize; each entry maps LoopIntegral.key()
+      # to the canonical loop integral
+      cli_by_size = [{} for i in range(self.maxloopsize + 1)]
       for cli in list(self.topologies.keys()):
          ls = cli.size()
-         cli_by_size[ls].append(cli)
+         cli_by_size[ls][cli.key()] = cli
 
       # pinches maps each maximal diagram to a list of all its
       # (canonical) pinches which are in the process
       pinches = {}
+      # Different maximal topologies share most of their pinches.
+      # A pinch which has been looked at before is either assigned
+      # already or not part of the process, so it can be skipped.
+      seen = set()
       # go through the list of cli's from the largest to the smallest
       for ls in range(self.maxloopsize, 0, -1):
-         for cli in cli_by_size[ls]:
+         for cli in list(cli_by_size[ls].values()):
             cli_pinches = []
             cli_pinches.append( (cli, list(range(ls)), []) )
 
-            for pli, kept_indices, pinched_indices in cli.pinches():
-               pls = pli.size()
-               if pls == ls:
+            for kept_indices, pinched_indices in cli.pinches():
+               pls = len(kept_indices)
+               if pls == ls or len(cli_by_size[pls]) == 0:
+                  continue
+               pli = cli.pinched(pinched_indices)
+               if pli.key() in seen:
                   continue
+               seen.add(pli.key())
+
                cpli, tmp = pli.canonical()
-               if cpli in cli_by_size[pls]:
-                  assert cpli in self.topologies
+               if cpli.key() in cli_by_size[pls]:
+                  cpli = cli_by_size[pls].pop(cpli.key())
+                  if CHECK_INVARIANTS:
+                     assert cpli in self.topologies
                   cli_pinches.append( (cpli, kept_indices, pinched_indices) )
-                  cli_by_size[pls].remove(cpli)
             pinches[cli] = cli_pinches
 
       for master_li, cli_list in list(pinches.items()):
@@ -1508,7 +1584,8 @@ class LoopCache:
             for diagram_index, loopintegral, ci in self.topologies[cli]:
 
                #self(li) == other(pli) <=> r(li) = pli
-               assert ci(loopintegral) == cpt(pli)
+               if CHECK_INVARIANTS:
+                  assert ci(loopintegral) == cpt(pli)
                transform = ci.relative(cpt)
                assert transform is not None, \
                      """
@@ -1517,7 +1594,8 @@ class LoopCache:
                      pli          = %s
                      loopintegral = %s
                      """ % (diagram_index, pli, loopintegral)
-               assert transform(loopintegral) == pli, \
+               if CHECK_INVARIANTS:
+                  assert transform(loopintegral) == pli, \
                      """
                      li:        %s
                      pli:       %s
@@ -1546,8 +1624,9 @@ class LoopCache:
          for diagram_index, kept_indices, pinched_indices, transform in lst:
 
             # This is the post condition
-            assert root.pinched(pinched_indices) == \
-                  transform(self.diagrams[diagram_index].getLoopIntegral())
+            if CHECK_INVARIANTS:
+               assert root.pinched(pinched_indices) == \
+                     transform(self.diagrams[diagram_index].getLoopIntegral())
 
             new_rk = self.diagrams[diagram_index].rank(MQSE) \
                   + len(pinched_indices)
@@ -1640,6 +1719,13 @@ class Momentum:
    def getZeroMomentum(self):
       return self._zdict
 
+   def signature(self):
+      """
+      A hashable representation of the momentum; two momenta
+      compare equal if and only if their signatures are equal.
+      """
+      return tuple(sorted(self._dict.items()))
+
    def __str__(self):
       return self._format_momentum(self._dict)
 
@@ -0,0 +1,109 @@
+# vim: ts=3:sw=3:expandtab
+"""
+Lazy access to the diagram files written by QGraf with topostore.sty.
+
+A diagram file consists of records, each of which starts with a line
+
+   @ <diagram index>
+
+followed by a JSON object describing the legs, propagators and vertices
+of the diagram. Lines starting with '#' before the first record are
+comments. Opening a file only builds an index of the record offsets;
+a Diagram is constructed every time it is accessed and is not kept by
+the store.
+"""
+import os
+import json
+
+from golem.topolopy.objects import Diagram, Leg, Propagator, Vertex
+
+class DiagramStore:
+   """
+   A read-only mapping from diagram indices to Diagram objects.
+
+   PARAMETER
+
+   fname -- the name of a file generated with topostore.sty
+   """
+   def __init__(self, fname):
+      self._fname = fname
+      self._offsets = {}
+
+      # Records are read with os.pread, which does not move the file
+      # offset, so the handle can be shared with forked workers.
+      self._file = open(fname, 'rb')
+
+      start = None
+      index = None
+      pos = 0
+      for line in self._file:
+         if line.startswith(b"@"):
+            if index is not None:
+               self._offsets[index] = (start, pos)
+            index = int(line[1:])
+            start = pos + len(line)
+         pos += len(line)
+      if index is not None:
+         self._offsets[index] = (start, pos)
+
+   def getFileName(self):
+      return self._fname
+
+   def close(self):
+      self._file.close()
+
+   def keys(self):
+      return self._offsets.keys()
+
+   def __iter__(self):
+      return iter(self._offsets)
+
+   def __len__(self):
+      return len(self._offsets)
+
+   def __contains__(self, idx):
+      return idx in self._offsets
+
+   def __getitem__(self, idx):
+      start, end = self._offsets[idx]
+      return _build_diagram(self._read(start, end))
+
+   def items(self):
+      """
+      Yields all pairs (index, diagram) in the order of the file.
+      """
+      for idx, (start, end) in self._offsets.items():
+         yield idx, _build_diagram(self._read(start, end))
+
+   def _read(self, start, end):
+      return os.pread(self._file.fileno(), end - start, start)
+
+def _build_diagram(data):
+   record = json.loads(data.decode("utf-8"))
+   return Diagram(*build_components(record))
+
+def build_components(record):
+   """
+   Translates a record of topostore.sty into a list of diagram components.
+
+   The first element of every list in the record is a null placeholder
+   which keeps the JSON valid if the list is otherwise empty.
+   All model dependent numbers are written as strings by the style
+   file since they can carry an explicit sign.
+   """
+   components = []
+   for (index, ingoing, field, v, r, mom, mass, twospin, color,
+         dual) in record["legs"][1:]:
+      components.append(Leg(index, ingoing, field, v, r, mom, mass,
+         int(twospin), int(color), field == dual))
+
+   for (index, field, v1, r1, v2, r2, mom, mass, width, aux, twospin,
+         color, dual, sign) in record["propagators"][1:]:
+      components.append(Propagator(index, field, v1, r1, v2, r2, mom,
+         mass, width, int(aux), int(twospin), int(color),
+         field == dual, sign=sign))
+
+   for vertex in record["vertices"][1:]:
+      components.append(Vertex(vertex[0], int(vertex[1]), *vertex[2:]))
+
+   return components
@@ -0,0 +1,192 @@
+# vim: ts=3:sw=3:expandtab
+"""
+Persistent, content-addressed caches which are shared between runs.
+
+Every cache is a directory below the path given by the property
+'cache.dir'. An entry is a subdirectory whose name is a hash of
+everything its content depends on. Entries are never modified once
+they have been stored; the modification time of an entry records
+its last use and determines the order of eviction.
+"""
+import os
+import os.path
+import shutil
+import hashlib
+import tempfile
+import threading
+
+import golem.properties
+import golem.util.path
+
+from golem.util.tools import debug, warning
+
+def make_key(*parts):
+   """
+   Combines the given parts (strings or bytes) into a hexadecimal key.
+   """
+   h = hashlib.sha256()
+   for part in parts:
+      if isinstance(part, str):
+         part = part.encode("utf-8")
+      h.update(("%d:" % len(part)).encode("ascii"))
+      h.update(part)
+   return h.hexdigest()
+
+def file_digest(fname):
+   """
+   Returns the sha256 hash of the content of a file.
+   """
+   h = hashlib.sha256()
+   with open(fname, 'rb') as f:
+      for block in iter(lambda: f.read(1 << 16), b""):
+         h.update(block)
+   return h.hexdigest()
+
+class FileCache:
+   """
+   A directory of cache entries with size based LRU eviction.
+
+   PARAMETER
+
+   path -- the directory holding the entries
+   max_size -- the maximum size in bytes; None means unlimited
+   """
+   def __init__(self, path, max_size=None):
+      self._path = path
+      self._max_size = max_size
+      self._lock = threading.Lock()
+
+   def getPath(self):
+      return self._path
+
+   def entry_path(self, key):
+      return os.path.join(self._path, key)
+
+   def lookup(self, key):
+      """
+      Returns the directory of the entry for key or None if there is
+      no such entry. A successful lookup marks the entry as used.
+      """
+      entry = self.entry_path(key)
+      if not os.path.isdir(entry):
+         return None
+      try:
+         os.utime(entry, None)
+      except OSError:
+         return None
+      return entry
+
+   def retrieve(self, key, files):
+      """
+      Copies the files of an entry to their destinations.
+
+      PARAMETER
+
+      key -- the key of the entry
+      files -- a dictionary {name: destination}
+
+      RESULT
+
+      True if all files have been found in the cache, False otherwise.
+      """
+      entry = self.lookup(key)
+      if entry is None:
+         return False
+      try:
+         for name, dest in files.items():
+            shutil.copyfile(os.path.join(entry, name), dest)
+      except (IOError, OSError) as ex:
+         debug("Cache entry %r is incomplete: %s" % (entry, ex))
+         return False
+      return True
+
+   def store(self, key, files):
+      """
+      Creates a new entry.
+
+      PARAMETER
+
+      key -- the key of the entry
+      files -- a dictionary {name: source}
+
+      The entry is assembled in a temporary directory and renamed
+      atomically, such that concurrent readers never see a partial
+      entry. If the entry exists already, the cache is not changed.
+      """
+      try:
+         os.makedirs(self._path, exist_ok=True)
+         tmp = tempfile.mkdtemp(prefix=".tmp-", dir=self._path)
+      except OSError as ex:
+         warning("Cannot write to cache directory %r: %s" % (self._path, ex))
+         return False
+
+      try:
+         for name, src in files.items():
+            shutil.copyfile(src, os.path.join(tmp, name))
+         os.rename(tmp, self.entry_path(key))
+      except OSError:
+         # Either the entry has been created concurrently or the
+         # files could not be copied. Both are not fatal.
+         shutil.rmtree(tmp, ignore_errors=True)
+         return False
+
+      self.evict()
+      return True
+
+   def evict(self):
+      """
+      Removes least recently used entries until the size of the cache
+      is below the limit.
+      """
+      if self._max_size is None:
+         return
+
+      with self._lock:
+         entries = []
+         total = 0
+         try:
+            names = os.listdir(self._path)
+         except OSError:
+            return
+         for name in names:
+            if name.startswith("."):
+               continue
+            entry = self.entry_path(name)
+            try:
+               size = sum(os.path.getsize(os.path.join(entry, f))
+                     for f in os.listdir(entry))
+               mtime = os.path.getmtime(entry)
+            except OSError:
+               continue
+            entries.append( (mtime, size, entry) )
+            total += size
+
+         entries.sort()
+         for mtime, size, entry in entries:
+            if total <= self._max_size:
+               break
+            debug("Removing cache entry %r" % entry)
+            shutil.rmtree(entry, ignore_errors=True)
+            total -= size
+
+def get_cache(conf, name):
+   """
+   Returns the FileCache with the given name as configured by the
+   properties 'cache.dir' and 'cache.size', or None if caching
+   has been disabled.
+   """
+   cache_dir = conf.getProperty(golem.properties.cache_dir)
+   if cache_dir is None or len(cache_dir.strip()) == 0:
+      cache_dir = golem.util.path.cache_path()
+   elif cache_dir.strip().lower() == "none":
+      return None
+   else:
+      cache_dir = os.path.expanduser(os.path.expandvars(cache_dir.strip()))
+
+   max_size = conf.getProperty(golem.properties.cache_size)
+   if max_size is not None and max_size > 0:
+      max_size = max_size * 1024 * 1024
+   else:
+      max_size = None
+
+   return FileCache(os.path.join(cache_dir, name), max_size)
@@ -167,6 +167,13 @@ class Property:
             self._name, self._description,
             self._type, self._default)
 
+# The entry of Properties.cache which holds the extensions
+# (see golem.properties.getExtensions).
+EXTENSIONS_CACHE_KEY = "extensions"
+
+def _is_extensions_key(name):
+   return name.rsplit(".", 1)[-1].lower().strip() == "extensions"
+
 class Properties:
    """
    This class provides a simplistic replacement for
@@ -182,17 +189,22 @@ class Properties:
    def __init__(self, defaults=None, **values):
       self._defaults = defaults
       self._map = {}
+      self.cache = {}
+      # name -> {kind: parsed value}, see _cachedValue
+      self._values = {}
       for key, value in list(values.items()):
          self.setProperty(key, str(value))
 
       self._decode = False
 
-      self.cache = {}
-
    def decode(self):
+      if not self._decode:
+         self._values.clear()
       self._decode = True
 
    def nodecode(self):
+      if self._decode:
+         self._values.clear()
       self._decode = False
 
    def getProperty(self, key, default=None):
@@ -231,22 +243,43 @@ class Properties:
             return None
 
          if self._decode and isinstance(result, str):
+            values = self._values.get(key)
+            if values is not None and "decoded" in values:
+               return values["decoded"]
             # won't work in python3:
             # return result.decode("string_escape")
             # This is not 100% correct but should work reasonably well:
             if ast is not None:
-               return ast.literal_eval("'"+result+"'")
+               result = ast.literal_eval("'"+result+"'")
             else:
-               return result.decode("string_escape")
-         else:
-            return result
+               result = result.decode("string_escape")
+            if self._defaults is None:
+               self._values.setdefault(key, {})["decoded"] = result
+         return result
 
+   def _cachedValue(self, name, kind, parse):
+      """
+      Returns parse(value) for the value of the property name or None
+      if it is not set. The result is kept until the property changes.
+      """
+      values = self._values.get(name)
+      if values is not None and kind in values:
+         return values[kind]
+
+      value = self._getProperty(name)
+      if value is None:
+         return None
+      result = parse(value)
+      if self._defaults is None:
+         self._values.setdefault(name, {})[kind] = result
+      return result
 
    def getListProperty(self, key, default=None, delimiter=','):
       name = str(key)
-      if name in self:
-         value = self[name].split(delimiter)
-         return list([x.strip() for x in value])
+      value = self._cachedValue(name, ("list", delimiter),
+            lambda value: tuple([x.strip() for x in value.split(delimiter)]))
+      if value is not None:
+         return list(value)
       else:
          if default:
             return default.split(delimiter)
@@ -256,22 +289,26 @@ class Properties:
    def getBooleanProperty(self, key, default=False):
       true_values = ["1", "true", ".true.", "t", ".t.", "yes", "y"]
       name = str(key)
-      if name in self:
-         value = self.getProperty(name, default=default).strip().lower()
-         return value in true_values
+      value = self._cachedValue(name, "bool",
+            lambda value: value.strip().lower() in true_values)
+      if value is not None:
+         return value
       else:
          return default
 
    def getIntegerProperty(self, key, default=None):
-      name = str(key)
-      if name in self:
-         value = self.getProperty(name, default=default).strip()
+      def parse(value):
          try:
-            return int(value)
+            return int(value.strip())
          except ValueError as ex:
             raise GolemConfigError(
                "Property '%s' does not contain an integer value ('%s')." %
-               (key, value))
+               (key, value.strip()))
+
+      name = str(key)
+      value = self._cachedValue(name, "int", parse)
+      if value is not None:
+         return value
       else:
          return default
 
@@ -289,6 +326,9 @@ class Properties:
       name = str(key)
       if name.startswith("+"):
          self.setProperty(name[1:], value)
+      self._values.pop(name, None)
+      if EXTENSIONS_CACHE_KEY in self.cache and _is_extensions_key(name):
+         del self.cache[EXTENSIONS_CACHE_KEY]
       if value.__class__ == list:
          self._map[name] = ",".join(map(str, value))
       else:
@@ -464,6 +504,13 @@ class Properties:
       return res
 
    def _del(self, name):
+      self._values.pop(name, None)
+      if name.startswith("+"):
+         self._values.pop(name[1:], None)
+      else:
+         self._values.pop("+" + name, None)
+      if EXTENSIONS_CACHE_KEY in self.cache and _is_extensions_key(name):
+         del self.cache[EXTENSIONS_CACHE_KEY]
       del self._map[name]
       # keep plussed and unplussed entries consistent
       if name.startswith("+"):
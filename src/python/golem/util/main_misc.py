@@ -2,7 +2,6 @@
 import sys
 import os
 import os.path
-import imp
 import io
 import hashlib
 
@@ -16,6 +15,7 @@ import golem.util.parser
 import golem.properties
 import golem.topolopy.functions
 import golem.topolopy.objects
+import golem.topolopy.store
 import golem.util.main_qgraf
 import golem.util.constants as consts
 
@@ -166,7 +166,7 @@ def generate_process_files(conf, from_scratch=False):
 def cleanup(path):
 	cleanup_files = []
 
-	for ext in [".tex", ".log", ".py", ".pyc", ".pyo"]:
+	for ext in [".tex", ".log", ".py", ".pyc", ".pyo", ".jsonl"]:
 		for stub in ["pyxotree", "pyxovirt", "topotree", "topovirt", "pyxoct", "topoct"]:
 			cleanup_files.append(stub + ext)
 
@@ -678,22 +678,26 @@ def run_analyzer(path, conf, in_particles, out_particles):
 	generate_ct = conf.getBooleanProperty("generate_uv_counterterms")
 
 	model = golem.util.tools.getModel(conf)
-		
+
+	golem.topolopy.objects.CHECK_INVARIANTS = "topolopy" in \
+			conf.getListProperty(golem.properties.debug_flags)
+
 	lo_flags = {}
 	virt_flags = {}
 	ct_flags = {}
 
 	if generate_lo:
 		modname = consts.PATTERN_TOPOLOPY_LO
-		fname = os.path.join(path, "%s.py" % modname)
+		fname = os.path.join(path, "%s.jsonl" % modname)
 		debug("Loading tree diagram file %r" % fname)
-		mod_diag_lo = imp.load_source(modname, fname)
+		diagrams_lo = golem.topolopy.store.DiagramStore(fname)
 		conf["ehc"]=False
 		# keep_tree, tree_signs, tree_flows =
 		keep_tree, tree_signs = \
 				golem.topolopy.functions.analyze_tree_diagrams(
-					mod_diag_lo.diagrams, model, conf,
+					diagrams_lo, model, conf,
 					filter_flags = lo_flags)
+		diagrams_lo.close()
 	else:
 		keep_tree = []
 		tree_signs = {}
@@ -715,13 +719,14 @@ def run_analyzer(path, conf, in_particles, out_particles):
 				onshell[key] = "%s**2" % m
 
 		modname = consts.PATTERN_TOPOLOPY_VIRT
-		fname = os.path.join(path, "%s.py" % modname)
+		fname = os.path.join(path, "%s.jsonl" % modname)
 		debug("Loading one-loop diagram file %r" % fname)
-		mod_diag_virt = imp.load_source(modname, fname)
+		diagrams_virt = golem.topolopy.store.DiagramStore(fname)
 
 		keep_virt, keep_vtot, eprops, loopcache, loopcache_tot = golem.topolopy.functions.analyze_loop_diagrams(
-			mod_diag_virt.diagrams, model, conf, onshell, quark_masses, complex_masses,
+			diagrams_virt, model, conf, onshell, quark_masses, complex_masses,
 			filter_flags = virt_flags, massive_bubbles = massive_bubbles)
+		diagrams_virt.close()
 
 	else:
 		keep_virt = []
@@ -732,14 +737,15 @@ def run_analyzer(path, conf, in_particles, out_particles):
 	
 	if generate_ct:
 		modname = consts.PATTERN_TOPOLOPY_CT
-		fname = os.path.join(path, "%s.py" % modname)
+		fname = os.path.join(path, "%s.jsonl" % modname)
 		debug("Loading counter term diagram file %r" % fname)
-		mod_diag_ct = imp.load_source(modname, fname)
+		diagrams_ct = golem.topolopy.store.DiagramStore(fname)
 		# keep_tree, tree_signs, tree_flows =
 		keep_ct, ct_signs = \
 				golem.topolopy.functions.analyze_ct_diagrams(
-				mod_diag_ct.diagrams, model, conf, onshell, quark_masses,
+				diagrams_ct, model, conf, onshell, quark_masses,
 				filter_flags = virt_flags, massive_bubbles = massive_bubbles)
+		diagrams_ct.close()
 	else:
 		keep_ct = []
 		ct_signs = {}
@@ -7,7 +7,9 @@ and is only used in gosam.py
 import subprocess
 import os.path
 import os
+import shutil
 import itertools
+import concurrent.futures
 
 import golem.properties
 import golem.pyxo.pyxodraw
@@ -18,6 +20,7 @@ from golem.util.tools import copy_file, \
 from golem.util.path import golem_path
 from golem.util.config import GolemConfigError, split_qgrafPower
 import golem.util.tools
+import golem.util.cache
 import golem.util.constants as consts
 
 def diagram_count(conf, loops, cut=0):
@@ -159,13 +162,20 @@ def write_qgraf_dat(path, style, model, output_short_name, options, verbatim, \
 	f.write("\n%------- EOF ----------\n")
 	f.close()
 
-def run_qgraf_dat(conf, output_short_name, log_name):
+def run_qgraf_dat(conf, output_short_name, log_name, work_dir=None):
+	"""
+	Runs QGraf on the file 'qgraf.dat' in the directory work_dir,
+	which defaults to the process directory. The log file is
+	always written to the process directory.
+	"""
 	path = golem.util.tools.process_path(conf)
+	if work_dir is None:
+		work_dir = path
 
 	qgraf_bin = conf.getProperty(golem.properties.qgraf_bin)
 	qgraf_bin = os.path.expandvars(qgraf_bin)
 
-	output_name = os.path.join(path, output_short_name)
+	output_name = os.path.join(work_dir, output_short_name)
 
 	if os.path.exists(output_name):
 		os.remove(output_name)
@@ -174,13 +184,13 @@ def run_qgraf_dat(conf, output_short_name, log_name):
 
 	with open(os.path.join(path, log_name), 'w') as f:
 		try:
-			subprocess.call([qgraf_bin], cwd=path, stdout=f)
+			subprocess.call([qgraf_bin], cwd=work_dir, stdout=f)
 		except OSError as ex:
 			raise GolemConfigError(
 					("QGraf (%r) has failed while processing 'qgraf.dat' in %r.\n" +
 						("Error message: %s\n" % ex) +
 						"Detailed output has been written to %r.")
-					% (qgraf_bin, path, log_name))
+					% (qgraf_bin, work_dir, log_name))
 
 	if not os.path.exists(output_name):
 		raise GolemConfigError(
@@ -188,6 +198,109 @@ def run_qgraf_dat(conf, output_short_name, log_name):
 					"Detailed output has been written to %r.")
 				% (output_name, log_name))
 
+__qgraf_fingerprints__ = {}
+
+def qgraf_fingerprint(conf):
+	"""
+	Identifies the QGraf executable by the hash of its content.
+	Returns None if the executable cannot be found.
+	"""
+	qgraf_bin = conf.getProperty(golem.properties.qgraf_bin)
+	qgraf_bin = os.path.expandvars(qgraf_bin)
+	fname = shutil.which(qgraf_bin)
+	if fname is None:
+		return None
+
+	try:
+		st = os.stat(fname)
+	except OSError:
+		return None
+	key = (fname, st.st_size, st.st_mtime)
+	if key not in __qgraf_fingerprints__:
+		__qgraf_fingerprints__[key] = golem.util.cache.file_digest(fname)
+	return __qgraf_fingerprints__[key]
+
+def run_qgraf_job(conf, job, options, in_particles, out_particles, cache=None):
+	"""
+	Runs QGraf for a single output file in a scratch directory of its own
+	and moves the result into the process directory.
+
+	PARAMETER
+
+	conf -- the configuration of the process
+	job -- a tuple (style, output_short_name, log_name, verbatim,
+	       r_particles, loops), see write_qgraf_dat
+	options, in_particles, out_particles -- as in write_qgraf_dat
+	cache -- a golem.util.cache.FileCache for the QGraf output or None
+
+	If a cache is given, QGraf is only run if there is no entry for the
+	same qgraf.dat, model file, style file and QGraf executable.
+	"""
+	path = golem.util.tools.process_path(conf)
+	style, output_short_name, log_name, verbatim, r_particles, loops = job
+
+	scratch = os.path.join(path,
+			"qgraf.%s" % os.path.splitext(output_short_name)[0])
+	if os.path.exists(scratch):
+		shutil.rmtree(scratch)
+	os.mkdir(scratch)
+
+	try:
+		for fname in [style, consts.MODEL_LOCAL]:
+			shutil.copy(os.path.join(path, fname), os.path.join(scratch, fname))
+
+		write_qgraf_dat(scratch, style, consts.MODEL_LOCAL, output_short_name,
+				options, verbatim, in_particles, out_particles, r_particles, loops)
+
+		key = None
+		if cache is not None:
+			fingerprint = qgraf_fingerprint(conf)
+			if fingerprint is not None:
+				key = golem.util.cache.make_key(fingerprint,
+						*[golem.util.cache.file_digest(os.path.join(scratch, fname))
+							for fname in ["qgraf.dat", style, consts.MODEL_LOCAL]])
+
+		output_name = os.path.join(path, output_short_name)
+		if key is not None and cache.retrieve(key, {
+					"output": output_name,
+					"log": os.path.join(path, log_name)}):
+			message("QGraf output %s taken from cache" % output_short_name)
+			return
+
+		run_qgraf_dat(conf, output_short_name, log_name, scratch)
+
+		if key is not None:
+			cache.store(key, {
+				"output": os.path.join(scratch, output_short_name),
+				"log": os.path.join(path, log_name)})
+
+		os.replace(os.path.join(scratch, output_short_name), output_name)
+	finally:
+		shutil.rmtree(scratch, ignore_errors=True)
+
+def run_qgraf_jobs(conf, jobs, options, in_particles, out_particles):
+	"""
+	Runs all QGraf jobs in a bounded pool of threads. The number of
+	concurrent QGraf processes is limited by the property 'qgraf.jobs'.
+
+	Errors are raised in the order of the list of jobs after all jobs
+	have terminated.
+	"""
+	max_workers = conf.getProperty(golem.properties.qgraf_jobs)
+	if max_workers is None or max_workers <= 0:
+		max_workers = os.cpu_count() or 1
+	max_workers = max(1, min(max_workers, len(jobs)))
+
+	cache = golem.util.cache.get_cache(conf, "qgraf")
+
+	with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as pool:
+		futures = [pool.submit(run_qgraf_job, conf, job,
+				options, in_particles, out_particles, cache) for job in jobs]
+		concurrent.futures.wait(futures)
+
+	for future in futures:
+		future.result()
+
 def format_qgraf_verbatim(conf, prop):
 	result = []
 	verbatim = conf.getProperty(prop)
@@ -230,10 +343,11 @@ def run_qgraf(conf, in_particles, out_particles):
 	# These are our default file names:
 	pyxo_sty    = "pyxo.sty"
 	form_sty    = "form.sty"
-	topo_sty    = "topolopy.sty"
+	topo_sty    = "topostore.sty"
 
 	form_ext    = ".hh"
 	python_ext  = ".py"
+	store_ext   = ".jsonl"
 	pyo_ext     = ".pyo"
 	pyc_ext     = ".pyc"
 	log_ext     = ".log"
@@ -243,80 +357,72 @@ def run_qgraf(conf, in_particles, out_particles):
 	if templates is None or len(templates) == 0:
 		templates = golem_path("templates")
 
+	# Each job is a tuple
+	#    (style, output_name, log_name, verbatim, r_particles, loops)
+	jobs = []
+	pyxo_files = []
+
 	# ----------------- LO PART -------------------------------------------
 	if flag_generate_lo_diagrams:
-		output_name = consts.PATTERN_DIAGRAMS_LO + form_ext
-		log_name    = consts.PATTERN_DIAGRAMS_LO + log_ext
-
 		if powers and powers is not None:
 			new_verbatim = verbatim + "\n" + verbatim_lo + "\n" + \
 					"".join(["true=vsum[%s,%s,%s];\n" % (po[0], po[1], po[1]) for po in powers])
 		else:
 			new_verbatim = verbatim + "\n" + verbatim_lo
 
-		write_qgraf_dat(path, form_sty, consts.MODEL_LOCAL, output_name,
-				options, new_verbatim, in_particles, out_particles, [], 0)
-		run_qgraf_dat(conf, output_name, log_name)
+		jobs.append( (form_sty,
+				consts.PATTERN_DIAGRAMS_LO + form_ext,
+				consts.PATTERN_DIAGRAMS_LO + log_ext,
+				new_verbatim, [], 0) )
 
 		if flag_draw_diagrams:
-			output_name = consts.PATTERN_PYXO_LO + python_ext
-			log_name    = consts.PATTERN_PYXO_LO + log_ext
-			write_qgraf_dat(path, pyxo_sty, consts.MODEL_LOCAL, output_name,
-				options, new_verbatim, in_particles, out_particles, [], 0)
-			run_qgraf_dat(conf, output_name, log_name)
-			golem.pyxo.pyxodraw.pyxodraw(os.path.join(path, output_name),
-					conf=conf)
+			jobs.append( (pyxo_sty,
+					consts.PATTERN_PYXO_LO + python_ext,
+					consts.PATTERN_PYXO_LO + log_ext,
+					new_verbatim, [], 0) )
+			pyxo_files.append(consts.PATTERN_PYXO_LO + python_ext)
 			for ext in [python_ext, pyo_ext, pyc_ext]:
 				cleanup_files.append(consts.PATTERN_PYXO_LO + ext)
 
 		if flag_topolopy:
-			output_name = consts.PATTERN_TOPOLOPY_LO + python_ext
-			log_name    = consts.PATTERN_TOPOLOPY_LO + log_ext
-			write_qgraf_dat(path, topo_sty, consts.MODEL_LOCAL, output_name,
-				options, new_verbatim, in_particles, out_particles, [], 0)
-			run_qgraf_dat(conf, output_name, log_name)
+			jobs.append( (topo_sty,
+					consts.PATTERN_TOPOLOPY_LO + store_ext,
+					consts.PATTERN_TOPOLOPY_LO + log_ext,
+					new_verbatim, [], 0) )
 
 	# ----------------- VIRTUAL PART --------------------------------------
 	if flag_generate_nlo_virt:
-		output_name = consts.PATTERN_DIAGRAMS_NLO_VIRT + form_ext
-		log_name    = consts.PATTERN_DIAGRAMS_NLO_VIRT + log_ext
-
 		if powers and powers is not None:
 			new_verbatim = verbatim + "\n" + verbatim_nlo + "\n" + \
 					"".join(["true=vsum[%s,%s,%s];\n" % (po[0], po[2], po[2]) for po in powers])
 		else:
 			new_verbatim = verbatim + "\n" + verbatim_nlo
 
-		write_qgraf_dat(path, form_sty, consts.MODEL_LOCAL, output_name,
-				options, new_verbatim, in_particles, out_particles, [], 1)
-		run_qgraf_dat(conf, output_name, log_name)
+		jobs.append( (form_sty,
+				consts.PATTERN_DIAGRAMS_NLO_VIRT + form_ext,
+				consts.PATTERN_DIAGRAMS_NLO_VIRT + log_ext,
+				new_verbatim, [], 1) )
 
 		if flag_draw_diagrams:
-			output_name = consts.PATTERN_PYXO_NLO_VIRT + python_ext
-			log_name    = consts.PATTERN_PYXO_NLO_VIRT + log_ext
-			write_qgraf_dat(path, pyxo_sty, consts.MODEL_LOCAL, output_name,
-				options, new_verbatim, in_particles, out_particles, [], 1)
-			run_qgraf_dat(conf, output_name, log_name)
-			golem.pyxo.pyxodraw.pyxodraw(os.path.join(path, output_name),
-					conf=conf)
+			jobs.append( (pyxo_sty,
+					consts.PATTERN_PYXO_NLO_VIRT + python_ext,
+					consts.PATTERN_PYXO_NLO_VIRT + log_ext,
+					new_verbatim, [], 1) )
+			pyxo_files.append(consts.PATTERN_PYXO_NLO_VIRT + python_ext)
 			for ext in [python_ext, pyo_ext, pyc_ext]:
 				cleanup_files.append(consts.PATTERN_PYXO_NLO_VIRT + ext)
 
 		if flag_topolopy:
-			output_name = consts.PATTERN_TOPOLOPY_VIRT + python_ext
-			log_name    = consts.PATTERN_TOPOLOPY_VIRT + log_ext
-			write_qgraf_dat(path, topo_sty, consts.MODEL_LOCAL, output_name,
-				options, new_verbatim, in_particles, out_particles, [], 1)
-			run_qgraf_dat(conf, output_name, log_name)
+			jobs.append( (topo_sty,
+					consts.PATTERN_TOPOLOPY_VIRT + store_ext,
+					consts.PATTERN_TOPOLOPY_VIRT + log_ext,
+					new_verbatim, [], 1) )
 
 	# ----------------- UV COUNTERTERMS -----------------------------------
 	# This doesn't work...at some point it would be better to add the RENO
 	# fields automatically
 	# Edited on 16.11.12
 	if flag_generate_uv_counterterms:
-		output_name = consts.PATTERN_DIAGRAMS_CT + form_ext
-		log_name    = consts.PATTERN_DIAGRAMS_CT + log_ext
-
 		if powers and powers is not None:
 			new_verbatim = verbatim + "\n" + \
 					"true=vsum[%s,%s,%s];\n" % (powers[0][0], str(int(powers[0][2])-6), str(int(powers[0][2])-6)) \
@@ -324,28 +430,31 @@ def run_qgraf(conf, in_particles, out_particles):
 		else:
 			new_verbatim = verbatim
 
-		write_qgraf_dat(path, form_sty, consts.MODEL_LOCAL, output_name, \
-				options, new_verbatim, in_particles, out_particles, \
-				["RENO"], 1)
-		run_qgraf_dat(conf, output_name, log_name)
+		jobs.append( (form_sty,
+				consts.PATTERN_DIAGRAMS_CT + form_ext,
+				consts.PATTERN_DIAGRAMS_CT + log_ext,
+				new_verbatim, ["RENO"], 1) )
 
 		if flag_draw_diagrams:
-			output_name = consts.PATTERN_PYXO_CT + python_ext
-			log_name    = consts.PATTERN_PYXO_CT + log_ext
-			write_qgraf_dat(path, pyxo_sty, consts.MODEL_LOCAL, output_name,
-				options, new_verbatim, in_particles, out_particles, \
-				["RENO"], 1)
-			run_qgraf_dat(conf, output_name, log_name)
-			golem.pyxo.pyxodraw.pyxodraw(os.path.join(path, output_name),
-					conf=conf)
+			jobs.append( (pyxo_sty,
+					consts.PATTERN_PYXO_CT + python_ext,
+					consts.PATTERN_PYXO_CT + log_ext,
+					new_verbatim, ["RENO"], 1) )
+			pyxo_files.append(consts.PATTERN_PYXO_CT + python_ext)
 			for ext in [python_ext, pyo_ext, pyc_ext]:
 				cleanup_files.append(consts.PATTERN_PYXO_CT + ext)
+
 		if flag_topolopy:
-			output_name = consts.PATTERN_TOPOLOPY_CT + python_ext
-			log_name    = consts.PATTERN_TOPOLOPY_CT + log_ext
-			write_qgraf_dat(path, topo_sty, consts.MODEL_LOCAL, output_name,
-				options, new_verbatim, in_particles, out_particles, [], 1)
-			run_qgraf_dat(conf, output_name, log_name)
+			jobs.append( (topo_sty,
+					consts.PATTERN_TOPOLOPY_CT + store_ext,
+					consts.PATTERN_TOPOLOPY_CT + log_ext,
+					new_verbatim, [], 1) )
+
+	run_qgraf_jobs(conf, jobs, options, in_particles, out_particles)
+
+	for output_name in pyxo_files:
+		golem.pyxo.pyxodraw.pyxodraw(os.path.join(path, output_name),
+				conf=conf)
 
 	# Clean up and leave
 	qgraf_dat_name = os.path.join(path, "qgraf.dat")
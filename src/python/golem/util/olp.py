@@ -2,6 +2,7 @@
 
 import os
 import imp
+import concurrent.futures
 import golem
 import golem.util.tools
 import golem.installation
@@ -361,6 +362,7 @@ def process_order_file(order_file_name, f_contract, path, default_conf,
       from_scratch = False,
       mc_name = "any",
       use_crossings = True,
+      jobs = 1,
       **opts
       ):
 
@@ -626,8 +628,9 @@ def process_order_file(order_file_name, f_contract, path, default_conf,
             subprocesses_conf[first_subprocess]["initialization-auto.extensions"]="samurai"
             break
 
-      for subprocess in list(subprocesses.values()):
-         process_path = subprocess.getPath(path)
+      subprocess_list = list(subprocesses.values())
+      subprocess_confs = []
+      for subprocess in subprocess_list:
          subprocess_conf = subprocess.getConf(subprocesses_conf[int(subprocess)], path)
          subprocess_conf["golem.name"] = "GoSam"
          subprocess_conf["golem.version"] = ".".join(map(str,
@@ -635,20 +638,25 @@ def process_order_file(order_file_name, f_contract, path, default_conf,
          subprocess_conf["golem.full-name"] = GOLEM_FULL
          subprocess_conf["golem.revision"] = \
             golem.installation.GOLEM_REVISION
-
-         golem.util.tools.POSTMORTEM_CFG = subprocess_conf
-
-         try:
-            golem.util.main_misc.workflow(subprocess_conf)
+         subprocess_confs.append(subprocess_conf)
+
+      if jobs > 1 and len(subprocess_confs) > 1:
+         golem.util.tools.message(
+               "Generating %d subprocesses using %d parallel jobs" %
+               (len(subprocess_confs), jobs))
+         outcomes = generate_subprocesses_parallel(subprocess_confs,
+               from_scratch, jobs, imodel_path)
+      else:
+         outcomes = generate_subprocesses_serial(subprocess_confs,
+               from_scratch)
+
+      # Channels are assigned in the order of the subprocesses,
+      # independently of the order in which the jobs have finished.
+      for subprocess, (subprocess_conf, helicities, err) in \
+            zip(subprocess_list, outcomes):
+         if err is None:
             merge_extensions(subprocess_conf,conf)
 
-            golem.util.main_misc.generate_process_files(subprocess_conf,
-                  from_scratch)
-
-            helicities = list(
-                  golem.util.tools.enumerate_and_reduce_helicities(
-                     subprocess_conf))
-
             generated_helicities = [t[0] for t in [t for t in helicities if t[1] is None]]
 
             for id in subprocess.getIDs():
@@ -668,8 +676,7 @@ def process_order_file(order_file_name, f_contract, path, default_conf,
                subprocess.assignChannels(id, channels[id])
                subprocess.assignNumberHelicities(len(helicities),
                      generated_helicities)
-
-         except golem.util.config.GolemConfigError as err:
+         else:
             result = 1
             for id in subprocess.getIDs():
                contract_file.setProcessError(id, "Error: %s" % err)
@@ -721,6 +728,82 @@ def process_order_file(order_file_name, f_contract, path, default_conf,
    #---#] Process global templates:
    return result
 
+def generate_subprocess(subprocess_conf, from_scratch=False):
+   """
+   Runs the workflow and the code generation for a single subprocess.
+
+   Returns the list of (reduced) helicities of the subprocess.
+   """
+   golem.util.tools.POSTMORTEM_CFG = subprocess_conf
+
+   golem.util.main_misc.workflow(subprocess_conf)
+   golem.util.main_misc.generate_process_files(subprocess_conf,
+         from_scratch)
+
+   return list(golem.util.tools.enumerate_and_reduce_helicities(
+      subprocess_conf))
+
+def generate_subprocesses_serial(subprocess_confs, from_scratch=False):
+   """
+   Generates the subprocesses one after the other.
+
+   Yields a triple (subprocess_conf, helicities, error) per subprocess,
+   where error is None if the generation was successful.
+   """
+   for subprocess_conf in subprocess_confs:
+      try:
+         helicities = generate_subprocess(subprocess_conf, from_scratch)
+         yield subprocess_conf, helicities, None
+      except golem.util.config.GolemConfigError as err:
+         yield subprocess_conf, None, str(err)
+
+def _generate_subprocess_job(subprocess_conf, from_scratch):
+   """
+   Entry point of a worker process of generate_subprocesses_parallel.
+
+   Errors are returned rather than raised such that a failing
+   subprocess does not affect the others. The configuration is
+   sent back without its cache, which holds the (unpicklable)
+   model module.
+   """
+   try:
+      helicities = generate_subprocess(subprocess_conf, from_scratch)
+      err = None
+   except golem.util.config.GolemConfigError as ex:
+      helicities = None
+      err = str(ex)
+   except SystemExit as ex:
+      # golem.util.tools.error has already logged the reason
+      helicities = None
+      err = str(ex)
+   subprocess_conf.cache = {}
+   return subprocess_conf, helicities, err
+
+def generate_subprocesses_parallel(subprocess_confs, from_scratch=False,
+      jobs=2, model_path=None):
+   """
+   Generates the subprocesses in a pool of at most 'jobs' worker processes.
+
+   The results are yielded in the same order as in subprocess_confs,
+   in the same format as by generate_subprocesses_serial.
+   """
+   with concurrent.futures.ProcessPoolExecutor(max_workers=jobs) as pool:
+      futures = [pool.submit(_generate_subprocess_job,
+            subprocess_conf, from_scratch)
+         for subprocess_conf in subprocess_confs]
+
+      for subprocess_conf, future in zip(subprocess_confs, futures):
+         try:
+            subprocess_conf, helicities, err = future.result()
+         except Exception as ex:
+            helicities = None
+            err = "subprocess generation failed: %s" % ex
+
+         # Restore the model which has been removed from the cache
+         # before passing the configuration back.
+         golem.util.tools.getModel(subprocess_conf, model_path)
+         yield subprocess_conf, helicities, err
+
 def mc_specials(conf, order_file):
    for pi in order_file.processing_instructions():
       pi_parts = pi.strip().split(" ", 1)
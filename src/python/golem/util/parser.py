@@ -5,7 +5,11 @@ import os
 import pwd
 import os.path
 import math
+import pickle
 import re
+import tempfile
+import golem.installation
+import golem.util.cache
 import golem.util.path
 from golem.util.config import Properties, version_compare
 import golem.util.tools
@@ -26,6 +30,57 @@ class TemplateError(Exception):
    def __init__(self, *args):
       Exception.__init__(self, *args)
 
+# Parse trees of template files, shared by all templates of this process.
+# The keys are tuples (absolute path, mtime, size).
+_PARSED_TEMPLATES = {}
+
+# The golem.util.cache.FileCache holding parse trees between runs.
+_TEMPLATE_CACHE = None
+
+def set_template_cache(cache):
+   """
+   Sets the FileCache in which parsed templates are stored between
+   runs. If cache is None, parsed templates are only kept in memory.
+   """
+   global _TEMPLATE_CACHE
+   _TEMPLATE_CACHE = cache
+
+def _template_cache_key(file_key):
+   fname, mtime, size = file_key
+   return golem.util.cache.make_key("template", fname, str(mtime), str(size),
+         ".".join(map(str, golem.installation.GOLEM_VERSION)),
+         str(golem.installation.GOLEM_REVISION))
+
+def _load_parsed_template(file_key):
+   cache = _TEMPLATE_CACHE
+   if cache is None:
+      return None
+   entry = cache.lookup(_template_cache_key(file_key))
+   if entry is None:
+      return None
+   try:
+      with open(os.path.join(entry, "tree"), 'rb') as f:
+         return pickle.load(f)
+   except (IOError, OSError, EOFError, pickle.UnpicklingError) as ex:
+      golem.util.tools.debug("Cannot read parsed template %r: %s" %
+            (entry, ex))
+      return None
+
+def _store_parsed_template(file_key, root):
+   cache = _TEMPLATE_CACHE
+   if cache is None:
+      return
+   try:
+      fd, tmp_name = tempfile.mkstemp(prefix="gosam-template-")
+   except OSError:
+      return
+   try:
+      with os.fdopen(fd, 'wb') as f:
+         pickle.dump(root, f, pickle.HIGHEST_PROTOCOL)
+      cache.store(_template_cache_key(file_key), {"tree": tmp_name})
+   finally:
+      os.remove(tmp_name)
+
 class Template:
    """
    A template is a file in a special markup language.
@@ -84,6 +139,11 @@ class Template:
          if isinstance(source, str):
             # read template from a literal string
             self._parse(source.splitlines())
+         elif isinstance(getattr(source, "name", None), str) \
+               and os.path.isfile(source.name):
+            # read template from a file on disk, which might have
+            # been parsed before
+            self._parse_file(source)
          elif "xreadlines" in dir(source):
             # read template from a file
             self._parse(source)
@@ -93,6 +153,25 @@ class Template:
          raise TemplateError(" in line %d: %s" % (self._line_number, str(ex)))
 
 
+   def _parse_file(self, f):
+      """
+      Parses an open file. The parse tree is shared with all other
+      templates of the same file (identified by its path, mtime and
+      size) and is stored in the template cache.
+      """
+      st = os.stat(f.name)
+      file_key = (os.path.abspath(f.name), st.st_mtime_ns, st.st_size)
+
+      root = _PARSED_TEMPLATES.get(file_key)
+      if root is None:
+         root = _load_parsed_template(file_key)
+         if root is None:
+            self._parse(f)
+            root = self._root
+            _store_parsed_template(file_key, root)
+         _PARSED_TEMPLATES[file_key] = root
+      self._root = root
+
    def _tokenize(self, source):
       LEFT="[%"
       RIGHT="%]"
@@ -1217,12 +1296,10 @@ class Template:
       raise TemplateError(" ".join(map(str, args)))
 
    def extension(self, *args, **opts):
-      ext = []
+      ext = frozenset()
       for i in range(1, len(self._stack) + 1):
          conf = self._stack[-i]
-         lst = golem.properties.getExtensions(conf)
-         if lst is not None:
-            ext.extend([x.lower() for x in lst])
+         ext = ext.union(golem.properties.getExtensionSet(conf))
          if ext and hasattr(conf,"final_extensions"):
                break
 
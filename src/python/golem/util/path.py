@@ -49,6 +49,18 @@ def gosam_contrib_path(*dir):
 		return os.path.join("", *dir)
 
 
+def cache_path(*dir):
+	"""
+	Returns the default directory for the persistent caches of GoSam.
+
+	The directory is $XDG_CACHE_HOME/gosam if the environment variable
+	is set and ~/.cache/gosam otherwise.
+	"""
+	cache_home = os.getenv("XDG_CACHE_HOME")
+	if not cache_home:
+		cache_home = os.path.join(get_homedir(), ".cache")
+	return os.path.join(cache_home, "gosam", *dir)
+
 def get_homedir():
 	"""
 	Try to determin the user's home directory.
@@ -5,6 +5,7 @@ import os.path
 import imp
 import traceback
 import getopt
+import itertools
 import re
 
 import golem.model
@@ -190,6 +191,13 @@ def combinations(map):
 
 def enumerate_helicities(conf):
       """
+      Generates the helicity combinations of the process which pass
+      the symmetry filter as dictionaries {leg index: helicity}.
+
+      Without user specified helicities the combinations are generated
+      lazily in the same order as combinations() would produce them;
+      user specified helicities are validated leg by leg against the
+      sets of allowed helicity states.
       """
       zeroes = getZeroes(conf)
       in_particles, out_particles = generate_particle_lists(conf)
@@ -198,26 +206,26 @@ def enumerate_helicities(conf):
 
       in_particles.extend(out_particles)
 
-      helic = {}
-      for i in range(len(in_particles)):
-         helic[i] = in_particles[i].getHelicityStates(zeroes)
-         
-      helicity_comb = [h for h in combinations(helic)]
+      states = [p.getHelicityStates(zeroes) for p in in_particles]
       user_helis = conf.getProperty(golem.properties.helicities)
       user_helis = [i for i in user_helis if i]
 
       if len(user_helis) > 0:
-         ex_user_helis = expand_helicities(user_helis)
-
-         new_helicity_comb = []
-         for s in ex_user_helis:
+         allowed = [frozenset(s) for s in states]
+         helicity_comb = []
+         for s in expand_helicities(user_helis):
             heli = golem.algorithms.helicity.parse_helicity(s)
-            if heli in helicity_comb:
-               new_helicity_comb.append(heli)
-            else:
+            if len(heli) != len(allowed) or \
+                  any(heli[i] not in a for i, a in enumerate(allowed)):
                raise golem.util.parser.TemplateError(
                   "Helicity %r is not valid for this process" % s)
-         helicity_comb = new_helicity_comb
+            helicity_comb.append(heli)
+      else:
+         # The first leg varies fastest, the keys are inserted
+         # in reverse order as in combinations()
+         keys = list(range(len(states) - 1, -1, -1))
+         helicity_comb = (dict(zip(keys, values))
+               for values in itertools.product(*reversed(states)))
 
       for h in helicity_comb:
          if fermion_filter(h):
@@ -321,11 +329,7 @@ def prepare_model_files(conf, output_path=None):
          model_path = os.path.expanduser(model_path)
          if not os.path.isabs(model_path):
             model_path = os.path.join(rel_path, model_path)
-         message("Importing FeynRules model files ...")
-         extract_model_options(conf)
-         mdl = golem.model.feynrules.Model(model_path,golem.model.MODEL_OPTIONS)
-         mdl.store(path, MODEL_LOCAL)
-         message("Done with model import.")
+         import_feynrules_model(conf, model_path, path)
       else:
          model_path = model_lst[0]
          model_path = os.path.expandvars(model_path)
@@ -352,6 +356,80 @@ def prepare_model_files(conf, output_path=None):
       error("Parameter 'model' cannot have more than two entries.")
 
 
+# The FeynRules models converted in this run: {key: output path}
+_IMPORTED_MODELS = {}
+
+def feynrules_model_key(model_path, model_options):
+   """
+   Returns a key for the conversion of a FeynRules model which
+   depends on the content of its Python files, the model options
+   and the version of GoSam, or None if model_path is not a directory.
+   """
+   # golem.util.cache imports this module
+   import golem.util.cache
+
+   if not os.path.isdir(model_path):
+      return None
+
+   parts = ["feynrules",
+         ".".join(map(str, golem.installation.GOLEM_VERSION)),
+         str(golem.installation.GOLEM_REVISION),
+         repr(sorted((str(k), str(v)) for k, v in model_options.items()))]
+   for dirpath, dirnames, filenames in os.walk(model_path):
+      dirnames[:] = sorted(d for d in dirnames if d != "__pycache__")
+      for fname in sorted(filenames):
+         if fname.endswith(".py"):
+            full_name = os.path.join(dirpath, fname)
+            parts.append(os.path.relpath(full_name, model_path))
+            parts.append(golem.util.cache.file_digest(full_name))
+   return golem.util.cache.make_key(*parts)
+
+def import_feynrules_model(conf, model_path, path):
+   """
+   Converts the FeynRules model in model_path into the files
+   model, model.py and model.hh in the directory path.
+
+   The conversion is done at most once per run for the same model
+   sources and model options; the results are also kept in the
+   persistent cache 'models' below cache.dir.
+   """
+   # golem.util.cache imports this module
+   import golem.util.cache
+
+   extract_model_options(conf)
+   key = feynrules_model_key(model_path, golem.model.MODEL_OPTIONS)
+   names = [MODEL_LOCAL + ext for ext in ["", ".py", ".hh"]]
+
+   cache = None
+   if key is not None:
+      previous = _IMPORTED_MODELS.get(key)
+      if previous is not None and all(
+            os.path.exists(os.path.join(previous, name)) for name in names):
+         if os.path.abspath(previous) != os.path.abspath(path):
+            for name in names:
+               copy_file(os.path.join(previous, name), os.path.join(path, name))
+         golem.model.feynrules.use_integer_parsing()
+         return
+
+      cache = golem.util.cache.get_cache(conf, "models")
+      if cache is not None and cache.retrieve(key,
+            dict((name, os.path.join(path, name)) for name in names)):
+         message("FeynRules model taken from cache.")
+         golem.model.feynrules.use_integer_parsing()
+         _IMPORTED_MODELS[key] = path
+         return
+
+   message("Importing FeynRules model files ...")
+   mdl = golem.model.feynrules.Model(model_path,golem.model.MODEL_OPTIONS)
+   mdl.store(path, MODEL_LOCAL)
+   message("Done with model import.")
+
+   if key is not None:
+      _IMPORTED_MODELS[key] = path
+      if cache is not None:
+         cache.store(key, dict((name, os.path.join(path, name))
+            for name in names))
+
 def extract_model_options(conf):
    for opt in conf.getListProperty(golem.properties.model_options):
       idx = -1
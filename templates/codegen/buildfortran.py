@@ -85,8 +85,9 @@ dotprod_sp=[]
 dotprod_kdotl=[]
 dotprod_kdote=[]
 dotprod_kdotspva=[]
-abb_max=getdata(datfilename)['abbrev_terms']
-acc_max=getdata(datfilename)['diagram_terms']
+datdict=getdata(datfilename)
+abb_max=datdict['abbrev_terms']
+acc_max=datdict['diagram_terms']
 
 # catch the case that acc_max is zero
 if acc_max == '0':
@@ -0,0 +1,86 @@
+#! /usr/bin/env python3
+# vim: ts=3:sw=3:expandtab
+"""
+Runs a list of buildfortran*.py conversions in a single Python process.
+
+Every line of the job file has the form
+
+   <script> <arguments>
+
+where <script> is one of the buildfortran*.py files in this directory
+and <arguments> are the command line arguments it would have been
+called with by the Makefile. The modules t2f, pythonin and filter are
+imported only once for all jobs; with -j N the jobs are distributed
+over N worker processes.
+"""
+
+import sys
+import os
+import shlex
+import runpy
+import multiprocessing
+from optparse import OptionParser
+
+import t2f
+
+CODEGEN_DIR = os.path.dirname(os.path.abspath(__file__))
+
+def read_jobs(f):
+   jobs = []
+   for line in f:
+      words = shlex.split(line)
+      if len(words) > 0:
+         jobs.append(words)
+   return jobs
+
+def run_job(job):
+   script = os.path.join(CODEGEN_DIR, job[0])
+   saved_argv = sys.argv
+   sys.argv = [script] + job[1:]
+   # translatefile accumulates the dot products of all files it has
+   # translated; every job has to start with an empty list.
+   t2f.dotproduct_global[:] = []
+   try:
+      runpy.run_path(script, run_name="__main__")
+   except SystemExit as ex:
+      if ex.code not in (None, 0):
+         return "%s: %s" % (" ".join(job), ex.code)
+   except Exception as ex:
+      return "%s: %s: %s" % (" ".join(job), type(ex).__name__, ex)
+   finally:
+      sys.argv = saved_argv
+   return None
+
+def main():
+   parser = OptionParser(usage="%prog [-j N] [JOBFILE]")
+   parser.add_option("-j", "--jobs", dest="jobs",
+                     action="store", type="int", default=1,
+                     help="number of worker processes", metavar="N")
+   (options, args) = parser.parse_args()
+
+   if len(args) == 0:
+      jobs = read_jobs(sys.stdin)
+   else:
+      with open(args[0], "r") as f:
+         jobs = read_jobs(f)
+
+   if options.jobs > 1 and len(jobs) > 1 and \
+         "fork" in multiprocessing.get_all_start_methods():
+      # Import the modules shared by all scripts before forking,
+      # such that the workers inherit them.
+      import pythonin
+      import filter
+      ctx = multiprocessing.get_context("fork")
+      with ctx.Pool(min(options.jobs, len(jobs))) as pool:
+         errors = pool.map(run_job, jobs, chunksize=1)
+   else:
+      errors = [run_job(job) for job in jobs]
+
+   errors = [error for error in errors if error is not None]
+   for error in errors:
+      sys.stderr.write("Error: %s\n" % error)
+   if len(errors) > 0:
+      sys.exit("Error: %d of %d jobs failed." % (len(errors), len(jobs)))
+
+if __name__ == "__main__":
+   main()
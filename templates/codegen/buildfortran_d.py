@@ -97,9 +97,10 @@ dotprod_kdotspva=[]
 
 outdict=translatefile(diag_name+'.txt',config)
 
+datdict=getdata(datfilename)
 acd_maxl = []
 for irank in range(0,rank+1):
-	acdmax=getdata(datfilename)['d%sdiagram_terms' % str(irank)]
+	acdmax=datdict['d%sdiagram_terms' % str(irank)]
 	if acdmax == '0':
 		acdmax = 1
 	acd_maxl.append(acdmax)
@@ -100,8 +100,9 @@ n_t_terms = 0
 if (int(rank) >= int(loopsize) and int(loopsize) >= 4):
     n_t_terms = 1
 
+datdict = getdata(datfilename)
 for lidx in range(0,n_t_terms):
-    acdmax=getdata(datfilename)['ninMu2diagram_terms']
+    acdmax=datdict['ninMu2diagram_terms']
     if acdmax == '0':
         acdmax = 1
     acd_maxl.append(acdmax)
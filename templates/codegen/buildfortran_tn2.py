@@ -99,9 +99,10 @@ nl = int(loopsize)
 rk = int(rank)
 #n_t_terms = max( int(rank) - int(loopsize) + 3 - max(2-int(loopsize),0) , 0)
 
+datdict = getdata(datfilename)
 expids = ['21','22']
 for lidx in expids:
-    acdmax=getdata(datfilename)['nin{0}diagram_terms'.format(lidx)]
+    acdmax=datdict['nin{0}diagram_terms'.format(lidx)]
     if acdmax == '0':
         acdmax = 1
     acd_maxl[lidx] = acdmax
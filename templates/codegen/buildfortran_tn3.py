@@ -99,12 +99,13 @@ nl = int(loopsize)
 rk = int(rank)
 #n_t_terms = max( int(rank) - int(loopsize) + 4 - max(3-int(loopsize),0) , 0)
 
+datdict = getdata(datfilename)
 expids = ['31']
 if (int(loopsize)>=3):
     expids.append('32')
 
 for lidx in expids:
-    acdmax=getdata(datfilename)['nin{0}diagram_terms'.format(lidx)]
+    acdmax=datdict['nin{0}diagram_terms'.format(lidx)]
     if acdmax == '0':
         acdmax = 1
     acd_maxl[lidx] = acdmax
@@ -7,6 +7,24 @@ from filter import Fortran90
 
 dotproduct_global=[]
 
+# Tokens as produced by Python's tokenize for lines consisting of names,
+# numbers, arithmetic operators, brackets, commas and semicolons.
+# Numbers follow the rules of the Python tokenizer, e.g. '1e5' and '2j'
+# are single tokens.
+_decimal = r'[0-9](?:_?[0-9])*'
+_exponent = r'[eE][-+]?' + _decimal
+_pointfloat = r'(?:%s\.(?:%s)?|\.%s)(?:%s)?' % (_decimal, _decimal, _decimal,
+        _exponent)
+_floatnumber = r'(?:%s|%s%s)' % (_pointfloat, _decimal, _exponent)
+_number = r'(?:%s[jJ]|%s[jJ]|%s|%s)' % (_decimal, _floatnumber, _floatnumber,
+        r'0[xX](?:_?[0-9a-fA-F])+|0[bB](?:_?[01])+|0[oO](?:_?[0-7])+'
+        r'|0(?:_?0)*|[1-9](?:_?[0-9])*')
+_token_re = re.compile(r'[ \t]*(%s|\*\*|//|->|\.\.\.|[-+*/^(),;.\[\]]|\w+)'
+        % _number)
+# Lines containing only these characters can be split by _token_re
+_simple_line_re = re.compile(r'[A-Za-z0-9_+\-*/^(),;.\[\] \t]*\Z')
+_digits_re = re.compile(r'\d+')
+
 def initconfig(con):
         for p in ['parameters','kinematics','symbols','lambdafunc','dotproducts']:
                 if p not in list(con.keys()):
@@ -17,38 +35,13 @@ def bmatch(lin):
         """
         returns list of bracket matched indices in a list
         """
-        lh = [idx for idx,val in enumerate(lin)  if val=='(']
-        rh = [idx for idx,val in enumerate(lin)  if val==')']
-        bmatch=[]
-        bmatchd={}
-        for li,le in enumerate(lh):
-                bmatchd[rh[li]] = 'r'
-                bmatchd[le] = 'l'
-        sort=sorted(bmatchd.items())
-        idx = 0
-        embed = False
-        ib = 0
-        while sort != []:
-                item = sort[idx]
-                next = sort[idx+1]
-                if item[1] == 'l':
-                        if next[1] == 'r':
-                                if not embed:
-                                        ib = len(bmatch)
-                                else:
-                                        ib = 0
-                                bmatch.insert(ib,[ sort.pop(idx)[0], sort.pop(idx)[0]])
-                                if embed:
-                                        idx -= 1
-                                        if idx<0:
-                                                idx=0
-                                                embed=False
-                        else:
-                                idx += 1
-                                embed = True
         bmatchd={}
-        for l,r in bmatch:
-                bmatchd[l] = r
+        open_brackets=[]
+        for idx,val in enumerate(lin):
+                if val=='(':
+                        open_brackets.append(idx)
+                elif val==')':
+                        bmatchd[open_brackets.pop()] = idx
         return bmatchd
 
 
@@ -81,6 +74,10 @@ def tokeniseline(inline):
         example :    '  1/( - mW^2 + es34 + i_*mW*wW);  '
         returns a list of tokens
         """
+        if inline[:1] not in ' \t' and _simple_line_re.match(inline):
+                return _token_re.findall(inline)
+        # Everything else, including leading white space which
+        # generates an INDENT token, is left to the Python tokenizer.
         tokens = list(token[1] for token
                 in generate_tokens(StringIO(inline).readline)
                 if token[1])
@@ -116,23 +113,27 @@ def translate(tokens,inconfig):
         ilist=0
         itoken=0
 
-        bd = bmatch(tokens)
+        # only needed for function calls
+        bd = None
         while itoken < len(tokens):
                 token = tokens[itoken]
 # special case for abbreviations
-                abbpre = re.sub("\d+", " ", token).strip()
-                if abbpre in list(parameters.keys()) and  parameters[abbpre] == 'array':
+                abbpre = _digits_re.sub(" ", token).strip()
+                abbtype = parameters.get(abbpre)
+                if abbtype == 'array':
                         newtoken= token + '(%s)' % tokens[itoken+2]
                         newlist.append(newtoken)
                         itoken = itoken+4
-                elif abbpre in list(parameters.keys()) and  parameters[abbpre] == 'matrix':
+                elif abbtype == 'matrix':
                         newtoken= token + '(%s,%s)' % (tokens[itoken+2],tokens[itoken+4])
                         newlist.append(newtoken)
                         itoken = itoken+6
-                elif token in list(lambdafunc.keys()):
+                elif token in lambdafunc:
                         # function(argument,...)
                         # token is 'function',
                         # the next token is '('
+                        if bd is None:
+                                bd = bmatch(tokens)
                         l,r = itoken+1, bd[itoken+1]
                         function=token
                         bracklist = tokens[l+1:r]
@@ -143,12 +144,12 @@ def translate(tokens,inconfig):
                         newitem = replace(token,args,lambdafunc)
                         newlist.append(newitem[0])
                         itoken = itoken + 2
-                elif token in list(dotproducts.keys()):
+                elif token in dotproducts:
                         if token not in dotproduct_global:
                                 dotproduct_global.append(token)
                         newlist.append(token)
                         itoken=itoken+1
-                elif token in list(symbols.keys()):
+                elif token in symbols:
                         if token == '^':
                                 if tokens[itoken+1] == '-':
                                         newtoken = symbols[token] + '(-%s)' % tokens[itoken +2]
@@ -171,10 +172,7 @@ def glue(tokens):
         """
         Takes a list and glues all the items together: returns a string
         """
-        str=''
-        for token in tokens:
-                str = str + token
-        return str.rstrip(';')
+        return ''.join(tokens).rstrip(';')
 
 def output(lhs,rhs):
         """
@@ -206,10 +204,11 @@ def translatefile(infile_name,config,keepleft=False):
 
         """
 
-        outstring=''
+        outstring=[]
         blockname=''
         inf=open(infile_name,'r')
         leftlist=[]
+        leftset=set()
         exit_loop = False
         outdict = {}
         while not exit_loop:
@@ -218,26 +217,27 @@ def translatefile(infile_name,config,keepleft=False):
                 if st == '':
                         exit_loop = True
                 elif st[0] == '#':
-                        outdict[blockname] = outstring
-                        outstring = ''
+                        outdict[blockname] = ''.join(outstring)
+                        outstring = []
                         blockname = st.split('#####')[1].strip('\n')
                 elif notblank(st):
                         rl=st.strip(' \n').split('=')
                         rhs=rl[1]
                         lhs=rl[0]
-                        if keepleft==True and lhs not in leftlist:
+                        if keepleft==True and lhs not in leftset:
                                 leftlist.append(lhs)
+                                leftset.add(lhs)
                         end = rhs[-1]
                         while end != ';':
                                 rhs += inf.readline().strip(' \n')
                                 end = rhs[-1]
                         tokens = tokeniseline(rhs)
                         translated=translate(tokens,config)
-                        outstring=outstring + output(lhs,glue(translated))
+                        outstring.append(output(lhs,glue(translated)))
                 else:
                         continue
 
-        outdict[blockname] = outstring
+        outdict[blockname] = ''.join(outstring)
         del outdict['']
         inf.close()
         outdict['dplist'] = dotproduct_global
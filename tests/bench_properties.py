@@ -0,0 +1,83 @@
+# vim: ts=3:sw=3:expandtab
+"""
+Micro-benchmark of Properties.getProperty for the common property types.
+
+Reads list, integer, boolean and string properties of golem.properties
+repeatedly, once from Properties with its cache of typed values and
+once from a subclass which parses the value on every call as it was
+done before. Both have to return the same values.
+
+   python tests/bench_properties.py [-n CALLS]
+"""
+import time
+from optparse import OptionParser
+
+import golem.properties
+from golem.util.config import Properties
+
+class UncachedProperties(Properties):
+   """
+   Parses the values on every access.
+   """
+   def _cachedValue(self, name, kind, parse):
+      value = self._getProperty(name)
+      if value is None:
+         return None
+      return parse(value)
+
+VALUES = [
+   ("extensions", "formopt, ninja,  golem95,DRED"),
+   ("zero", "me,mU,mD,mS,mC,mB,mmu,mT"),
+   ("one", "gs,e"),
+   ("helicities", "+-++,-+-+"),
+   ("cache.size", "4"),
+   ("PSP_chk_li1", "16"),
+   ("PSP_check", "true"),
+   ("r2", "implicit"),
+   ("polvec", "numerical"),
+]
+
+PROPERTIES = [golem.properties.extensions, golem.properties.zero,
+      golem.properties.one, golem.properties.helicities,
+      golem.properties.cache_size, golem.properties.config_PSP_chk_li1,
+      golem.properties.config_PSP_check, golem.properties.r2,
+      golem.properties.polvec_method, golem.properties.qgraf_power]
+
+def make_conf(cls):
+   conf = cls()
+   for name, value in VALUES:
+      conf[name] = value
+   return conf
+
+def time_calls(conf, prop, calls):
+   get = conf.getProperty
+   start = time.perf_counter()
+   for i in range(calls):
+      get(prop)
+   return (time.perf_counter() - start) / calls
+
+def main():
+   parser = OptionParser(usage="%prog [-n CALLS]")
+   parser.add_option("-n", "--calls", dest="calls",
+                     action="store", type="int", default=50000,
+                     help="number of calls per property")
+   (options, args) = parser.parse_args()
+
+   cached = make_conf(Properties)
+   uncached = make_conf(UncachedProperties)
+
+   identical = True
+   print("%-14s %-5s %10s %10s" % ("property", "type", "uncached", "cached"))
+   for prop in PROPERTIES:
+      if cached.getProperty(prop) != uncached.getProperty(prop):
+         identical = False
+         print("%s differs" % prop)
+      t_uncached = time_calls(uncached, prop, options.calls)
+      t_cached = time_calls(cached, prop, options.calls)
+      print("%-14s %-5s %8.2fus %8.2fus" % (prop, prop.getType().__name__,
+            t_uncached * 1e6, t_cached * 1e6))
+   if not identical:
+      raise SystemExit("Error: the cached values differ.")
+
+if __name__ == "__main__":
+   main()
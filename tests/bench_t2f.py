@@ -0,0 +1,62 @@
+# vim: ts=3:sw=3:expandtab
+"""
+Micro-benchmark of the FORM to Fortran translator t2f.py.
+
+Times translatefile of templates/codegen/t2f.py and of the reference
+version tests/t2f_reference.py on a generated abbreviation file, or on
+the files given on the command line (translated with the configuration
+of test_t2f.py), and checks that the results are identical.
+
+   python tests/bench_t2f.py [-n STATEMENTS] [-r REPEAT] [FILE ...]
+"""
+import os
+import time
+import tempfile
+from optparse import OptionParser
+
+from test_t2f import SYNTHETIC_CONFIG, write_abbreviations, translate_both
+import test_t2f
+
+def best_time(module, fname, repeat):
+   best = None
+   for i in range(repeat):
+      module.dotproduct_global[:] = []
+      start = time.perf_counter()
+      result = module.translatefile(fname, dict(SYNTHETIC_CONFIG))
+      elapsed = time.perf_counter() - start
+      if best is None or elapsed < best:
+         best = elapsed
+   return best
+
+def main():
+   parser = OptionParser(usage="%prog [-n STATEMENTS] [-r REPEAT] [FILE ...]")
+   parser.add_option("-n", "--statements", dest="statements",
+                     action="store", type="int", default=5000,
+                     help="statements per block of the generated file")
+   parser.add_option("-r", "--repeat", dest="repeat",
+                     action="store", type="int", default=3,
+                     help="number of repetitions, the best time is shown")
+   (options, args) = parser.parse_args()
+
+   files = args
+   generated = None
+   if len(files) == 0:
+      handle, generated = tempfile.mkstemp(suffix=".txt", prefix="gosam_t2f")
+      os.close(handle)
+      write_abbreviations(generated, options.statements)
+      files = [generated]
+
+   try:
+      for fname in files:
+         reference, result = translate_both(fname, SYNTHETIC_CONFIG)
+         old = best_time(test_t2f.t2f_reference, fname, options.repeat)
+         new = best_time(test_t2f.t2f, fname, options.repeat)
+         print("%s: %d bytes, reference %.3f s, t2f %.3f s (x%.1f), %s" %
+               (fname, os.path.getsize(fname), old, new, old / new,
+                "identical" if result == reference else "DIFFERENT"))
+   finally:
+      if generated is not None:
+         os.remove(generated)
+
+if __name__ == "__main__":
+   main()
@@ -0,0 +1,242 @@
+# vim: ts=3:sw=3:expandtab
+# Input for python parser. It is here because Python needs it
+# and you specified extensions=formopt
+
+# we need types of parameters
+# a list of all functions
+# a list of all dotproducts
+# a list of mathematical operators and their translations
+
+
+parameters={
+	'alpha' : 'real',
+	'e'     : 'real',
+	'GF'    : 'real',
+	'gs'    : 'real',
+	'mB'    : 'real',
+	'mBMS'  : 'real',
+	'mC'    : 'real',
+	'mD'    : 'real',
+	'me'    : 'real',
+	'mH'    : 'real',
+	'mmu'   : 'real',
+	'mS'    : 'real',
+	'mT'    : 'real',
+	'mtau'  : 'real',
+	'mU'    : 'real',
+	'mW'    : 'real',
+	'mZ'    : 'real',
+	'NC'    : 'real',
+	'Nf'    : 'real',
+	'Nfgen' : 'real',
+	'sw'    : 'real',
+	'wB'    : 'real',
+	'wchi'  : 'real',
+	'wghWm' : 'real',
+	'wghWp' : 'real',
+	'wghZ'  : 'real',
+	'wH'    : 'real',
+	'wphi'  : 'real',
+	'wT'    : 'real',
+	'wtau'  : 'real',
+	'wW'    : 'real',
+	'wZ'    : 'real',
+
+	'NA' : 'real',
+	'gZ' : 'real',
+	'gW' : 'real',
+	'gUv' : 'real',
+	'gCv' : 'real',
+	'gTv' : 'real',
+	'gDv' : 'real',
+	'gSv' : 'real',
+	'gBv' : 'real',
+	'gUa' : 'real',
+	'gCa' : 'real',
+	'gTa' : 'real',
+	'gDa' : 'real',
+	'gSa' : 'real',
+	'gBa' : 'real',
+	'gev' : 'real',
+	'gmuv' : 'real',
+	'gtauv' : 'real',
+	'gnev' : 'real',
+	'gnmuv' : 'real',
+	'gntauv' : 'real',
+	'gea' : 'real',
+	'gmua' : 'real',
+	'gtaua' : 'real',
+	'gnea' : 'real',
+	'gnmua' : 'real',
+	'gntaua' : 'real',
+	'gUl' : 'real',
+	'gCl' : 'real',
+	'gTl' : 'real',
+	'gDl' : 'real',
+	'gSl' : 'real',
+	'gBl' : 'real',
+	'gUr' : 'real',
+	'gCr' : 'real',
+	'gTr' : 'real',
+	'gDr' : 'real',
+	'gSr' : 'real',
+	'gBr' : 'real',
+	'gel' : 'real',
+	'gmul' : 'real',
+	'gtaul' : 'real',
+	'ger' : 'real',
+	'gmur' : 'real',
+	'gtaur' : 'real',
+	'gnel' : 'real',
+	'gner' : 'real',
+	'gnmul' : 'real',
+	'gnmur' : 'real',
+	'gntaul' : 'real',
+	'gntaur' : 'real',
+	'gWWZZ' : 'real',
+	'gWWAZ' : 'real',
+	'gWWAA' : 'real',
+	'gWWWW' : 'real',
+	'gWWZ' : 'real',
+	'gHHHH' : 'real',
+	'gXXXX' : 'real',
+	'gHHXX' : 'real',
+	'gHHPP' : 'real',
+	'gXXPP' : 'real',
+	'gPPPP' : 'real',
+	'gHHH' : 'real',
+	'gHXX' : 'real',
+	'gHPP' : 'real',
+	'gZZHH' : 'real',
+	'gZZXX' : 'real',
+	'gWWHH' : 'real',
+	'gWWXX' : 'real',
+	'gWWPP' : 'real',
+	'gAAPP' : 'real',
+	'gAZPP' : 'real',
+	'gZZPP' : 'real',
+	'gWAPH' : 'real',
+	'gWZPH' : 'real',
+	'gWAPX' : 'complex',
+	'gWZPX' : 'complex',
+	'gZXH' : 'complex',
+	'gAPP' : 'real',
+	'gZPP' : 'real',
+	'gWPH' : 'real',
+	'gWPX' : 'complex',
+	'gHZZ' : 'real',
+	'gHWW' : 'real',
+	'gPWA' : 'real',
+	'gPWZ' : 'real',
+	'gHU' : 'real',
+	'gHD' : 'real',
+	'gHC' : 'real',
+	'gHS' : 'real',
+	'gHB' : 'real',
+	'gHT' : 'real',
+	'gHe' : 'real',
+	'gHmu' : 'real',
+	'gHtau' : 'real',
+	'gXU' : 'real',
+	'gXD' : 'real',
+	'gXC' : 'real',
+	'gXS' : 'real',
+	'gXB' : 'real',
+	'gXT' : 'real',
+	'gXe' : 'real',
+	'gXmu' : 'real',
+	'gXtau' : 'real',
+	'gPU' : 'real',
+	'gPD' : 'real',
+	'gPC' : 'real',
+	'gPS' : 'real',
+	'gPB' : 'real',
+	'gPT' : 'real',
+	'gPe' : 'real',
+	'gPmu' : 'real',
+	'gPtau' : 'real',
+	'gGWX' : 'complex',
+	'gGWH' : 'real',
+	'gGZH' : 'real',
+	'gGWZP' : 'real',
+	'gGZWP' : 'real',
+	'cw' : 'real',
+	'Nfrat' : 'real',
+	'ef' : 'real',
+	'swf' : 'real',
+	'GFf' : 'real',
+	'mZf' : 'real',
+	'mWf' : 'real',
+	'alphaf' : 'real',
+
+   'TR' : 'real',
+   'pi' : 'real',
+   'i_' : 'complex',
+   'abb' : 'array',
+   'acc' : 'array',
+   'acd' : 'array',
+   'abbWrap' : 'array',
+   'mabb' : 'array'
+   }
+
+
+kinematics={
+
+	'es12' : 'real',
+	'es23' : 'real',
+	'spak1k2' : 'complex', 'spbk2k1' : 'complex',
+	'spak1k3' : 'complex', 'spbk3k1' : 'complex',
+	'spak1k4' : 'complex', 'spbk4k1' : 'complex',
+	'spak2k3' : 'complex', 'spbk3k2' : 'complex',
+	'spak2k4' : 'complex', 'spbk4k2' : 'complex',
+	'spak3k4' : 'complex', 'spbk4k3' : 'complex',
+	'k1' : 'vector',
+	'k2' : 'vector',
+	'k3' : 'vector',
+	'k4' : 'vector',
+	'c1' : 'color'
+}
+
+dotproducts={
+		'QspQ' : 'dotproduct(Q,Q)','Qspk1' : 'dotproduct(Q,k1)','Qspk2' : 'dotproduct(Q,k2)','Qspk3' : 'dotproduct(Q,k3)','Qspk4' : 'dotproduct(Q,k4)','Qspvak1k2' : 'dotproduct(Q,spvak1k2)','Qspvak1k3' : 'dotproduct(Q,spvak1k3)','Qspvak1k4' : 'dotproduct(Q,spvak1k4)','Qspvak2k1' : 'dotproduct(Q,spvak2k1)','Qspvak2k3' : 'dotproduct(Q,spvak2k3)','Qspvak2k4' : 'dotproduct(Q,spvak2k4)','Qspvak3k1' : 'dotproduct(Q,spvak3k1)','Qspvak3k2' : 'dotproduct(Q,spvak3k2)','Qspvak3k4' : 'dotproduct(Q,spvak3k4)','Qspvak4k1' : 'dotproduct(Q,spvak4k1)','Qspvak4k2' : 'dotproduct(Q,spvak4k2)','Qspvak4k3' : 'dotproduct(Q,spvak4k3)'}
+
+
+
+
+symbols = {
+            'sqrt2' : 'sqrt2',
+            'Sqrt2' : 'sqrt2',
+            'Qt2' : 'mu2',
+            '/' : '/' ,
+            '(' : '(' ,
+            ')' : ')' ,
+            '^' : '**',
+            '+' : '+',
+            '-' : '-',
+            '*' : '*',
+            'ZERO' : '0.0_ki'
+}
+
+
+lambdafunc = {  'madf'  :  lambda x,y,z: '%s + %s + %s' % (x,y,z),
+                'log'   :  lambda x : 'log(%s)' % x,
+                'csqrt' :  lambda x:  'sqrt(%s)' % x,
+                'sqrt'  :  lambda x:  'sqrt(%s)' % x,
+                'sin'  :  lambda x:  'sin(%s)' % x,
+                'cos'  :  lambda x:  'cos(%s)' % x,
+                'tan'  :  lambda x:  'tan(%s)' % x,
+                'asin'  :  lambda x:  'asin(%s)' % x,
+                'acos'  :  lambda x:  'acos(%s)' % x,
+                'atan'  :  lambda x:  'atan(%s)' % x,
+                'exp'  :  lambda x:  'exp(%s)' % x,
+                'pow'  :  lambda x,y : '(%s)**(%s)' % (x,y),
+                'atan2' : lambda x,y : 'atan2(%s, %s)' % (x,y),
+                'fabs' : lambda x : 'abs(%s)' % (x,y),
+                'if' : lambda x,y,z : 'ifpos(%s,%s,%s)' % (x,y,z),
+                'complexconjugate' : lambda x : 'conjg(%s)' % x,
+                'SpSqrt' : lambda x : 'sqrt(%s)' % x,
+                'dotproduct' : lambda x,y : 'dotproduct(%s,%s)' % (x,y),
+                'SUBSCRIPT' : lambda f,x :  '%s(%s)' % (f,x),
+                'Wrapper' : lambda f: '%s' % f,
+                'd' : lambda x,y : 'd(%s,%s)' % (x,y)
+            }
@@ -0,0 +1,270 @@
+# vim: ts=3:sw=3:expandtab
+"""
+A minimal interpreter of QGraf style files for the tests.
+
+It renders the style files of GoSam for diagrams which are given as
+data, such that the diagram files can be checked without QGraf. Only
+the keywords used by topostore.sty and topolopy.sty are supported:
+
+   <prologue> <diagram> <epilogue> <exit>
+   <in_loop> <out_loop> <propagator_loop> <vertex_loop> <ray_loop>
+   <command_loop> <command_line_loop> <end> <back>
+   the indices, fields and momenta of legs, propagators and vertices
+   [function] for the functions of the model file
+
+As in QGraf, '<<', '>>', '[[' and ']]' stand for the literal
+characters and <back> removes the last character written so far.
+
+A diagram is a dictionary with the keys
+
+   'index'       -- the diagram index
+   'in', 'out'   -- lists of legs (field, momentum, vertex, ray)
+   'propagators' -- list of (field, dual vertex, dual ray, vertex, ray,
+                    momentum); the field is the one at the vertex,
+                    the momentum flows from the dual vertex to the vertex
+
+The field of an incoming leg is the field at its ray, an outgoing leg
+has the conjugate field at its ray. The vertices are derived from the
+rays of legs and propagators.
+"""
+import re
+
+SECTIONS = ["prologue", "diagram", "epilogue", "exit"]
+LOOPS = ["in_loop", "out_loop", "propagator_loop", "vertex_loop",
+      "ray_loop", "command_loop", "command_line_loop"]
+LITERALS = {"<<": "<", ">>": ">", "[[": "[", "]]": "]"}
+
+TOKEN = re.compile(r"<<|>>|\[\[|\]\]|<[a-z][a-z_\-]*>|\[[A-Za-z][A-Za-z_\-]*\]")
+STATEMENT = re.compile(r"\[([^\[\]]*)\]")
+ASSIGNMENT = re.compile(r"(\w+)\s*=\s*('[^']*'|\([^)]*\)|[^,\s]+)")
+
+class StyleError(Exception):
+   pass
+
+class Model:
+   """
+   The functions of a QGraf model file.
+   """
+   def __init__(self, fname):
+      self.globals = {}
+      # field -> (field, antifield, sign, functions)
+      self.propagators = {}
+      # sorted tuple of fields -> functions
+      self.vertices = {}
+
+      with open(fname, "r") as f:
+         text = "".join(line.split("%")[0] + "\n" for line in f)
+
+      for statement in STATEMENT.findall(text):
+         head, sep, tail = statement.partition(";")
+         if not sep:
+            for name, value in ASSIGNMENT.findall(head):
+               self.globals[name] = parse_value(value)
+            continue
+
+         functions = dict((name, parse_value(value))
+               for name, value in ASSIGNMENT.findall(tail))
+         items = [item.strip() for item in head.split(",")]
+         if len(items) >= 3 and items[2] in ["+", "-"]:
+            entry = (items[0], items[1], items[2], functions)
+            self.propagators[items[0]] = entry
+            self.propagators[items[1]] = entry
+         else:
+            self.vertices[tuple(sorted(items))] = functions
+
+   def dual(self, field):
+      prop_field, antifield, sign, functions = self.propagators[field]
+      if field == prop_field:
+         return antifield
+      else:
+         return prop_field
+
+   def field_function(self, field, name):
+      prop_field, antifield, sign, functions = self.propagators[field]
+      value = functions[name]
+      if isinstance(value, list):
+         if field == prop_field or len(value) == 1:
+            return value[0]
+         else:
+            return value[1]
+      return value
+
+   def vertex_function(self, fields, name):
+      return self.vertices[tuple(sorted(fields))][name]
+
+def parse_value(value):
+   value = value.strip()
+   if value.startswith("("):
+      return [parse_value(v) for v in value[1:-1].split(",")]
+   elif value.startswith("'"):
+      return value[1:-1]
+   else:
+      return value
+
+def parse_style(text):
+   """
+   Returns a dictionary mapping the names of the sections to their
+   syntax trees. A tree is a list of strings, ('keyword', name),
+   ('function', name) and ('loop', name, tree).
+   """
+   sections = {}
+   stack = None
+   pos = 0
+   for match in TOKEN.finditer(text):
+      chunk = text[pos:match.start()]
+      pos = match.end()
+      token = match.group()
+      if stack is not None and chunk:
+         stack[-1].append(chunk)
+
+      if token in LITERALS:
+         if stack is not None:
+            stack[-1].append(LITERALS[token])
+      elif token.startswith("["):
+         stack[-1].append(("function", token[1:-1]))
+      else:
+         name = token[1:-1]
+         if name in SECTIONS:
+            if stack is not None and len(stack) > 1:
+               raise StyleError("Unterminated loop before <%s>" % name)
+            if name == "exit":
+               break
+            stack = [[]]
+            sections[name] = stack[0]
+            # the rest of the line of a section keyword is not written
+            if text[pos:pos+1] == "\n":
+               pos += 1
+         elif name in LOOPS:
+            body = []
+            stack[-1].append(("loop", name, body))
+            stack.append(body)
+         elif name == "end":
+            stack.pop()
+         else:
+            stack[-1].append(("keyword", name))
+   return sections
+
+def vertices_of(diagram, model):
+   """
+   Returns a dictionary mapping vertex indices to their ray fields.
+   """
+   rays = {}
+   for field, mom, v, r in diagram["in"]:
+      rays[(v, r)] = field
+   for field, mom, v, r in diagram["out"]:
+      rays[(v, r)] = model.dual(field)
+   for field, v1, r1, v2, r2, mom in diagram["propagators"]:
+      rays[(v1, r1)] = model.dual(field)
+      rays[(v2, r2)] = field
+
+   vertices = {}
+   for (v, r) in sorted(rays):
+      vertices.setdefault(v, []).append(rays[(v, r)])
+      if len(vertices[v]) != r:
+         raise StyleError("Rays of vertex %d are not numbered 1, 2, ..."
+               % v)
+   return vertices
+
+class Renderer:
+   def __init__(self, model, program, commands):
+      self.model = model
+      self.program = program
+      self.commands = commands
+      self.output = []
+
+   def write(self, text):
+      self.output.extend(text)
+
+   def back(self):
+      self.output.pop()
+
+   def lookup(self, scopes, name):
+      for scope in reversed(scopes):
+         if name in scope:
+            return scope[name]
+      raise StyleError("Keyword <%s> is not defined here" % name)
+
+   def function(self, scopes, name):
+      if name in self.model.globals:
+         return self.model.globals[name]
+      for scope in reversed(scopes):
+         if "__vertex__" in scope:
+            return self.model.vertex_function(scope["__vertex__"], name)
+         if "__field__" in scope:
+            return self.model.field_function(scope["__field__"], name)
+      raise StyleError("Function [%s] is not defined here" % name)
+
+   def iterate(self, scopes, name):
+      if name == "in_loop" or name == "out_loop":
+         key = name[:-len("_loop")]
+         for i, (field, mom, v, r) in enumerate(
+               self.lookup(scopes, "__diagram__")[key]):
+            yield {"%s_index" % key: i + 1, "field": field,
+                  "dual-field": self.model.dual(field), "momentum": mom,
+                  "vertex_index": v, "ray_index": r, "__field__": field}
+      elif name == "propagator_loop":
+         for i, (field, v1, r1, v2, r2, mom) in enumerate(
+               self.lookup(scopes, "__diagram__")["propagators"]):
+            yield {"propagator_index": i + 1, "field": field,
+                  "dual-field": self.model.dual(field), "momentum": mom,
+                  "dual-vertex_index": v1, "dual-ray_index": r1,
+                  "vertex_index": v2, "ray_index": r2,
+                  "field_sign": self.model.propagators[field][2],
+                  "__field__": field}
+      elif name == "vertex_loop":
+         vertices = self.lookup(scopes, "__vertices__")
+         for v in sorted(vertices):
+            yield {"vertex_index": v, "vertex_degree": len(vertices[v]),
+                  "__vertex__": vertices[v]}
+      elif name == "ray_loop":
+         for r, field in enumerate(self.lookup(scopes, "__vertex__")):
+            yield {"ray_index": r + 1, "field": field, "__field__": field}
+      elif name == "command_loop":
+         for lines in self.commands:
+            yield {"__lines__": lines}
+      elif name == "command_line_loop":
+         for line in self.lookup(scopes, "__lines__"):
+            yield {"command_data": line}
+
+   def evaluate(self, tree, scopes):
+      for node in tree:
+         if isinstance(node, str):
+            self.write(node)
+         elif node[0] == "keyword":
+            if node[1] == "back":
+               self.back()
+            else:
+               self.write(str(self.lookup(scopes, node[1])))
+         elif node[0] == "function":
+            self.write(str(self.function(scopes, node[1])))
+         else:
+            for scope in self.iterate(scopes, node[1]):
+               self.evaluate(node[2], scopes + [scope])
+
+def render(style, diagrams, model, program="", commands=()):
+   """
+   Renders the style file for the given diagrams and returns the text.
+
+   style    -- the name of the style file
+   diagrams -- a list of diagrams as described in the module
+   model    -- a Model
+   program  -- the value of <program>
+   commands -- a list of statements, each a list of lines, for
+               <command_loop>
+   """
+   with open(style, "r") as f:
+      sections = parse_style(f.read())
+
+   renderer = Renderer(model, program, commands)
+   top = {"program": program}
+   if "prologue" in sections:
+      renderer.evaluate(sections["prologue"], [top])
+   for diagram in diagrams:
+      scope = {"diagram_index": diagram["index"], "__diagram__": diagram,
+            "__vertices__": vertices_of(diagram, model)}
+      renderer.evaluate(sections["diagram"], [top, scope])
+   if diagrams:
+      top["diagram_index"] = diagrams[-1]["index"]
+   if "epilogue" in sections:
+      renderer.evaluate(sections["epilogue"], [top])
+   return "".join(renderer.output)
@@ -0,0 +1,92 @@
+# vim: ts=3:sw=3:expandtab
+"""
+Cross-check of golem.algorithms.color.colorbasis.
+
+For all processes with up to three quark lines and eight coloured legs
+the basis must have num_colors(F, G) elements and must be identical,
+including its order, to the basis obtained by filtering all
+permutations generated by 'permutations' (Steinhaus-Johnson-Trotter)
+as colorbasis did before.
+
+   python tests/test_colorbasis.py
+"""
+from golem.algorithms.color import colorbasis, num_colors, permutations
+
+MAX_QUARK_LINES = 3
+MAX_LEGS = 8
+
+def filtered_colorbasis(quarks, aquarks, gluons):
+   """
+   The colour basis as it was generated before colorbasis constructed
+   the tadpole-free permutations directly.
+   """
+   lhs = gluons + aquarks
+   rhs = gluons + quarks
+   nglue = len(gluons)
+
+   for l in permutations(lhs):
+      lines = []
+      traces = []
+      iglue = set(range(nglue))
+      for a in aquarks:
+         line = [a]
+         r = rhs[l.index(a)]
+         while r in [gluons[i] for i in iglue]:
+            ir = gluons.index(r)
+            line.append(r)
+            iglue.remove(ir)
+            r = rhs[l.index(r)]
+         line.append(r)
+         lines.append(line)
+      while len(iglue) > 0:
+         line = []
+         ig = iglue.pop()
+         g = gluons[ig]
+         r = rhs[l.index(g)]
+         while r in [gluons[i] for i in iglue]:
+            ir = gluons.index(r)
+            line.append(r)
+            iglue.remove(ir)
+            r = rhs[l.index(r)]
+         line.append(r)
+         traces.append(line)
+      # check for tadpoles
+      if len(traces) > 0:
+         if min(list(map(len, traces))) <= 1:
+            continue
+      yield lines, traces
+
+def leg_assignments(F, G):
+   """
+   Yields (quarks, aquarks, gluons) with the gluons in front of and
+   behind the quarks.
+   """
+   n = 2*F + G
+   yield (list(range(F)), list(range(F, 2*F)), list(range(2*F, n)))
+   yield (list(range(G, G+F)), list(range(G+F, n)), list(range(G)))
+
+def processes():
+   for F in range(MAX_QUARK_LINES + 1):
+      for G in range(MAX_LEGS - 2*F + 1):
+         if F + G > 0:
+            yield F, G
+
+def test_num_colors():
+   for F, G in processes():
+      quarks, aquarks, gluons = next(leg_assignments(F, G))
+      basis = list(colorbasis(quarks, aquarks, gluons))
+      assert len(basis) == num_colors(F, G), (F, G)
+
+def test_filtered_basis():
+   for F, G in processes():
+      for quarks, aquarks, gluons in leg_assignments(F, G):
+         new = list(colorbasis(quarks, aquarks, gluons))
+         old = list(filtered_colorbasis(quarks, aquarks, gluons))
+         assert new == old, (F, G, quarks, aquarks, gluons)
+
+if __name__ == "__main__":
+   test_num_colors()
+   test_filtered_basis()
+   for F, G in processes():
+      print("F=%d G=%d: %d elements" % (F, G, num_colors(F, G)))
+   print("colorbasis: OK")
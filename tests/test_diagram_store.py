@@ -0,0 +1,155 @@
+# vim: ts=3:sw=3:expandtab
+"""
+Round trip check of the diagram files written with topostore.sty.
+
+The files tests/data/<process>/topo*.jsonl hold the tree and one-loop
+diagrams of processes from examples/ in the format of topostore.sty.
+QGraf was not available when they were written, so the diagrams were
+transcribed by hand and rendered with tests/qgraf_style.py using the
+model file models/sm.
+
+For every file it is checked that
+ - rendering its diagrams with templates/codegen/topostore.sty gives
+   the same records again,
+ - golem.topolopy.store.DiagramStore builds the same diagrams as the
+   Python module which tests/data/topolopy.sty, the style file used
+   before, produces for the same diagrams.
+
+   python tests/test_diagram_store.py [--update]
+
+With --update the files are rendered again with the current
+topostore.sty before they are checked.
+"""
+import sys
+import os
+import glob
+import json
+import types
+
+from golem.topolopy.store import DiagramStore
+
+import qgraf_style
+
+TESTS_DIR = os.path.dirname(os.path.abspath(__file__))
+DATA_DIR = os.path.join(TESTS_DIR, "data")
+STYLE = os.path.join(TESTS_DIR, os.pardir, "templates", "codegen",
+      "topostore.sty")
+REFERENCE_STYLE = os.path.join(DATA_DIR, "topolopy.sty")
+MODEL = qgraf_style.Model(os.path.join(TESTS_DIR, os.pardir, "models", "sm"))
+PROGRAM = "tests/qgraf_style.py"
+
+def diagram_files():
+   return sorted(glob.glob(os.path.join(DATA_DIR, "*", "topo*.jsonl")))
+
+def read_records(text):
+   """
+   Splits the text of a diagram file into its JSON records,
+   independently of DiagramStore.
+   """
+   lines = {}
+   index = None
+   for line in text.splitlines(True):
+      if line.startswith("@"):
+         index = int(line[1:])
+         lines[index] = []
+      elif index is not None:
+         lines[index].append(line)
+   return dict((idx, json.loads("".join(chunk)))
+         for idx, chunk in lines.items())
+
+def describe(index, record):
+   """
+   Returns the diagram of a record in the form of tests/qgraf_style.py.
+   """
+   legs = record["legs"][1:]
+   return {"index": index,
+      "in": [(field, mom, v, r)
+         for (i, ingoing, field, v, r, mom, mass, twospin, color,
+            dual) in legs if ingoing],
+      "out": [(field, mom, v, r)
+         for (i, ingoing, field, v, r, mom, mass, twospin, color,
+            dual) in legs if not ingoing],
+      "propagators": [(field, v1, r1, v2, r2, mom)
+         for (i, field, v1, r1, v2, r2, mom, mass, width, aux, twospin,
+            color, dual, sign) in record["propagators"][1:]]}
+
+def render(style, fname):
+   with open(fname, "r") as f:
+      records = read_records(f.read())
+   diagrams = [describe(idx, record) for idx, record in records.items()]
+   commands = [["output = '%s';" % os.path.basename(fname)]]
+   return qgraf_style.render(style, diagrams, MODEL, PROGRAM, commands)
+
+def load_reference(fname):
+   """
+   Returns the diagrams of the module generated with topolopy.sty,
+   which used to be loaded with imp.load_source.
+   """
+   module = types.ModuleType("topolopy_reference")
+   exec(compile(render(REFERENCE_STYLE, fname), fname, "exec"),
+         module.__dict__)
+   return module.diagrams
+
+def diagram_state(diagram):
+   legs = dict((("in", idx), vars(leg))
+         for idx, leg in diagram._in_legs.items())
+   legs.update((("out", idx), vars(leg))
+         for idx, leg in diagram._out_legs.items())
+   propagators = dict((idx, (p.field, p.v1, p.r1, p.v2, p.r2,
+         str(p.momentum), p.mass, p.width, p.aux, p.twospin, p.color,
+         p.self_conjugate, p.sign))
+         for idx, p in diagram._propagators.items())
+   vertices = dict((idx, (v.rank, v.fields))
+         for idx, v in diagram._vertices.items())
+   state = [legs, propagators, vertices, diagram._loop,
+         diagram._loop_vertices, diagram.rank(), diagram.sign()]
+   if diagram.loopsize() > 0:
+      state.append(str(diagram.getLoopIntegral()))
+   return state
+
+def test_fixtures():
+   files = diagram_files()
+   assert len(files) > 0
+   for fname in files:
+      with open(fname, "r") as f:
+         records = read_records(f.read())
+      assert read_records(render(STYLE, fname)) == records, fname
+
+def test_round_trip():
+   for fname in diagram_files():
+      reference = load_reference(fname)
+      store = DiagramStore(fname)
+      try:
+         assert list(store.keys()) == list(reference.keys()), fname
+         for idx, diagram in store.items():
+            assert diagram_state(diagram) == \
+                  diagram_state(reference[idx]), (fname, idx)
+      finally:
+         store.close()
+
+def test_store_access():
+   for fname in diagram_files():
+      store = DiagramStore(fname)
+      try:
+         keys = list(store.keys())
+         assert len(store) == len(keys)
+         assert list(store) == keys
+         assert all(idx in store for idx in keys)
+         assert max(keys) + 1 not in store
+         for idx, diagram in store.items():
+            # diagrams are built on every access and not kept
+            assert store[idx] is not store[idx]
+            assert diagram_state(store[idx]) == diagram_state(diagram)
+      finally:
+         store.close()
+
+if __name__ == "__main__":
+   if "--update" in sys.argv[1:]:
+      for fname in diagram_files():
+         text = render(STYLE, fname)
+         with open(fname, "w") as f:
+            f.write(text)
+   test_fixtures()
+   test_round_trip()
+   test_store_access()
+   print("DiagramStore: OK (%d diagram files)" % len(diagram_files()))
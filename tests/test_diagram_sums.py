@@ -0,0 +1,158 @@
+# vim: ts=3:sw=3:expandtab
+"""
+Regression check for golem.topolopy.functions.group_diagram_sums.
+
+The grouping of summed loop diagrams (diagsum=true) is compared with
+the pairwise loop which analyze_loop_diagrams used before. The
+signatures are taken from the one-loop diagram files written with
+topostore.sty which are kept in tests/data/<process>/ (see
+tests/test_diagram_store.py).
+
+Further diagram files or directories containing them (topovirt.jsonl
+or entries of the QGraf cache of GoSam, which keeps a copy of the
+diagram files of every generated process) can be checked from the
+command line:
+
+   python tests/test_diagram_sums.py [--cache] [file or directory ...]
+
+With --cache the QGraf cache is searched for diagram files.
+"""
+import sys
+import os
+import glob
+import random
+
+import golem.util.constants
+import golem.util.path
+from golem.topolopy.functions import group_diagram_sums
+from golem.topolopy.store import DiagramStore
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+
+def pairwise_diagram_sums(keep, signatures):
+   """
+   The grouping as it was done by analyze_loop_diagrams before it was
+   replaced by group_diagram_sums. Returns the remaining indices and
+   the dictionary of summed diagrams.
+   """
+   keep = list(keep)
+   lose = []
+   eprops = {}
+   props = [[idx, sig] for idx, sig in zip(keep, signatures)]
+   for i,item in props:
+      for j,jtem in props:
+         if item == jtem and j>i:
+            if j not in lose:
+               lose.append(j)
+               keep.remove(j)
+               if i not in eprops:
+                  eprops[i]=[j]
+               else:
+                  eprops[i].append(j)
+   return keep, eprops
+
+def bucketed_diagram_sums(keep, signatures):
+   """
+   The grouping as it is done by analyze_loop_diagrams now.
+   """
+   eprops = group_diagram_sums(keep, signatures)
+   summed = set()
+   for idx in keep:
+      if idx in eprops:
+         summed.update(eprops[idx])
+   keep = [idx for idx in keep if idx not in summed]
+   return keep, eprops
+
+def check_grouping(keep, signatures):
+   old_keep, old_eprops = pairwise_diagram_sums(keep, signatures)
+   new_keep, new_eprops = bucketed_diagram_sums(keep, signatures)
+   assert new_keep == old_keep
+   # The order of the keys determines the order of the summed
+   # diagrams in the generated code.
+   assert list(new_eprops.items()) == list(old_eprops.items())
+
+def diagram_signatures(fname):
+   """
+   Reads a one-loop diagram file and returns the diagram indices and
+   the signatures as computed in analyze_loop_diagrams.
+   """
+   diagrams = DiagramStore(fname)
+   keep = list(diagrams.keys())
+   signatures = [
+         str(diagram.getLoopIntegral())+','+str(diagram.rank())
+         for idx, diagram in diagrams.items()]
+   diagrams.close()
+   return keep, signatures
+
+def is_loop_diagram_file(fname):
+   """
+   Checks if a file has been written with topostore.sty and
+   contains one-loop diagrams.
+   """
+   try:
+      with open(fname, "r") as f:
+         head = f.read(1024)
+   except (IOError, UnicodeDecodeError):
+      return False
+   if "golem.topolopy.store.DiagramStore" not in head:
+      return False
+   diagrams = DiagramStore(fname)
+   try:
+      for idx in diagrams:
+         return diagrams[idx].loopsize() > 0
+      return False
+   finally:
+      diagrams.close()
+
+def find_diagram_files(paths):
+   """
+   Returns the one-loop diagram files among the given files and
+   in the given directories, which can be process directories or
+   the QGraf cache.
+   """
+   name = "%s.jsonl" % golem.util.constants.PATTERN_TOPOLOPY_VIRT
+   candidates = []
+   for path in paths:
+      if os.path.isdir(path):
+         candidates.extend(sorted(glob.glob(os.path.join(path, name))))
+         # entries of golem.util.cache.FileCache
+         candidates.extend(sorted(glob.glob(os.path.join(path, "*", "output"))))
+      else:
+         candidates.append(path)
+   return [fname for fname in candidates if is_loop_diagram_file(fname)]
+
+def test_synthetic_signatures():
+   rnd = random.Random(4)
+   for n in [0, 1, 2, 10, 200]:
+      for nsig in [1, 3, 20]:
+         keep = list(range(1, n+1))
+         signatures = ["LoopIntegral(%d),%d" % (rnd.randrange(nsig), 1)
+               for idx in keep]
+         check_grouping(keep, signatures)
+
+         # select.nlo can leave gaps and produce an unsorted index list
+         shuffled = rnd.sample(range(1, 3*n+1), n)
+         check_grouping(shuffled, signatures)
+
+def test_recorded_diagrams():
+   files = find_diagram_files(sorted(glob.glob(os.path.join(DATA_DIR, "*"))))
+   assert len(files) > 0
+   for fname in files:
+      keep, signatures = diagram_signatures(fname)
+      check_grouping(keep, signatures)
+      # the diagrams are chosen such that some of them are summed
+      assert len(set(signatures)) < len(signatures)
+
+if __name__ == "__main__":
+   test_synthetic_signatures()
+   test_recorded_diagrams()
+   paths = [arg for arg in sys.argv[1:] if arg != "--cache"]
+   if "--cache" in sys.argv[1:]:
+      paths.append(golem.util.path.cache_path("qgraf"))
+   files = find_diagram_files(paths)
+   for fname in files:
+      keep, signatures = diagram_signatures(fname)
+      check_grouping(keep, signatures)
+      print("%s: %d diagrams, %d signatures" %
+            (fname, len(keep), len(set(signatures))))
+   print("group_diagram_sums: OK (%d further diagram files)" % len(files))
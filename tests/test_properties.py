@@ -0,0 +1,90 @@
+# vim: ts=3:sw=3:expandtab
+"""
+Checks that the typed values cached by golem.util.config.Properties
+follow every change of the underlying properties.
+
+   python tests/test_properties.py
+"""
+import golem.properties
+from golem.util.config import Properties
+
+def test_set_property():
+   conf = Properties()
+   conf["zero"] = "mU, mD"
+   assert conf.getProperty(golem.properties.zero) == ["mU", "mD"]
+   conf["zero"] = "mT"
+   assert conf.getProperty(golem.properties.zero) == ["mT"]
+
+   conf["cache.size"] = "4"
+   assert conf.getProperty(golem.properties.cache_size) == 4
+   conf.setProperty("cache.size", "8")
+   assert conf.getProperty(golem.properties.cache_size) == 8
+
+   conf["PSP_check"] = "true"
+   assert conf.getProperty(golem.properties.config_PSP_check)
+   conf["PSP_check"] = "false"
+   assert not conf.getProperty(golem.properties.config_PSP_check)
+
+def test_returned_list_is_a_copy():
+   conf = Properties()
+   conf["one"] = "gs, e"
+   conf.getProperty(golem.properties.one).append("x")
+   assert conf.getProperty(golem.properties.one) == ["gs", "e"]
+
+def test_delimiters():
+   conf = Properties()
+   conf["one"] = "gs; e"
+   assert conf.getListProperty("one") == ["gs; e"]
+   assert conf.getListProperty("one", delimiter=";") == ["gs", "e"]
+
+def test_plussed_properties():
+   conf = Properties()
+   conf["one"] = "gs"
+   assert conf.getListProperty("one") == ["gs"]
+   conf["+one"] = "e"
+   assert conf.getListProperty("one") == ["e"]
+   assert conf.getListProperty("+one") == ["e"]
+
+   conf._del("+one")
+   assert conf.getListProperty("one") == []
+   assert conf.getListProperty("+one") == []
+
+def test_delete_keeps_other_entries():
+   conf = Properties()
+   conf["ser.setup"] = "1"
+   conf["user.setup"] = "2"
+   assert conf.getIntegerProperty("ser.setup") == 1
+   conf._del("user.setup")
+   assert "ser.setup" in conf._values
+   assert conf.getIntegerProperty("ser.setup") == 1
+
+def test_subconfig():
+   conf = Properties()
+   conf["order"] = "gs, 1, 1"
+   conf["order[1]"] = "gs, 2, 2"
+   assert conf.getProperty(golem.properties.qgraf_power) == ["gs", "1", "1"]
+   conf.activate_subconfig(1)
+   assert conf.getProperty(golem.properties.qgraf_power) == ["gs", "2", "2"]
+
+def test_decode():
+   conf = Properties()
+   conf["escaped"] = "a\\tb"
+   conf.decode()
+   assert conf.getProperty("escaped") == "a\tb"
+   assert conf.getProperty("escaped") == "a\tb"
+   conf.nodecode()
+   assert conf.getProperty("escaped") == "a\\tb"
+
+def test_defaults_are_not_cached():
+   defaults = Properties()
+   defaults["zero"] = "mU"
+   conf = Properties(defaults)
+   assert conf.getProperty(golem.properties.zero) == ["mU"]
+   defaults["zero"] = "mD"
+   assert conf.getProperty(golem.properties.zero) == ["mD"]
+
+if __name__ == "__main__":
+   for name, function in sorted(globals().items()):
+      if name.startswith("test_"):
+         function()
+   print("Properties: OK")
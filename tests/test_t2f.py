@@ -0,0 +1,220 @@
+# vim: ts=3:sw=3:expandtab
+"""
+Regression check for the FORM to Fortran translator
+templates/codegen/t2f.py against tests/t2f_reference.py, the version
+before the tokenizer and the output assembly were rewritten.
+
+The translation has to be identical for
+ - randomly generated abbreviation files,
+ - the FORM output (<diagram>.txt with <diagram>.dat, born.txt) of the
+   process directories in tests/data/. The pythonin.py of
+   tests/data/eeuu was generated by GoSam for examples/eeuu, its FORM
+   output was written by hand in the format of the FORM procedures.
+
+The process directories below examples/, which exist once the examples
+have been built, or the ones given on the command line can be checked
+as well:
+
+   python tests/test_t2f.py [--examples] [process directory ...]
+
+The tokenizer has to split lines exactly like the tokenize based
+version. Unlike the latter it does not raise TokenError for lines with
+unbalanced brackets but returns their tokens.
+"""
+import sys
+import os
+import glob
+import random
+import tempfile
+import importlib.util
+from tokenize import TokenError
+
+TESTS_DIR = os.path.dirname(os.path.abspath(__file__))
+CODEGEN_DIR = os.path.join(TESTS_DIR, os.pardir, "templates", "codegen")
+EXAMPLES_DIR = os.path.join(TESTS_DIR, os.pardir, "examples")
+DATA_DIR = os.path.join(TESTS_DIR, "data")
+
+if CODEGEN_DIR not in sys.path:
+   # t2f imports the module 'filter' from the same directory
+   sys.path.append(CODEGEN_DIR)
+
+def load_module(name, path):
+   spec = importlib.util.spec_from_file_location(name, path)
+   module = importlib.util.module_from_spec(spec)
+   spec.loader.exec_module(module)
+   return module
+
+t2f = load_module("t2f", os.path.join(CODEGEN_DIR, "t2f.py"))
+t2f_reference = load_module("t2f_reference",
+      os.path.join(TESTS_DIR, "t2f_reference.py"))
+
+SYNTHETIC_CONFIG = {
+   'parameters': {'abb': 'array', 'acc': 'array', 'mdlMZ': 'real',
+         'mdlMW': 'real', 'i_': 'complex', 'mm': 'matrix'},
+   'kinematics': {},
+   'symbols': {'sqrt2': 'sqrt2', '/': '/', '(': '(', ')': ')', '^': '**',
+         '+': '+', '-': '-', '*': '*', 'ZERO': '0.0_ki'},
+   'lambdafunc': {'log': lambda x: 'log(%s)' % x,
+         'csqrt': lambda x: 'sqrt(%s)' % x,
+         'pow': lambda x, y: '(%s)**(%s)' % (x, y)},
+   'dotproducts': {'es12': 1, 'es23': 1, 'spak1k2': 1}
+}
+
+ATOMS = ['es12', 'es23', 'spak1k2', 'mdlMZ', 'mdlMW', 'i_', 'sqrt2', 'ZERO',
+      '3', '2', '0.5', 'abb%d(%d)', 'acc%d(%d)', 'log(%s)', 'csqrt(%s)',
+      'pow(%s,2)']
+
+def random_expression(rnd, depth=0):
+   parts = []
+   for i in range(rnd.randint(1, 6)):
+      atom = rnd.choice(ATOMS)
+      if '%s' in atom:
+         atom = atom % (random_expression(rnd, depth+1)
+               if depth < 2 else 'es12')
+      elif '%d' in atom:
+         atom = atom % (rnd.randint(1, 9), rnd.randint(1, 500))
+      if rnd.random() < 0.1:
+         atom += '^2'
+      if rnd.random() < 0.05:
+         atom += '^-1'
+      parts.append(atom)
+   result = parts[0]
+   for part in parts[1:]:
+      result += rnd.choice(['+', '-', '*', '/']) + part
+   if depth > 0:
+      return '(' + result + ')'
+   else:
+      return result
+
+def write_abbreviations(fname, size, seed=0):
+   """
+   Writes an abbreviation file in the format produced by FORM with
+   'size' statements per block.
+   """
+   rnd = random.Random(seed)
+   with open(fname, 'w') as f:
+      for block in ['Abbreviations', 'Diagram', 'R2']:
+         f.write('##### %s\n' % block)
+         for i in range(size):
+            rhs = random_expression(rnd)
+            if rnd.random() < 0.2:
+               rhs += '*mm1(2,3)'
+            if rnd.random() < 0.1:
+               # statement continued on the next line
+               f.write('abb1(%d)=%s\n  + %s;\n' %
+                     (i, rhs, random_expression(rnd)))
+            else:
+               f.write('abb1(%d)=%s;\n' % (i, rhs))
+         f.write('*comment\n\n')
+
+def translate_both(fname, config, keepleft=False):
+   results = []
+   for module in [t2f_reference, t2f]:
+      module.dotproduct_global[:] = []
+      results.append(module.translatefile(fname, dict(config), keepleft))
+   return results
+
+def check_translation(fname, config, keepleft=False):
+   reference, result = translate_both(fname, config, keepleft)
+   assert list(result.keys()) == list(reference.keys()), fname
+   for key in reference:
+      assert result[key] == reference[key], (fname, key)
+
+def find_form_output(process_dir):
+   """
+   Returns the files translated by the buildfortran scripts
+   in a process directory.
+   """
+   result = []
+   for txt in sorted(glob.glob(os.path.join(process_dir, "*", "*.txt"))):
+      name = os.path.basename(txt)
+      if name == "born.txt" or os.path.exists(txt[:-len(".txt")] + ".dat"):
+         result.append(txt)
+   return result
+
+def process_config(process_dir):
+   pythonin = load_module("pythonin",
+         os.path.join(process_dir, "codegen", "pythonin.py"))
+   return {'parameters': pythonin.parameters,
+         'kinematics': pythonin.kinematics,
+         'symbols': pythonin.symbols,
+         'lambdafunc': pythonin.lambdafunc,
+         'dotproducts': pythonin.dotproducts}
+
+def find_processes(paths):
+   return [path for path in paths
+         if os.path.exists(os.path.join(path, "codegen", "pythonin.py"))]
+
+def check_process(process_dir):
+   config = process_config(process_dir)
+   files = find_form_output(process_dir)
+   for fname in files:
+      check_translation(fname, config)
+   return files
+
+def test_tokeniseline():
+   rnd = random.Random(1)
+   alphabet = "abcxyzeEjJoOb_0123456789+-*/^(),;. \t[]"
+   for k in range(20000):
+      line = ''.join(rnd.choice(alphabet) for i in range(rnd.randint(0, 25)))
+      try:
+         expected = t2f_reference.tokeniseline(line)
+      except (TokenError, SyntaxError):
+         continue
+      assert t2f.tokeniseline(line) == expected, line
+
+def test_unbalanced_brackets():
+   for line in ['a(b', 'a)b', 'x*(y+z']:
+      try:
+         t2f_reference.tokeniseline(line)
+      except TokenError:
+         pass
+      else:
+         assert False, line
+   assert t2f.tokeniseline('x*(y+z') == ['x', '*', '(', 'y', '+', 'z']
+
+def test_bmatch():
+   rnd = random.Random(2)
+   def balanced(depth):
+      tokens = []
+      for i in range(rnd.randint(0, 4)):
+         if rnd.random() < 0.4 and depth < 5:
+            tokens += ['('] + balanced(depth+1) + [')']
+         else:
+            tokens.append('x')
+      return tokens
+   for k in range(5000):
+      tokens = balanced(0)
+      assert t2f.bmatch(tokens) == t2f_reference.bmatch(tokens), tokens
+
+def test_translatefile():
+   handle, fname = tempfile.mkstemp(suffix=".txt", prefix="gosam_t2f")
+   os.close(handle)
+   try:
+      for seed in range(3):
+         write_abbreviations(fname, 300, seed)
+         check_translation(fname, SYNTHETIC_CONFIG)
+         check_translation(fname, SYNTHETIC_CONFIG, True)
+   finally:
+      os.remove(fname)
+
+def test_form_output():
+   processes = find_processes(glob.glob(os.path.join(DATA_DIR, "*")))
+   assert len(processes) > 0
+   for process_dir in processes:
+      assert len(check_process(process_dir)) > 0, process_dir
+
+if __name__ == "__main__":
+   test_tokeniseline()
+   test_unbalanced_brackets()
+   test_bmatch()
+   test_translatefile()
+   test_form_output()
+   paths = [arg for arg in sys.argv[1:] if arg != "--examples"]
+   if "--examples" in sys.argv[1:]:
+      paths.extend(glob.glob(os.path.join(EXAMPLES_DIR, "*", "*")))
+   processes = find_processes(paths)
+   for process_dir in processes:
+      files = check_process(process_dir)
+      print("%s: %d files identical" % (process_dir, len(files)))
+   print("t2f: OK (%d further process directories)" % len(processes))